@@ -1,15 +1,23 @@
-import tempfile
-from fpdf import FPDF
 from prophet import Prophet
 import streamlit as st
 import plotly.express as px
-import base64
 
 import pandas as pd
 import os
 import json
-from utils.functions import processar_indicadores_financeiros, prophet_ar2_forecast, forecast_future_periods, backtest_auto_arima, previsao_auto_arima
-from utils.db import load_all_rows_from_mongo
+from utils.functions import prophet_ar2_forecast, forecast_future_periods, backtest_auto_arima, previsao_auto_arima
+from utils.db_streamlit import load_all_rows_from_mongo, load_indicadores_from_mongo, versao_colecao
+from utils.cache import obter_cache
+from utils.previsao_rapida import previsao_rapida, backtest_rapido
+from utils.intervalos import intervalos_backtest
+from utils.graficos import figuras_contabil
+from utils.relatorios import obter_gerador
+from utils.cenarios import SimuladorCenarios
+from utils.simulacao import simular_liquidez
+from utils.hierarquia import IndiceHierarquia
+from utils.anomalias import detectar_anomalias
+from utils.derivadas import derivar_series
+from utils.plano_contas import PLANOS_EMPRESAS, plano_da_empresa, processar_indicadores_por_plano, registrar_plano
 import plotly.graph_objects as go
 # ======================
 # CONFIGURAÇÕES GERAIS
@@ -25,34 +33,81 @@ option = st.selectbox(
 # ======================
 # DB: conexão + leitura com cache
 # ======================
-with st.spinner("Carregando dados do MongoDB (isso pode demorar na primeira vez)..."):
-    # Para debug/primeiro deploy: limite para evitar timeout (remova o limit em produção quando estiver seguro)
-    #option = 
-    
+# Empresa -> (banco, coleção) no MongoDB
+EMPRESAS = {
+    "Casa do Norte Piuaizinho": ("ConsulX_db", "industrial_nordeste"),
+    "Tecnotubo Metal Industria": ("ConsulX_db", "Industria_Tecno_Metais"),
+    "Clínica Odontológica OdontoCare": ("ConsulX_db", "Industria_Tecno_Metais"),
+    "Imobiliária Imperial Fagundes": ("ConsulX_db", "Industria_Tecno_Metais"),
+    "Juliano Castro de Oliveira Advogados": ("ConsulX_db", "Industria_Tecno_Metais"),
+}
+db_name, coll_name = EMPRESAS[option]
 
-    if option == "Casa do Norte Piuaizinho":
-        all_rows = load_all_rows_from_mongo(
-            db_name="ConsulX_db", coll_name="industrial_nordeste", limit=None)
-    else:
-        all_rows = load_all_rows_from_mongo(
-            db_name="ConsulX_db", coll_name="Industria_Tecno_Metais", limit=None)
-    
-    #all_rows = load_all_rows_from_mongo(db_name="ConsulX_db", coll_name="Industria_Tecno_Metais", limit=None)
+# CONSULX_PLANOS: JSON {coleção: plano} (o mesmo formato de --planos da CLI) com
+# o plano de contas das empresas que não seguem o plano padrão (utils.plano_contas)
+if os.environ.get("CONSULX_PLANOS"):
+    with open(os.environ["CONSULX_PLANOS"], encoding="utf-8") as f:
+        for empresa, plano in json.load(f).items():
+            registrar_plano(empresa, plano)
 
-# Cria DataFrame de forma segura
-if not all_rows:
-    st.warning(
-        "Nenhum documento/processamento retornou dados. Verifique a coleção ou o extractor.")
-    df_hist = pd.DataFrame()  # DataFrame vazio para evitar crashes
-else:
-    df_hist = pd.DataFrame(all_rows)
+# Cache compartilhado entre todas as sessões do processo: dez contadores olhando
+# a mesma empresa disparam uma única carga/ajuste de modelo.
+cache = obter_cache()
+versao_dados = versao_colecao(db_name=db_name, coll_name=coll_name)
 
-# Processa indicadores apenas se houver dados
-if df_hist.empty:
-    indicadores_historicos = pd.DataFrame()
+# Gerador dos relatórios PDF do processo; o pool só é criado no primeiro pedido
+gerador = obter_gerador()
+
+
+def _carregar_df_hist():
+    # Para debug/primeiro deploy: limite para evitar timeout (remova o limit em produção quando estiver seguro)
+    # saldos_completos: débitos/créditos alimentam a detecção de anomalias
+    all_rows = load_all_rows_from_mongo(
+        db_name=db_name, coll_name=coll_name, limit=None, saldos_completos=True)
+    return pd.DataFrame(all_rows)
+
+
+def _calcular_indicadores():
+    if df_hist.empty:
+        return pd.DataFrame()
+    return processar_indicadores_por_plano(df_hist, plano=plano_da_empresa(coll_name))
+
+
+# CONSULX_PUSHDOWN=1: as somas mensais por grupo são calculadas no MongoDB sobre
+# a coleção de folhas (utils.db.sincronizar_folhas) e só a matriz mês × grupo
+# chega ao app, sem baixar as árvores dos balancetes. As somas no servidor seguem
+# o plano padrão; empresas com plano próprio continuam pelas contas analíticas.
+USAR_PUSHDOWN = os.environ.get("CONSULX_PUSHDOWN") == "1" and coll_name not in PLANOS_EMPRESAS
+
+if USAR_PUSHDOWN:
+    with st.spinner("Calculando indicadores no MongoDB..."):
+        indicadores_historicos = cache.obter_ou_calcular(
+            (coll_name, versao_dados, "indicadores_pushdown"),
+            lambda: load_indicadores_from_mongo(db_name=db_name, coll_name=coll_name))
+    if indicadores_historicos.empty:
+        st.warning(
+            "Nenhuma conta encontrada na coleção de folhas. Sincronize a empresa com sincronizar_folhas.")
+else:
+    with st.spinner("Carregando dados do MongoDB (isso pode demorar na primeira vez)..."):
+        df_hist = cache.obter_ou_calcular(
+            (coll_name, versao_dados, "df_hist"), _carregar_df_hist)
+
+    # Cria DataFrame de forma segura
+    if df_hist.empty:
+        st.warning(
+            "Nenhum documento/processamento retornou dados. Verifique a coleção ou o extractor.")
+
+    # Processa indicadores apenas se houver dados
+    indicadores_historicos = cache.obter_ou_calcular(
+        (coll_name, versao_dados, "indicadores"), _calcular_indicadores)
+# Séries derivadas (YoY, TTM, YTD, médias móveis) em cache junto dos indicadores
+derivadas = cache.obter_ou_calcular(
+    (coll_name, versao_dados, "derivadas"),
+    lambda: derivar_series(indicadores_historicos))
+
+if indicadores_historicos.empty:
     indicadores_foto = pd.DataFrame()
 else:
-    indicadores_historicos = processar_indicadores_financeiros(df_hist)
     ultimo_mes = indicadores_historicos.index.max()
     if pd.isna(ultimo_mes):
         indicadores_foto = pd.DataFrame()
@@ -71,14 +126,13 @@ def safe_get(ind_df, col):
 # ======================
 # FUNÇÃO DE FILTRO DE ANO
 # ======================
-def filtro_ano(df_plot):
+def filtro_ano(indicadores):
     """
-    Cria um seletor de ano no Streamlit e retorna o DataFrame filtrado.
-    O campo 'mes' deve estar no formato 'YYYY-MM'.
+    Cria um seletor de ano no Streamlit e retorna a lista de anos escolhidos.
+    O índice 'mes' deve estar no formato 'YYYY-MM'.
     """
     # Extrair anos únicos ordenados
-    df_plot["ano"] = df_plot["mes"].astype(str).str[:4]
-    anos = sorted(df_plot["ano"].unique())
+    anos = sorted(pd.Index(indicadores.index).astype(str).str[:4].unique())
 
     # Caixa visual estilizada
     st.markdown("""
@@ -110,29 +164,48 @@ def filtro_ano(df_plot):
 
     st.markdown('</div>', unsafe_allow_html=True)
 
-    # Filtra o DataFrame conforme o(s) ano(s) escolhidos
-    df_filtrado = df_plot[df_plot["mes"].str[:4].isin(ano_selecionado)]
-
-    return df_filtrado, ano_selecionado    
+    return ano_selecionado
 
 
 serie = indicadores_historicos['Margem_de_Lucro']
 
+# Backend de previsão: "arima" (auto_arima, padrão) ou "rapido"
+# (utils.previsao_rapida: AR/Holt-Winters/sazonal ingênuo em milissegundos)
+BACKEND_PREVISAO = os.environ.get("CONSULX_BACKEND_PREVISAO", "arima")
+if BACKEND_PREVISAO == "rapido":
+    def prever_serie(serie):
+        # o backend rápido informa os pesos psi no próprio backtest
+        return (*previsao_rapida(serie), None)
+    backtest_serie = backtest_rapido
+else:
+    def prever_serie(serie):
+        # o modelo ajustado na série inteira dá os pesos psi dos intervalos
+        return previsao_auto_arima(serie, retornar_modelo=True)
+    backtest_serie = backtest_auto_arima
 
-previsao_futura = previsao_auto_arima(serie)[0]
-ordem = previsao_auto_arima(serie)[1]
+previsao_futura, ordem, modelo_previsao = cache.obter_ou_calcular(
+    (coll_name, versao_dados, "previsao_modelo", BACKEND_PREVISAO, "Margem_de_Lucro"),
+    lambda: prever_serie(serie))
 
 previsao_futura = previsao_futura.to_frame().reset_index()
 previsao_futura.columns = ['ds', 'forecast']
 
 # res = resultado['forecast_df']
-resultado = backtest_auto_arima(serie, n_testes=6, seasonal=False)
+resultado = cache.obter_ou_calcular(
+    (coll_name, versao_dados, "backtest", BACKEND_PREVISAO, "Margem_de_Lucro"),
+    lambda: backtest_serie(serie, n_testes=6))
 res = pd.DataFrame({
     'ds': resultado['reais'].index,
     'y_true': resultado['reais'].values,
     'y_pred': resultado['previsoes'].values
 })
 
+# Intervalos de previsão por bootstrap dos resíduos do backtest (80% e 95%)
+intervalos_previsao = cache.obter_ou_calcular(
+    (coll_name, versao_dados, "intervalos", BACKEND_PREVISAO, "Margem_de_Lucro"),
+    lambda: intervalos_backtest(previsao_futura.set_index('ds')['forecast'], resultado,
+                                modelo=modelo_previsao))
+
 
 
 # Dados de exemplo
@@ -479,285 +552,57 @@ with abas[0]:  # Aba "Contábil"
     # GRÁFICOS DE INDICADORES TEMPORAIS
     # ======================
 
-    # Converter índice para coluna e ordenar
-    df_plot = indicadores_historicos.reset_index().sort_values("mes")
-    df_plot["mes"] = df_plot["mes"].astype(str)
-    df_plot, anos_escolhidos = filtro_ano(df_plot)
-
-    df_plot["Banco"] = df_plot["Disponibilidade_Caixa"] * 0.5
-    df_plot["Investimento"] = df_plot["Disponibilidade_Caixa"] * 0.3
-    df_plot["Caixa"] = df_plot["Disponibilidade_Caixa"] * 0.2
-
-    # Função para criar gráfico de barras por indicador
+    # Figuras prontas, memorizadas por (empresa, versão dos dados, anos):
+    # trocar de ano/aba não refaz o reshaping nem a especificação Plotly
+    anos_escolhidos = filtro_ano(indicadores_historicos)
+
+    # Últimos 12 meses e variação contra o ano anterior (utils.derivadas)
+    if not derivadas.empty:
+        ultimo_derivado = derivadas.iloc[-1]
+        col_rec, col_luc, col_marg = st.columns(3)
+        col_rec.metric("Receita Líquida (12 meses)",
+                       f"R$ {ultimo_derivado['Receita_Líquida_TTM']:,.0f}",
+                       f"{ultimo_derivado['Receita_Líquida_YoY']:+.1%} no ano")
+        col_luc.metric("Lucro Líquido (12 meses)",
+                       f"R$ {ultimo_derivado['Lucro_Líquido_TTM']:,.0f}",
+                       f"{ultimo_derivado['Lucro_Líquido_YoY']:+.1%} no ano")
+        col_marg.metric("Margem de Lucro (12 meses)",
+                        f"{ultimo_derivado['Margem_de_Lucro_TTM']:.1%}",
+                        f"{ultimo_derivado['Margem_de_Lucro_TTM_YoY'] * 100:+.1f} p.p. no ano")
+
+    # a ordem de clique dos anos não muda as figuras
+    anos_ordenados = sorted(anos_escolhidos)
+    figuras = cache.obter_ou_calcular(
+        (coll_name, versao_dados, "figuras_contabil", tuple(anos_ordenados)),
+        lambda: figuras_contabil(indicadores_historicos, anos_ordenados,
+                                 derivadas=derivadas))
 
     col1, col2 = st.columns(2)
 
     # 1️⃣ Receita Líquida / Receita Bruta
     with col1:
-        fig_receita = px.bar(
-            df_plot,
-            x="mes",
-            y=["Receita_Bruta", "Receita_Líquida"],
-            barmode="group",
-            title="RECEITA LÍQUIDA / RECEITA BRUTA",
-            labels={
-                "mes": "Mês",
-                "value": "Valor (R$)",
-                "variable": "Indicador"
-            },
-            color_discrete_map={
-                "Receita_Bruta": "#B0B0B0",   # Cinza médio
-                "Receita_Líquida": "#595959"  # Cinza escuro
-            },
-            text_auto=".2s"
-        )
-
-        fig_receita.update_traces(
-            textposition="outside",
-            marker_line_width=0.8,
-            marker_line_color="#E0E0E0"
-        )
-
-        fig_receita.update_layout(
-            title={
-                "text": "RECEITA LÍQUIDA / RECEITA BRUTA",
-                "x": 0.5,          # Centraliza o título
-                "xanchor": "center",
-                "yanchor": "top"
-                
-            },
-            plot_bgcolor="#ffffff",
-            paper_bgcolor="#ffffff",
-            xaxis_title="Mês",
-            yaxis_title="Valor (R$)",
-            bargap=0.25,
-            font=dict(color="#333", size=13),
-            legend=dict(
-                orientation="h",
-                yanchor="top",
-                y=-0.25,
-                xanchor="center",
-                x=0.5,
-                title_text=""
-            ),
-            hovermode="x unified"
-        )
-
-        st.plotly_chart(fig_receita, use_container_width=True)
-
+        st.plotly_chart(figuras["receita"], use_container_width=True)
 
     # 2️⃣ Disponibilidade de Caixa
     with col2:
-        df_caixa_melt = df_plot.melt(
-            id_vars=["mes"],
-            value_vars=["Banco", "Investimento", "Caixa"],
-            var_name="Composição",
-            value_name="Valor"
-        )
-
-        fig_caixa = px.bar(
-            df_caixa_melt,
-            x="mes",
-            y="Valor",
-            color="Composição",
-            barmode="stack",
-            title="DISPONIBILIDADE DE CAIXA",
-            labels={
-                "mes": "Mês",
-                "Valor": "Valor (R$)",
-                "Composição": "Composição"
-            },
-            color_discrete_map={
-                "Banco": "#D9D9D9",         # cinza claro
-                "Investimento": "#A6A6A6",  # cinza médio
-                "Caixa": "#595959"          # cinza escuro
-            }
-        )
-
-        fig_caixa.update_traces(
-            texttemplate="%{y:,.0f}",
-            textposition="inside"
-        )
-
-        fig_caixa.update_layout(
-            title={
-                "text": "DISPONIBILIDADE DE CAIXA",
-                "x": 0.5,       # centraliza o título
-                "xanchor": "center",
-                "yanchor": "top"
-            },
-            plot_bgcolor="#ffffff",
-            paper_bgcolor="#ffffff",
-            xaxis_title="Mês",
-            yaxis_title="Valor (R$)",
-            font=dict(color="#333", size=11),
-            legend=dict(
-                orientation="h",
-                yanchor="top",
-                y=-0.25,
-                xanchor="center",
-                x=0.5,
-                title_text=""
-            ),
-            bargap=0.2,
-            hovermode="x unified"
-        )
-
-        st.plotly_chart(fig_caixa, use_container_width=True)
-
+        st.plotly_chart(figuras["caixa"], use_container_width=True)
 
     # Segunda linha de gráficos
     col3, col4 = st.columns(2)
 
     # 3️⃣ Custo / Receita Líquida
     with col3:
-        fig_custo = px.area(
-            df_plot,
-            x="mes",
-            y=["Custo_Total", "Receita_Líquida"],
-            title="CUSTO / RECEITA LÍQUIDA",
-            labels={
-                "mes": "Mês",
-                "value": "Valor (R$)",
-                "variable": "Indicador"
-            },
-            color_discrete_map={
-                "Custo_Total": "#595959",    # cinza escuro
-                "Receita_Líquida": "#D9D9D9" # dourado vibrante
-            }
-        )
-
-        # 🔹 Linhas mais suaves e preenchimento translúcido
-        fig_custo.update_traces(
-            mode="lines",
-            line=dict(width=3),
-            opacity=0.4
-        )
-
-        # 🔹 Layout refinado e legendas bem posicionadas
-        fig_custo.update_layout(
-            title={
-            "text": "CUSTO / RECEITA LÍQUIDA",
-            "x": 0.5,       # centraliza o título
-            "xanchor": "center",
-            "yanchor": "top"
-            },
-            plot_bgcolor="#ffffff",
-            paper_bgcolor="#ffffff",
-            xaxis_title="Mês",
-            yaxis_title="Valor (R$)",
-            font=dict(color="#333", size=13),
-            legend=dict(
-                orientation="h",
-                yanchor="top",
-                y=-0.2,
-                xanchor="center",
-                x=0.5,
-                title_text=""
-            ),
-            hovermode="x unified"
-        )
-
-        st.plotly_chart(fig_custo, use_container_width=True)
-
-
+        st.plotly_chart(figuras["custo"], use_container_width=True)
 
     # 4️⃣ Receita Líquida (barra simples)
     with col4:
-        fig_liquida = px.bar(
-            df_plot,
-            x="mes",
-            y="Receita_Líquida",
-            title="RECEITA LÍQUIDA",
-            text_auto=".2s",
-            color_discrete_sequence=["#595959"],
-            labels={"mes": "Mês", "Receita_Líquida": "Valor (R$)"}
-        )
-
-        fig_liquida.update_layout(
-            title={
-            "text": "RECEITA LÍQUIDA",
-            "x": 0.5,       # centraliza o título
-            "xanchor": "center",
-            "yanchor": "top"
-            },
-            plot_bgcolor="#ffffff",
-            xaxis_title="Mês",
-            yaxis_title="Receita Líquida (R$)",
-            legend=dict(
-                orientation="h",
-                yanchor="top",
-                y=-0.25,
-                xanchor="center",
-                x=0.5
-            )
-        )
-
-        st.plotly_chart(fig_liquida, use_container_width=True)
-    
+        st.plotly_chart(figuras["receita_liquida"], use_container_width=True)
 
     col5, = st.columns(1)
 
     # 5️⃣ Margem de Lucro (%)
     with col5:
-        # Calcula a margem de lucro
-        df_plot["Margem_de_Lucro"] = (df_plot["Lucro_Líquido"] / df_plot["Receita_Líquida"])  # mantém como fração
-
-        # Cria gráfico de linha
-        fig_margem = px.line(
-            df_plot,
-            x="mes",
-            y="Margem_de_Lucro",
-            title="MARGEM DE LUCRO (%)",
-            markers=True,
-            labels={
-                "mes": "Mês",
-                "Margem_de_Lucro": "Margem (%)"
-            },
-            hover_data={
-                "Margem_de_Lucro": ":.1%",  # Formato percentual
-            }
-        )
-
-        # Ajusta visual da linha
-        fig_margem.update_traces(
-            line=dict(width=3, color="#595959"),
-            marker=dict(size=8)
-        )
-
-        # Layout do gráfico
-        fig_margem.update_layout(
-            title={
-                "text": "MARGEM DE LUCRO (%)",
-                "x": 0.5,
-                "xanchor": "center",
-                "yanchor": "top"
-            },
-            plot_bgcolor="#FFFFFF",
-            paper_bgcolor="#FFFFFF",
-            font=dict(color="#333333", size=12),
-            xaxis_title="Mês",
-            yaxis_title="Margem (%)",
-            xaxis=dict(showgrid=False),
-            yaxis=dict(showgrid=True, gridcolor="#E5E5E5", tickformat=".0%"),  # Eixo Y em porcentagem
-            hovermode="x unified",
-            title_font=dict(size=18, color="#000000"),
-            annotations=[
-                dict(
-                    x=0.5,
-                    y=1.08,
-                    xref="paper",
-                    yref="paper",
-                    text="",  # sem texto visível
-                    showarrow=False,
-                    hovertext="A Margem de Lucro (%) indica a porcentagem da receita líquida que se transforma em lucro líquido, mostrando a eficiência da empresa em gerar lucro.",
-                    hoverlabel=dict(bgcolor="white", font_size=12)
-                )
-            ]
-        )
-
-        # Exibe o gráfico
-        st.plotly_chart(fig_margem, use_container_width=True)
+        st.plotly_chart(figuras["margem"], use_container_width=True)
 
 
 with abas[2]:
@@ -794,7 +639,7 @@ with abas[2]:
     ))
 
     fig_backtest.update_layout(
-        title=f"<b>BACKTEST - ML LUCRO REAL x ML LUCRO PREVISTO</b><br><sup>Comparação entre valores reais e previstos da Margem Líquida de Lucro. <br><i>Ordem do modelo ARIMA: {ordem}</i></sup>",
+        title=f"<b>BACKTEST - ML LUCRO REAL x ML LUCRO PREVISTO</b><br><sup>Comparação entre valores reais e previstos da Margem Líquida de Lucro. <br><i>{'Ordem do modelo ARIMA' if BACKEND_PREVISAO == 'arima' else 'Modelo'}: {ordem}</i></sup>",
         xaxis_title="Mês",
         yaxis_title="Margem Líquida de Lucro",
         plot_bgcolor="#FFFFFF",
@@ -822,7 +667,6 @@ with abas[2]:
 
     # Cálculos estatísticos
     mean_value = previsao_futura["forecast"].mean()
-    std_value = previsao_futura["forecast"].std()
 
     # Gráfico com mais picos e responsividade ao cursor
     fig_previsao = px.line(
@@ -834,17 +678,23 @@ with abas[2]:
         line_shape="linear"  # evita suavização excessiva
     )
 
-    # Limites de controle e média histórica
+    # Média e intervalos de previsão (bootstrap dos resíduos do backtest)
     fig_previsao.add_hline(y=mean_value, line_dash="solid", line_color="#000", line_width=2,)
-    fig_previsao.add_hline(y=mean_value + 3*std_value, line_dash="dot", line_color="#999")
-    fig_previsao.add_hline(y=mean_value - 3*std_value, line_dash="dot", line_color="#999")
+    for nivel, cor in ((95, "rgba(166,166,166,0.18)"), (80, "rgba(89,89,89,0.22)")):
+        fig_previsao.add_trace(go.Scatter(
+            x=intervalos_previsao.index, y=intervalos_previsao[f"superior_{nivel}"],
+            mode="lines", line=dict(width=0), showlegend=False, hoverinfo="skip"))
+        fig_previsao.add_trace(go.Scatter(
+            x=intervalos_previsao.index, y=intervalos_previsao[f"inferior_{nivel}"],
+            mode="lines", line=dict(width=0), fill="tonexty", fillcolor=cor,
+            name=f"Intervalo {nivel}%"))
 
     # Estilo da linha principal
-    fig_previsao.update_traces(line=dict(color="#a6a6a6", width=3), marker=dict(size=6, color="#595959", line=dict(width=1, color="#fff")))
+    fig_previsao.update_traces(line=dict(color="#a6a6a6", width=3), marker=dict(size=6, color="#595959", line=dict(width=1, color="#fff")), selector=dict(mode="lines+markers"))
 
     # Layout e storytelling
     fig_previsao.update_layout(
-        title=f"<b>PREVISÃO FUTURA - MARGEM DE LUCRO LÍQUIDA </b><br><sup>Inclui média histórica e limites de variação para análise de tendência.<br></sup>",
+        title=f"<b>PREVISÃO FUTURA - MARGEM DE LUCRO LÍQUIDA </b><br><sup>Inclui média histórica e intervalos de previsão de 80% e 95% (bootstrap dos resíduos do backtest).<br></sup>",
         plot_bgcolor="#FFFFFF",
         paper_bgcolor="#FFFFFF",
         font=dict(color="#333", size=12),
@@ -900,9 +750,162 @@ with abas[2]:
             </div>
             """, unsafe_allow_html=True)
 
+    # =====================================
+    # 3️⃣ RISCO DE LIQUIDEZ - Monte Carlo conjunto (utils.simulacao)
+    # =====================================
+    st.markdown("### Risco de liquidez nos próximos 6 meses")
+    try:
+        risco = cache.obter_ou_calcular(
+            (coll_name, versao_dados, "risco_liquidez"),
+            lambda: simular_liquidez(indicadores_historicos, horizon=6))
+    except ValueError as e:
+        st.info(str(e))
+    else:
+        col_li, col_lc, col_caixa = st.columns(3)
+        col_li.metric("P(Liquidez Imediata < 1)", f"{risco['no_horizonte']['Liquidez_Imediata']:.0%}")
+        col_lc.metric("P(Liquidez Corrente < 1)", f"{risco['no_horizonte']['Liquidez_Corrente']:.0%}")
+        col_caixa.metric("P(Caixa negativo)", f"{risco['no_horizonte']['Caixa_Negativo']:.0%}")
+
+        fig_risco = px.line(
+            risco["probabilidades"].reset_index(), x="mes",
+            y=["Liquidez_Imediata", "Liquidez_Corrente", "Caixa_Negativo"],
+            markers=True,
+            labels={"mes": "Mês", "value": "Probabilidade", "variable": "Evento"},
+            color_discrete_sequence=["#595959", "#A6A6A6", "#000000"])
+        fig_risco.update_layout(
+            title="<b>PROBABILIDADE DOS EVENTOS DE LIQUIDEZ POR MÊS</b><br><sup>Caminhos simulados com bootstrap conjunto dos erros de caixa, receita, custo e circulantes.</sup>",
+            plot_bgcolor="#FFFFFF",
+            paper_bgcolor="#FFFFFF",
+            yaxis=dict(showgrid=True, gridcolor="#E5E5E5", tickformat=".0%", range=[0, 1]),
+            hovermode="x unified",
+            legend=dict(orientation="h", yanchor="top", y=-0.25, xanchor="center", x=0.5,
+                        title_text=""))
+        st.plotly_chart(fig_risco, use_container_width=True)
+
 
 with abas[3]:  # Aba "Analítico"
     st.subheader("Métricas do Balancete")
     indicadores_historicos
+
+    # ======================
+    # Plano de contas: drill-down de nivel_1 até as contas analíticas. Os totais
+    # de todos os nós ficam pré-calculados (utils.hierarquia) e só os filhos do
+    # nível aberto são montados e exibidos.
+    # ======================
+    st.subheader("Plano de contas")
+    if USAR_PUSHDOWN or df_hist.empty:
+        st.info("O plano de contas exige as contas analíticas (desative CONSULX_PUSHDOWN).")
+    else:
+        indice_contas = cache.obter_ou_calcular(
+            (coll_name, versao_dados, "hierarquia"), lambda: IndiceHierarquia(df_hist))
+        n_meses = st.selectbox("Meses exibidos", (3, 6, 12, 24, 36), index=2,
+                               key="arvore_meses")
+
+        caminho = ()
+        colunas_arvore = st.columns(len(indice_contas.niveis))
+        for nivel, coluna in enumerate(colunas_arvore, start=1):
+            grupos = indice_contas.filhos(caminho, meses=[])
+            grupos = grupos.index[~grupos["folha"]]
+            if not len(grupos):
+                break
+            escolha = coluna.selectbox(f"Nível {nivel}", ["(todos)"] + list(grupos),
+                                       key=f"arvore_{option}_{'/'.join(caminho)}")
+            if escolha == "(todos)":
+                break
+            caminho += (escolha,)
+
+        st.caption(" › ".join(caminho) if caminho else "Grupos de nível 1")
+        st.dataframe(indice_contas.filhos(caminho, meses=indice_contas.meses[-n_meses:]),
+                     use_container_width=True)
+
+    # ======================
+    # Movimentações atípicas: escore robusto (mediana/MAD) de cada conta contra
+    # os 12 meses anteriores (utils.anomalias)
+    # ======================
+    st.subheader("Movimentações atípicas")
+    if USAR_PUSHDOWN or df_hist.empty:
+        st.info("A detecção de anomalias exige as contas analíticas (desative CONSULX_PUSHDOWN).")
+    else:
+        anomalias = cache.obter_ou_calcular(
+            (coll_name, versao_dados, "anomalias"), lambda: detectar_anomalias(df_hist))
+        if anomalias.empty:
+            st.success("Nenhuma movimentação atípica encontrada.")
+        else:
+            col_grupo, col_campo = st.columns(2)
+            grupos_anomalia = col_grupo.multiselect(
+                "Grupos", sorted(anomalias["nivel_1"].dropna().unique()), key="anomalias_grupos")
+            campos_anomalia = col_campo.multiselect(
+                "Campos", sorted(anomalias["campo"].unique()), key="anomalias_campos")
+            filtradas = anomalias
+            if grupos_anomalia:
+                filtradas = filtradas[filtradas["nivel_1"].isin(grupos_anomalia)]
+            if campos_anomalia:
+                filtradas = filtradas[filtradas["campo"].isin(campos_anomalia)]
+            st.caption(f"{len(filtradas)} movimentação(ões) com |escore| > 3,5")
+            st.dataframe(filtradas, use_container_width=True, hide_index=True)
+
+    # ======================
+    # Cenários: choques em custos e receitas, avaliados em lote (utils.cenarios)
+    # ======================
+    st.subheader("Cenários")
+    if USAR_PUSHDOWN or df_hist.empty:
+        st.info("Cenários exigem as contas analíticas (desative CONSULX_PUSHDOWN).")
+    else:
+        simulador = cache.obter_ou_calcular(
+            (coll_name, versao_dados, "cenarios"),
+            lambda: SimuladorCenarios(df_hist, ["CUSTOS E DESPESAS", "RECEITAS"]))
+        col_custos, col_receitas = st.columns(2)
+        var_custos = col_custos.slider("Variação dos custos (%)", -30, 30, 0, step=1)
+        var_receitas = col_receitas.slider("Variação das receitas (%)", -30, 30, 0, step=1)
+
+        cenario = simulador.avaliar(
+            [{"CUSTOS E DESPESAS": 1 + var_custos / 100, "RECEITAS": 1 + var_receitas / 100}])
+        st.dataframe(simulador.indicadores(cenario)[
+            ["Receita_Líquida", "Custo_Total", "Lucro_Líquido", "Margem_de_Lucro"]].tail(12))
+
+        # grade custos × receitas: margem do último mês
+        passos = [x / 100 for x in range(-30, 31, 5)]
+        indice, fatores = simulador.grade({"CUSTOS E DESPESAS": [1 + p for p in passos],
+                                           "RECEITAS": [1 + p for p in passos]})
+        grade = simulador.tabela(simulador.avaliar(fatores), "Margem_de_Lucro", indice)
+        mapa = grade.iloc[:, -1].unstack("RECEITAS")
+        fig_grade = px.imshow(
+            mapa.to_numpy(), x=[f"{p:+.0%}" for p in passos], y=[f"{p:+.0%}" for p in passos],
+            labels={"x": "Receitas", "y": "Custos", "color": "Margem"},
+            color_continuous_scale="Greys", aspect="auto",
+            title=f"MARGEM DE LUCRO EM {simulador.meses[-1]} POR CENÁRIO")
+        st.plotly_chart(fig_grade, use_container_width=True)
+
+    # ======================
+    # Relatórios PDF (gerados em segundo plano, em cache por versão dos dados)
+    # ======================
+    st.subheader("Relatórios PDF")
+    relatorios = st.session_state.setdefault("relatorios", {})
+
+    col_empresa, col_todas = st.columns(2)
+    if col_empresa.button("Gerar relatório desta empresa"):
+        relatorios[option] = gerador.submeter(
+            option, versao_dados, indicadores=indicadores_historicos,
+            previsao=intervalos_previsao, origem_previsao=BACKEND_PREVISAO,
+            plano=plano_da_empresa(coll_name))
+    if col_todas.button("Gerar relatórios de todas as empresas"):
+        for empresa, (db_empresa, coll_empresa) in EMPRESAS.items():
+            relatorios[empresa] = gerador.submeter(
+                empresa, versao_colecao(db_name=db_empresa, coll_name=coll_empresa),
+                fonte=(db_empresa, coll_empresa), plano=plano_da_empresa(coll_empresa))
+
+    for empresa, futuro in relatorios.items():
+        if not futuro.done():
+            st.info(f"{empresa}: relatório em geração...")
+        elif futuro.exception() is not None:
+            st.error(f"{empresa}: falha ao gerar o relatório ({futuro.exception()}).")
+        else:
+            with open(futuro.result(), "rb") as arquivo:
+                st.download_button(
+                    f"Baixar relatório - {empresa}", data=arquivo.read(),
+                    file_name=os.path.basename(os.path.dirname(futuro.result())) + ".pdf",
+                    mime="application/pdf", key=f"download_{empresa}")
+    if any(not f.done() for f in relatorios.values()):
+        st.button("Atualizar status dos relatórios")
     
     #df_hist
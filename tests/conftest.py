@@ -0,0 +1,21 @@
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+from utils.db import load_all_rows_from_json
+from utils.functions import processar_indicadores_financeiros
+
+
+BALANCETES = Path(__file__).resolve().parent.parent / "balancetes"
+
+
+@pytest.fixture(scope="session")
+def linhas():
+    """Contas analíticas dos 36 meses de exemplo (industrial_nordeste)."""
+    return pd.DataFrame(load_all_rows_from_json(BALANCETES / "industrial_nordeste"))
+
+
+@pytest.fixture(scope="session")
+def indicadores(linhas):
+    return processar_indicadores_financeiros(linhas)
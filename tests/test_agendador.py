@@ -0,0 +1,41 @@
+import time
+
+from tests.conftest import BALANCETES
+from utils.agendador import Agendador
+
+
+def test_fonte_vazia_falha_sem_novas_tentativas(tmp_path):
+    vazia = tmp_path / "vazia"
+    vazia.mkdir()
+    agendador = Agendador(":memory:", workers=1, espera_base=60, processos=False)
+    agendador.enfileirar_empresa("json", vazia, saida=tmp_path / "saida",
+                                 etapas=("ingerir", "validar", "achatar", "indicadores"))
+
+    inicio = time.monotonic()
+    resumo = agendador.executar()
+
+    assert time.monotonic() - inicio < 30
+    assert resumo["falhou"] == 1 and resumo["cancelado"] == 2
+    job = agendador.job("vazia/validar")
+    assert job["tentativas"] == 1
+    assert job["erro"].startswith("ErroEntrada: Nenhuma conta encontrada")
+
+
+def test_cadeia_completa_de_uma_empresa(tmp_path):
+    agendador = Agendador(":memory:", workers=1, processos=False)
+    agendador.enfileirar_empresa("json", BALANCETES / "industrial_nordeste",
+                                 saida=tmp_path, etapas=("ingerir", "achatar", "indicadores"))
+
+    assert agendador.executar()["concluido"] == 3
+    assert (tmp_path / "industrial_nordeste_indicadores.csv").exists()
+
+
+def test_arquivo_de_folhas_vazio_falha_sem_novas_tentativas(tmp_path):
+    (tmp_path / "industrial_nordeste_folhas.csv").write_text("")
+    agendador = Agendador(":memory:", workers=1, espera_base=60, processos=False)
+    agendador.enfileirar_empresa("json", BALANCETES / "industrial_nordeste",
+                                 saida=tmp_path, etapas=("indicadores",))
+
+    assert agendador.executar()["falhou"] == 1
+    job = agendador.job("industrial_nordeste/indicadores")
+    assert job["tentativas"] == 1 and job["erro"].startswith("ErroEntrada")
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from utils.agregacao import agregar_indicadores, agregar_para_grafico, escolher_frequencia
+from utils.functions import COLUNAS_FLUXO, COLUNAS_SALDO
+
+
+def test_trimestre_soma_fluxos_e_pega_saldo_do_fim(indicadores):
+    trimestral = agregar_indicadores(indicadores, "T")
+    assert len(trimestral) == 12
+    assert trimestral.index[0] == "2022-T1"
+    meses = ["2023-04", "2023-05", "2023-06"]
+    for coluna in COLUNAS_FLUXO:
+        assert np.isclose(trimestral.loc["2023-T2", coluna], indicadores.loc[meses, coluna].sum())
+    for coluna in COLUNAS_SALDO:
+        assert trimestral.loc["2023-T2", coluna] == indicadores.loc["2023-06", coluna]
+
+
+def test_indices_sao_recalculados_e_nao_a_media(indicadores):
+    trimestral = agregar_indicadores(indicadores, "T")
+    meses = indicadores.loc["2023-04":"2023-06"]
+    margem = trimestral.loc["2023-T2", "Margem_de_Lucro"]
+    lucro = meses["Lucro_Líquido"].sum()
+    receita = meses["Receita_Líquida"].sum()
+    assert np.isclose(margem, lucro / receita)
+    assert not np.isclose(margem, meses["Margem_de_Lucro"].mean())
+    liquidez = trimestral.loc["2023-T2", "Liquidez_Corrente"]
+    fim = indicadores.loc["2023-06"]
+    assert np.isclose(liquidez, fim["Ativo_Circulante"] / fim["Passivo_Circulante"])
+
+
+def test_saldo_faltando_no_fim_do_periodo_fica_nan(indicadores):
+    tabela = indicadores.copy()
+    tabela.loc["2023-06", "Disponibilidade_Caixa"] = np.nan
+    trimestral = agregar_indicadores(tabela, "T")
+    assert np.isnan(trimestral.loc["2023-T2", "Disponibilidade_Caixa"])
+    assert np.isnan(trimestral.loc["2023-T2", "Liquidez_Imediata"])
+    assert trimestral.loc["2023-T3", "Disponibilidade_Caixa"] == tabela.loc["2023-09", "Disponibilidade_Caixa"]
+
+
+def test_ano_e_escolha_automatica(indicadores):
+    anual = agregar_indicadores(indicadores, "A")
+    assert list(anual.index) == ["2022", "2023", "2024"]
+    assert np.isclose(anual.loc["2024", "Receita_Bruta"],
+                      indicadores.loc["2024-01":"2024-12", "Receita_Bruta"].sum())
+    assert list(anual.columns) == list(indicadores.columns)
+
+    assert escolher_frequencia(36) == "M"
+    assert escolher_frequencia(37) == "T"
+    assert escolher_frequencia(120, max_pontos=24) == "A"
+    tabela, frequencia = agregar_para_grafico(indicadores, max_pontos=12)
+    assert frequencia == "T" and len(tabela) == 12
+
+
+def test_frequencia_invalida(indicadores):
+    with pytest.raises(ValueError):
+        agregar_indicadores(indicadores, "S")
+    assert agregar_indicadores(indicadores, "M") is indicadores
+    vazia = indicadores.iloc[:0]
+    assert agregar_indicadores(vazia, "T") is vazia
@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from tests.conftest import BALANCETES
+from utils.anomalias import detectar_anomalias, escores_robustos, mediana_janelas
+from utils.db import load_all_rows_from_json
+
+
+@pytest.fixture(scope="module")
+def folhas():
+    return pd.DataFrame(load_all_rows_from_json(BALANCETES / "industrial_nordeste",
+                                                saldos_completos=True))
+
+
+def test_mediana_janelas_igual_a_nanmedian():
+    rng = np.random.default_rng(0)
+    janelas = rng.normal(size=(50, 7, 12))
+    janelas[rng.random(janelas.shape) < 0.3] = np.nan
+    janelas[0, 0] = np.nan
+    with np.errstate(all="ignore"), pytest.warns(RuntimeWarning):
+        esperado = np.nanmedian(janelas, axis=-1)
+    np.testing.assert_allclose(mediana_janelas(janelas), esperado, equal_nan=True)
+
+
+def _conta_estavel(folhas):
+    """Conta com débito em todos os meses, para receber o salto."""
+    debitos = folhas.loc[folhas["debito"] > 0].groupby("conta")["mes"].nunique()
+    return debitos.idxmax()
+
+
+def test_salto_num_debito_e_sinalizado(folhas):
+    conta = _conta_estavel(folhas)
+    df = folhas.copy()
+    celula = df.index[(df["conta"] == conta) & (df["mes"] == "2024-06")]
+    df.loc[celula, "debito"] = df.loc[df["conta"] == conta, "debito"].median() * 50
+
+    anomalias = detectar_anomalias(df, campos=("debito",))
+    sinalizada = anomalias.loc[(anomalias["conta"] == conta) & (anomalias["mes"] == "2024-06")]
+    assert len(sinalizada) == 1
+    assert anomalias.iloc[0]["conta"] == conta and anomalias.iloc[0]["escore"] > 3.5
+
+
+def test_min_historico_suprime_os_primeiros_meses():
+    valores = np.arange(1.0, 21.0)[None, :] * 100
+    escores, _ = escores_robustos(valores, janela=12, min_historico=6)
+    assert np.isnan(escores[0, :6]).all()
+    assert np.isfinite(escores[0, 6:]).all()
+
+
+def test_conta_sem_codigo_entra_pelo_caminho(folhas):
+    conta = _conta_estavel(folhas)
+    df = folhas.copy()
+    linhas = df["conta"] == conta
+    df.loc[(linhas) & (df["mes"] == "2024-06"), "debito"] = \
+        df.loc[linhas, "debito"].median() * 50
+    df.loc[linhas, "conta"] = None
+
+    anomalias = detectar_anomalias(df, campos=("debito",))
+    caminho = anomalias.loc[anomalias["mes"] == "2024-06", "conta"]
+    assert caminho.str.startswith(df.loc[linhas, "nivel_1"].iloc[0] + " > ").any()
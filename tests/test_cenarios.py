@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.cenarios import SimuladorCenarios
+from utils.functions import processar_indicadores_financeiros
+
+ALVOS = ["CUSTOS E DESPESAS", "RECEITAS"]
+
+
+@pytest.fixture(scope="module")
+def simulador(linhas):
+    return SimuladorCenarios(linhas, ALVOS)
+
+
+def _comparar(obtido, esperado):
+    obtido = obtido[esperado.columns]
+    np.testing.assert_allclose(obtido.to_numpy(), esperado.to_numpy(), rtol=1e-10, atol=1e-10)
+    assert list(obtido.index) == list(esperado.index)
+
+
+def test_choques_multiplicativos_iguais_aos_dados_editados(simulador, linhas):
+    resultado = simulador.avaliar([{"CUSTOS E DESPESAS": 1.1, "RECEITAS": 0.95}])
+
+    editado = linhas.copy()
+    for alvo, fator in zip(ALVOS, (1.1, 0.95)):
+        editado.loc[editado["nivel_1"] == alvo, "saldo_atual"] *= fator
+    _comparar(simulador.indicadores(resultado), processar_indicadores_financeiros(editado))
+
+
+def test_choque_aditivo_rateado_pelo_saldo_absoluto(simulador, linhas, indicadores):
+    resultado = simulador.avaliar(deslocamentos=[{"RECEITAS": 1000.0}])
+
+    editado = linhas.copy()
+    receitas = editado["nivel_1"] == "RECEITAS"
+    absoluto = editado.loc[receitas, "saldo_atual"].abs()
+    total = absoluto.groupby(editado.loc[receitas, "mes"]).transform("sum")
+    editado.loc[receitas, "saldo_atual"] += 1000.0 * absoluto / total
+    cenario = simulador.indicadores(resultado)
+    _comparar(cenario, processar_indicadores_financeiros(editado))
+
+    # RECEITAS tem deduções negativas: cada grupo recebe uma parte do choque, de mesmo sinal
+    bruta = cenario["Receita_Bruta"] - indicadores["Receita_Bruta"]
+    impostos = cenario["Impostos_Receita"] - indicadores["Impostos_Receita"]
+    assert ((bruta > 0) & (bruta < 1000)).all() and (impostos > 0).all()
+    np.testing.assert_allclose(bruta + impostos, 1000.0)
@@ -0,0 +1,23 @@
+import pandas as pd
+
+from tests.conftest import BALANCETES
+from utils import cli
+
+
+def test_lote_grava_o_mesmo_que_uma_empresa_por_processo(tmp_path):
+    origem = str(BALANCETES / "industrial_nordeste")
+    avulso = cli.processar_empresa("json", origem, tmp_path / "avulso")
+    [(origem_lote, lote)] = cli.processar_lote([origem], tmp_path / "lote")
+
+    assert origem_lote == origem
+    assert lote["meses"] == avulso["meses"]
+    pd.testing.assert_frame_equal(pd.read_csv(lote["arquivos"][0]),
+                                  pd.read_csv(avulso["arquivos"][0]))
+
+
+def test_lote_devolve_a_excecao_de_cada_fonte_sem_interromper(tmp_path):
+    resultados = cli.processar_lote(
+        [str(tmp_path / "vazia"), str(BALANCETES / "industrial_nordeste")], tmp_path)
+
+    assert isinstance(resultados[0][1], Exception)
+    assert resultados[1][1]["empresa"] == "industrial_nordeste"
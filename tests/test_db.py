@@ -0,0 +1,134 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from tests.conftest import BALANCETES
+from utils.db import (COLECAO_FOLHAS, ingerir_balancetes, ingerir_json, load_all_rows_from_mongo,
+                      load_folhas_from_mongo, load_indicadores_from_mongo, registrar_alteracao,
+                      sincronizar_folhas, somas_por_grupo_mongo, versao_colecao)
+from utils.functions import processar_indicadores_financeiros
+
+mongomock = pytest.importorskip("mongomock")
+
+
+def _documentos(n=3):
+    arquivos = sorted((BALANCETES / "industrial_nordeste").glob("*.json"))[:n]
+    return [json.loads(a.read_text(encoding="utf-8")) for a in arquivos]
+
+
+def _primeira_folha(doc):
+    folha = doc["ativo"]
+    while "children" in folha:
+        folha = folha["children"][0]
+    return folha
+
+
+def test_versao_muda_com_retificacao_reingerida():
+    client = mongomock.MongoClient()
+    ingerir_balancetes(_documentos(), "db", "empresa", client=client, validar=False)
+    antes = versao_colecao("db", "empresa", client=client)
+    assert versao_colecao("db", "empresa", client=client) == antes
+
+    # balancete reemitido: mesmo metadata.periodo, um saldo diferente
+    doc = client.db.empresa.find_one({}, {"_id": 0})
+    _primeira_folha(doc)["saldo_atual"] += 1.0
+    ingerir_balancetes([doc], "db", "empresa", client=client, validar=False)
+    assert versao_colecao("db", "empresa", client=client) != antes
+
+
+def test_versao_muda_com_retificacao_no_lugar_registrada():
+    client = mongomock.MongoClient()
+    client.db.empresa.insert_many(_documentos())
+    antes = versao_colecao("db", "empresa", client=client)
+
+    doc = client.db.empresa.find_one()
+    _primeira_folha(doc)["saldo_atual"] += 1.0
+    client.db.empresa.replace_one({"_id": doc["_id"]}, doc)
+    registrar_alteracao("db", "empresa", client=client)
+    assert versao_colecao("db", "empresa", client=client) != antes
+
+
+def test_versao_muda_com_remocao_direta():
+    client = mongomock.MongoClient()
+    client.db.empresa.insert_many(_documentos())
+    antes = versao_colecao("db", "empresa", client=client)
+    client.db.empresa.delete_one({})
+    assert versao_colecao("db", "empresa", client=client) != antes
+
+
+@pytest.fixture(scope="module")
+def mongo_ingerido():
+    """industrial_nordeste ingerida (árvores e folhas) num MongoDB em memória."""
+    client = mongomock.MongoClient()
+    ingerir_json(BALANCETES / "industrial_nordeste", "db", "empresa", client=client,
+                 validar=False)
+    return client
+
+
+def test_pushdown_igual_ao_calculo_em_pandas(mongo_ingerido, indicadores):
+    pd.testing.assert_frame_equal(
+        load_indicadores_from_mongo("db", "empresa", client=mongo_ingerido), indicadores)
+
+
+def test_pushdown_grupo_sem_contas_no_mes_fica_nan(linhas):
+    client = mongomock.MongoClient()
+    ingerir_json(BALANCETES / "industrial_nordeste", "db", "empresa", client=client,
+                 validar=False)
+    impostos = {"nivel_1": "RECEITAS", "nivel_2": "Simples Nacional sobre vendas e serviços"}
+    client.db[COLECAO_FOLHAS].delete_many(dict(impostos, mes="2023-05"))
+
+    sem_impostos = linhas.loc[~((linhas["mes"] == "2023-05")
+                                & (linhas["nivel_1"] == impostos["nivel_1"])
+                                & (linhas["nivel_2"] == impostos["nivel_2"]))]
+    esperado = processar_indicadores_financeiros(sem_impostos)
+    obtido = load_indicadores_from_mongo("db", "empresa", client=client)
+
+    assert np.isnan(somas_por_grupo_mongo("db", "empresa", client=client)
+                    .loc["2023-05", "Impostos_Receita"])
+    pd.testing.assert_frame_equal(obtido, esperado)
+
+
+def _ordenadas(df):
+    colunas = sorted(c for c in df.columns if c not in ("_id", "source_id", "empresa"))
+    return df[colunas].sort_values(["mes", "conta"]).reset_index(drop=True)
+
+
+def test_folhas_sincronizadas_iguais_as_linhas_das_arvores():
+    client = mongomock.MongoClient()
+    client.db.empresa.insert_many(_documentos(n=36))
+    gravadas = sincronizar_folhas("db", "empresa", client=client)
+
+    folhas = load_folhas_from_mongo("db", "empresa", client=client)
+    linhas = pd.DataFrame(load_all_rows_from_mongo("db", "empresa", client=client,
+                                                   saldos_completos=True))
+    assert gravadas == len(linhas) == len(folhas)
+    pd.testing.assert_frame_equal(_ordenadas(folhas), _ordenadas(linhas))
+    indices = client.db[COLECAO_FOLHAS].index_information()
+    assert {"empresa_1_mes_1", "empresa_1_conta_1_mes_1"} <= set(indices)
+
+    # filtros por prefixo de conta e janela de meses
+    caixa = load_folhas_from_mongo("db", "empresa", prefixo_conta="01.1.1", ultimos_meses=12,
+                                   client=client)
+    assert caixa["conta"].str.startswith("01.1.1").all()
+    assert caixa["mes"].nunique() == 12 and caixa["mes"].max() == linhas["mes"].max()
+
+
+def test_reingestao_do_mes_substitui_as_folhas():
+    client = mongomock.MongoClient()
+    documentos = _documentos()
+    ingerir_balancetes(documentos, "db", "empresa", client=client, validar=False)
+    antes = load_folhas_from_mongo("db", "empresa", client=client)
+
+    doc = _documentos(n=1)[0]
+    _primeira_folha(doc)["saldo_atual"] += 1.0
+    resultado = ingerir_balancetes([doc], "db", "empresa", client=client, validar=False)
+    depois = load_folhas_from_mongo("db", "empresa", client=client)
+
+    assert len(depois) == len(antes)
+    assert client.db.empresa.count_documents({}) == len(documentos)
+    mes = resultado["meses"][0]
+    diferenca = (depois.loc[depois["mes"] == mes, "saldo_atual"].sum()
+                 - antes.loc[antes["mes"] == mes, "saldo_atual"].sum())
+    assert diferenca == pytest.approx(1.0)
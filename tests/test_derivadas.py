@@ -0,0 +1,22 @@
+import numpy as np
+
+from utils.derivadas import derivar_series
+
+
+def test_ttm_e_yoy_da_margem(indicadores):
+    derivadas = derivar_series(indicadores)
+    ultimos = indicadores.iloc[-12:]
+    margem = ultimos["Lucro_Líquido"].sum() / ultimos["Receita_Líquida"].sum()
+    assert np.isclose(derivadas["Margem_de_Lucro_TTM"].iloc[-1], margem)
+    assert np.isclose(derivadas["Margem_de_Lucro_TTM_YoY"].iloc[-1],
+                      margem - derivadas["Margem_de_Lucro_TTM"].iloc[-13])
+    assert derivadas["Margem_de_Lucro_TTM_YoY"].iloc[:23].isna().all()
+
+
+def test_ytd_fica_nan_depois_de_um_mes_faltando(indicadores):
+    sem_marco = indicadores.drop(index="2024-03")
+    ytd = derivar_series(sem_marco)["Receita_Bruta_YTD"]
+    assert np.isclose(ytd["2024-02"], indicadores.loc[["2024-01", "2024-02"], "Receita_Bruta"].sum())
+    assert ytd.loc["2024-04":"2024-12"].isna().all()
+    # o ano anterior não é afetado
+    assert np.isclose(ytd["2023-12"], indicadores.loc["2023-01":"2023-12", "Receita_Bruta"].sum())
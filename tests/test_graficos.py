@@ -0,0 +1,27 @@
+import numpy as np
+import plotly.graph_objects as go
+
+from utils.derivadas import derivar_series
+from utils.graficos import figuras_contabil, preparar_dados_contabil
+
+
+def test_figuras_do_ano_selecionado(indicadores):
+    figuras = figuras_contabil(indicadores, ["2023"])
+    assert set(figuras) == {"receita", "caixa", "custo", "receita_liquida", "margem"}
+    assert all(isinstance(f, go.Figure) for f in figuras.values())
+    receita = {t.name: t for t in figuras["receita"].data}
+    assert list(receita["Receita_Bruta"].x) == [f"2023-{m:02d}" for m in range(1, 13)]
+    assert np.allclose(receita["Receita_Bruta"].y,
+                       indicadores.loc["2023-01":"2023-12", "Receita_Bruta"])
+
+
+def test_historico_longo_vira_trimestral(indicadores):
+    df_plot = preparar_dados_contabil(indicadores, ["2022", "2023", "2024"], max_pontos=12)
+    assert len(df_plot) == 12 and df_plot["mes"].iloc[0] == "2022-T1"
+    assert np.allclose(df_plot[["Banco", "Investimento", "Caixa"]].sum(axis=1),
+                       df_plot["Disponibilidade_Caixa"])
+
+    figuras = figuras_contabil(indicadores, ["2022", "2023", "2024"], max_pontos=12,
+                               derivadas=derivar_series(indicadores))
+    assert [t.name for t in figuras["margem"].data][-1] == "Margem 12 meses"
+    assert all(len(t.x) == 12 for f in figuras.values() for t in f.data)
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from utils.hierarquia import IndiceHierarquia, colunas_niveis
+
+
+@pytest.fixture(scope="module")
+def indice(linhas):
+    return IndiceHierarquia(linhas)
+
+
+def _caminhos_das_contas(linhas):
+    niveis = colunas_niveis(linhas)
+    return {tuple(v for v in linha[:-1] if isinstance(v, str)): linha[-1]
+            for linha in linhas[niveis + ["conta"]].itertuples(index=False)}
+
+
+def test_filhos_da_raiz_somam_o_total_do_mes(indice, linhas):
+    raiz = indice.filhos(())
+    assert set(raiz.index) == set(linhas["nivel_1"])
+    totais = linhas.groupby("mes")["saldo_atual"].sum()
+    np.testing.assert_allclose(raiz[list(indice.meses)].sum().to_numpy(),
+                               totais.reindex(indice.meses).to_numpy())
+    np.testing.assert_allclose(indice.total(("ATIVO",)).to_numpy(),
+                               linhas.loc[linhas["nivel_1"] == "ATIVO"]
+                                     .groupby("mes")["saldo_atual"].sum().to_numpy())
+
+
+def test_folhas_e_codigos_das_contas(indice, linhas):
+    contas = _caminhos_das_contas(linhas)
+    nos = indice.nos.set_index("caminho")
+    folhas = nos.loc[nos["folha"]]
+
+    assert set(folhas.index) == set(contas)
+    assert all(folhas.at[caminho, "conta"] == codigo for caminho, codigo in contas.items())
+    assert nos.loc[~nos["folha"], "conta"].isna().all()
+
+
+def test_filhos_ignora_meses_desconhecidos(indice):
+    tabela = indice.filhos(("ATIVO",), meses=["2023-01", "1999-01", "2023-02"])
+    assert list(tabela.columns) == ["conta", "folha", "2023-01", "2023-02"]
+    np.testing.assert_allclose(tabela["2023-01"].sum(),
+                               indice.total(("ATIVO",), meses=["2023-01"]).iloc[0])
+    assert indice.filhos(("NAO EXISTE",)).empty
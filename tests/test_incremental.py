@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.incremental import atualizar_indicadores_mes
+
+
+def test_mes_novo_igual_ao_reprocessamento(linhas, indicadores):
+    ultimo = indicadores.index[-1]
+    tabela, desatualizadas = atualizar_indicadores_mes(
+        indicadores.drop(index=ultimo), linhas[linhas["mes"] == ultimo])
+    pd.testing.assert_frame_equal(tabela, indicadores)
+    assert desatualizadas == list(indicadores.columns)
+
+
+def test_sem_tabela_e_sem_mes_devolve_tabela_vazia():
+    tabela, desatualizadas = atualizar_indicadores_mes(None, pd.DataFrame())
+    assert tabela.empty and tabela.index.name == "mes"
+    assert "Margem_de_Lucro" in tabela.columns
+    assert desatualizadas == []
+
+
+def test_mes_sem_grupos_do_balanco_e_rejeitado(linhas, indicadores):
+    ultimo = indicadores.index[-1]
+    so_resultado = linhas[(linhas["mes"] == ultimo)
+                          & linhas["nivel_1"].isin(["RECEITAS", "CUSTOS E DESPESAS"])]
+    with pytest.raises(ValueError, match=ultimo):
+        atualizar_indicadores_mes(indicadores, so_resultado)
+
+
+def test_retificacao_marca_so_colunas_alteradas(linhas, indicadores):
+    ultimo = indicadores.index[-1]
+    mes = linhas[linhas["mes"] == ultimo].copy()
+    caixa = mes["nivel_3"] == "DISPONIBILIDADES"
+    mes.loc[caixa, "saldo_atual"] += 1000.0
+    _, desatualizadas = atualizar_indicadores_mes(indicadores, mes,
+                                                  previsoes=["Margem_de_Lucro",
+                                                             "Liquidez_Imediata"])
+    assert desatualizadas == ["Liquidez_Imediata"]
+    assert np.isfinite(indicadores["Liquidez_Imediata"]).all()
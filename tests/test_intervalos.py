@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.intervalos import intervalos_backtest, pesos_psi, simular_caminhos
+from utils.previsao_rapida import (MODELOS, backtest_rapido, pesos_psi_matriz,
+                                   previsao_rapida)
+
+
+@pytest.fixture(scope="module")
+def series(indicadores):
+    tabela = indicadores.set_axis(pd.to_datetime(indicadores.index))
+    return {c: tabela[c] for c in ("Margem_de_Lucro", "Liquidez_Corrente",
+                                   "Liquidez_Imediata", "Endividamento",
+                                   "Receita_Líquida")}
+
+
+@pytest.mark.parametrize("coluna", ["Margem_de_Lucro", "Liquidez_Corrente",
+                                    "Liquidez_Imediata", "Endividamento", "Receita_Líquida"])
+def test_previsao_fica_dentro_das_proprias_faixas(series, coluna):
+    serie = series[coluna]
+    previsao, _ = previsao_rapida(serie)
+    tabela = intervalos_backtest(previsao, backtest_rapido(serie))
+
+    assert (tabela["inferior_95"] <= tabela["inferior_80"]).all()
+    assert (tabela["inferior_80"] <= tabela["forecast"]).all()
+    assert (tabela["forecast"] <= tabela["superior_80"]).all()
+    assert (tabela["superior_80"] <= tabela["superior_95"]).all()
+    # poucos resíduos não podem colapsar as faixas de 80% e 95%
+    assert (tabela["superior_95"] - tabela["inferior_95"]
+            > tabela["superior_80"] - tabela["inferior_80"]).all()
+
+
+def test_residuos_com_vies_sao_centralizados():
+    residuos = np.array([0.10, 0.11, 0.12, 0.09, 0.10, 0.08])
+    caminhos = simular_caminhos(np.zeros(3), residuos, n_caminhos=4000, semente=1)
+    np.testing.assert_allclose(np.median(caminhos, axis=0), 0.0, atol=0.005)
+    com_vies = simular_caminhos(np.zeros(3), residuos, n_caminhos=4000,
+                                centralizar=False, semente=1)
+    np.testing.assert_allclose(com_vies.mean(axis=0), residuos.mean(), atol=0.005)
+
+
+def test_psi_do_ar_segue_os_coeficientes():
+    rng = np.random.default_rng(0)
+    y = np.zeros(200)
+    for t in range(2, 200):
+        y[t] = 0.5 * y[t - 1] + 0.3 * y[t - 2] + rng.normal()
+    psi = pesos_psi_matriz(y[None, :], 6, "ar")[0]
+    np.testing.assert_allclose(psi, pesos_psi((0.5, 0.3), h=6), atol=0.15)
+
+
+def test_psi_de_cada_modelo_comeca_em_um(series):
+    Y = series["Margem_de_Lucro"].to_numpy()[None, :]
+    for modelo in MODELOS:
+        psi = pesos_psi_matriz(Y, 13, modelo)
+        assert psi.shape == (1, 13) and psi[0, 0] == 1.0
+    sazonal = pesos_psi_matriz(Y, 13, "sazonal_ingenuo")[0]
+    np.testing.assert_array_equal(np.flatnonzero(sazonal), [0, 12])
+
+
+def test_backtest_curto_para_o_horizonte(series):
+    serie = series["Margem_de_Lucro"]
+    previsao, _ = previsao_rapida(serie, horizon=12)
+    with pytest.raises(ValueError, match="horizonte=12"):
+        intervalos_backtest(previsao, backtest_rapido(serie))
+    assert len(intervalos_backtest(previsao, backtest_rapido(serie, horizonte=12))) == 12
+
+
+def test_arima_usa_o_psi_do_modelo_da_previsao(series):
+    pytest.importorskip("pmdarima")
+    from utils.functions import backtest_auto_arima, previsao_auto_arima
+    from utils.intervalos import pesos_psi_modelo
+
+    serie = series["Margem_de_Lucro"]
+    previsoes, ordem, modelo = previsao_auto_arima(serie, horizon=4, retornar_modelo=True)
+    assert len(previsoes) == 4 and modelo.order == ordem
+
+    resultado = backtest_auto_arima(serie, n_testes=3)
+    com_modelo = intervalos_backtest(previsoes, resultado, modelo=modelo)
+    esperado = intervalos_backtest(previsoes, {**resultado, "modelos": [modelo]})
+    pd.testing.assert_frame_equal(com_modelo, esperado)
+    assert len(pesos_psi_modelo(modelo, h=4)) == 4
@@ -0,0 +1,58 @@
+import copy
+import json
+
+import pandas as pd
+import pytest
+
+from tests.conftest import BALANCETES
+from utils.db import ESQUEMA_PADRAO, load_all_rows_from_mongo
+from utils.functions import LeitorBalancetes, linhas_do_documento
+
+
+@pytest.fixture(scope="module")
+def documentos():
+    arquivos = sorted((BALANCETES / "industrial_nordeste").glob("*.json"))[:4]
+    return [json.loads(a.read_text(encoding="utf-8")) for a in arquivos]
+
+
+def _com_secao_extra(doc):
+    doc = copy.deepcopy(doc)
+    doc["outras"] = copy.deepcopy(doc["receitas"])
+    doc["outras"]["descricao"] = "OUTRAS CONTAS"
+    return doc
+
+
+def test_documentos_do_esquema_vao_pelo_caminho_rapido(documentos):
+    leitor = LeitorBalancetes(ESQUEMA_PADRAO)
+    for doc in documentos:
+        assert leitor.linhas(doc) == linhas_do_documento(doc)
+    assert leitor.contadores["rapido"] == len(documentos)
+    assert leitor.contadores["fallback"] == 0
+
+
+def test_secao_a_mais_cai_na_heuristica_e_nao_e_descartada(documentos):
+    leitor = LeitorBalancetes(ESQUEMA_PADRAO)
+    extra = _com_secao_extra(documentos[0])
+    assert not leitor.confere(extra)
+    assert len(leitor.linhas(extra)) == len(linhas_do_documento(extra)) \
+        > len(linhas_do_documento(documentos[0]))
+    assert leitor.contadores["fallback"] == 1
+
+    # o formato novo passa a ser conhecido; o antigo continua no caminho rápido
+    assert len(leitor.linhas(_com_secao_extra(documentos[1]))) == \
+        len(linhas_do_documento(_com_secao_extra(documentos[1])))
+    leitor.linhas(documentos[2])
+    assert leitor.contadores == {"documentos": 3, "rapido": 2, "fallback": 1, "sem_mes": 0}
+
+
+def test_projecao_do_servidor_nota_secao_a_mais(documentos):
+    mongomock = pytest.importorskip("mongomock")
+    client = mongomock.MongoClient()
+    colecao = client["teste_leitor"]["industrial_nordeste"]
+    colecao.insert_many([copy.deepcopy(d) for d in documentos[:3]]
+                        + [_com_secao_extra(documentos[3])])
+
+    linhas = load_all_rows_from_mongo("teste_leitor", "industrial_nordeste", client=client)
+    esperado = [linha for doc in colecao.find({}) for linha in linhas_do_documento(doc)]
+    assert len(linhas) == len(esperado)
+    assert "OUTRAS CONTAS" in set(pd.DataFrame(linhas)["nivel_1"])
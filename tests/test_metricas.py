@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from utils.metricas import calcular_metricas, escala_mase, tabela_metricas
+
+
+def test_mape_ignora_meses_com_real_zero():
+    m = calcular_metricas([0.0, 2.0, 4.0], [1.0, 3.0, 3.0])
+    # só os meses com real != 0: |1|/2 e |1|/4
+    assert m["MAPE"] == pytest.approx((0.5 + 0.25) / 2 * 100)
+    assert m["MAE"] == pytest.approx(1.0)
+    assert m["RMSE"] == pytest.approx(1.0)
+    assert m["n"] == 3
+
+
+def test_smape_com_real_e_previsto_nulos_e_acerto():
+    m = calcular_metricas([0.0, 1.0], [0.0, 3.0])
+    # (0 + 2·2/(1+3)) / 2
+    assert m["sMAPE"] == pytest.approx(50.0)
+    assert np.isnan(calcular_metricas([0.0], [0.0])["MAPE"])
+    assert calcular_metricas([0.0], [0.0])["sMAPE"] == 0.0
+
+
+def test_mase_com_treino_constante_e_nan():
+    assert np.isnan(calcular_metricas([1.0, 2.0], [2.0, 2.0], y_treino=[5.0] * 6)["MASE"])
+    assert np.isnan(escala_mase([1.0, 2.0], sazonalidade=2))
+
+    m = calcular_metricas([1.0, 2.0], [2.0, 2.0], y_treino=[1.0, 3.0, 2.0, 4.0])
+    # escala = média(|2|, |1|, |2|) = 5/3; MAE = 0.5
+    assert m["MASE"] == pytest.approx(0.5 / (5 / 3))
+
+
+def test_nan_fica_fora_das_medias():
+    m = calcular_metricas([1.0, np.nan, 2.0], [2.0, 5.0, 2.0])
+    assert m["MAE"] == pytest.approx(0.5) and m["n"] == 2
+
+
+def test_tabela_uma_linha_por_serie():
+    reais = np.arange(1.0, 25.0).reshape(2, 3, 4)
+    tabela = tabela_metricas(reais, reais + 1.0, indice=["a", "b"],
+                             y_treino=np.arange(20.0).reshape(2, 10))
+    assert tabela.shape == (2, 6)
+    assert list(tabela.index) == ["a", "b"]
+    assert set(tabela.columns) == {"MAE", "RMSE", "MAPE", "sMAPE", "MASE", "n"}
+    np.testing.assert_allclose(tabela["MAE"], 1.0)
+    np.testing.assert_allclose(tabela["MASE"], 1.0)
+    assert (tabela["n"] == 12).all()
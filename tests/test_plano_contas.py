@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+from utils.functions import processar_indicadores_financeiros
+from utils.plano_contas import PLANOS_EMPRESAS, processar_indicadores_por_plano, registrar_plano
+
+
+def test_plano_padrao_igual_ao_processamento_padrao(linhas, indicadores):
+    pd.testing.assert_frame_equal(processar_indicadores_por_plano(linhas), indicadores)
+    pd.testing.assert_frame_equal(processar_indicadores_financeiros(linhas), indicadores)
+
+
+def test_plano_proprio_troca_as_contas_do_grupo(linhas, indicadores):
+    plano = {"Disponibilidade_Caixa": {"descricao": "__conta_inexistente__"},
+             "Receita_Bruta": []}
+    proprio = processar_indicadores_por_plano(linhas, plano=plano)
+
+    assert proprio["Receita_Bruta"].isna().all()
+    assert proprio["Disponibilidade_Caixa"].isna().all()
+    np.testing.assert_allclose(proprio["Ativo_Circulante"], indicadores["Ativo_Circulante"])
+
+
+def test_lote_aplica_o_plano_de_cada_empresa(linhas, indicadores):
+    lote = pd.concat([linhas.assign(empresa="a"), linhas.assign(empresa="b")], ignore_index=True)
+    tabela = processar_indicadores_por_plano(lote, planos={"b": {"Receita_Bruta": []}})
+
+    pd.testing.assert_frame_equal(tabela.xs("a", level="empresa"), indicadores)
+    assert tabela.xs("b", level="empresa")["Receita_Bruta"].isna().all()
+
+
+def test_plano_vazio_explicito_usa_o_padrao_e_nao_o_registrado(linhas, indicadores):
+    registrar_plano("registrada", {"Receita_Bruta": []})
+    try:
+        lote = linhas.assign(empresa="registrada")
+        tabela = processar_indicadores_por_plano(lote, planos={"registrada": {}})
+        pd.testing.assert_frame_equal(tabela.xs("registrada", level="empresa"), indicadores)
+    finally:
+        PLANOS_EMPRESAS.pop("registrada")
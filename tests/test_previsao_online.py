@@ -0,0 +1,64 @@
+import numpy as np
+import pandas as pd
+
+from utils.previsao_online import PrevisorOnline, PrevisorRLS
+
+
+def _series(n=3, T=40, semente=0):
+    rng = np.random.default_rng(semente)
+    Y = np.zeros((n, T))
+    for t in range(2, T):
+        Y[:, t] = 1.0 + 0.5 * Y[:, t - 1] - 0.2 * Y[:, t - 2] + rng.normal(0, 0.1, n)
+    return Y
+
+
+def _tabela(Y, inicio="2021-01"):
+    meses = pd.period_range(inicio, periods=Y.shape[1], freq="M").strftime("%Y-%m")
+    return pd.DataFrame(Y.T, index=pd.Index(meses, name="mes"),
+                        columns=[f"s{i}" for i in range(Y.shape[0])])
+
+
+def test_atualizacao_recursiva_igual_ao_reajuste():
+    Y = _series()
+    previsor = PrevisorRLS(reajustar_a_cada=None).ajustar(Y[:, :30])
+    for t in range(30, 40):
+        previsor.atualizar(Y[:, t])
+    np.testing.assert_allclose(previsor.theta, PrevisorRLS().ajustar(Y).theta, atol=1e-6)
+
+
+def test_serie_que_comeca_depois_usa_so_a_sua_janela():
+    Y = _series()
+    Y[1, :15] = np.nan
+    previsor = PrevisorRLS().ajustar(Y)
+
+    sozinha = PrevisorRLS().ajustar(Y[1:2, 15:])
+    np.testing.assert_allclose(previsor.theta[1], sozinha.theta[0])
+    assert np.isfinite(previsor.prever(6)).all()
+
+
+def test_mes_sem_valor_fica_nan_no_historico_e_nao_estraga_o_reajuste():
+    tabela = _tabela(_series())
+    previsor = PrevisorOnline(tabela.iloc[:-2])
+    previsor.atualizar_mes(tabela.index[-2], tabela.iloc[-2].drop("s0"))
+    assert np.isnan(previsor.modelo.historico[0, -1])
+
+    # a tabela com o mesmo NaN não é retificação
+    com_nan = tabela.iloc[:-1].copy()
+    com_nan.iloc[-1, 0] = np.nan
+    assert previsor.absorver(com_nan) == 0
+
+    # o valor que chega depois é retificação; o reajuste segue finito
+    assert previsor.absorver(tabela) == -1
+    assert np.isfinite(previsor.modelo.theta).all()
+    assert np.isfinite(previsor.prever(6).to_numpy()).all()
+
+
+def test_reajuste_periodico_com_nan_no_historico():
+    Y = _series()
+    previsor = PrevisorRLS(reajustar_a_cada=3).ajustar(Y[:, :30])
+    previsor.atualizar(np.array([np.nan, Y[1, 30], Y[2, 30]]))
+    previsor.atualizar(Y[:, 31])
+    previsor.atualizar(Y[:, 32])
+
+    assert previsor.reajustes == 2
+    assert np.isfinite(previsor.theta).all() and np.isfinite(previsor.prever(3)).all()
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.previsao_rapida import (backtest_rapido, prever_ar, prever_lote,
+                                   prever_sazonal_ingenuo, previsao_rapida)
+
+
+def test_ar_recupera_processo_sem_ruido():
+    y = np.empty(40)
+    y[:2] = (1.0, 2.0)
+    for t in range(2, 40):
+        y[t] = 0.5 + 0.6 * y[t - 1] - 0.2 * y[t - 2]
+    Y = np.vstack([y, 2 * y])
+    esperado = np.empty(3)
+    a, b = y[-1], y[-2]
+    for k in range(3):
+        esperado[k] = a = 0.5 + 0.6 * a - 0.2 * b
+        b = y[-1] if k == 0 else esperado[k - 1]
+    np.testing.assert_allclose(prever_ar(Y, 3)[0], esperado, atol=1e-6)
+
+
+def test_lote_rotula_cada_serie_a_partir_do_proprio_ultimo_mes(indicadores):
+    tabela = indicadores[["Margem_de_Lucro", "Liquidez_Corrente"]].copy()
+    tabela.iloc[-2:, 1] = np.nan
+    resultado = prever_lote(tabela, horizon=3)
+    previsoes = resultado["previsoes"]
+
+    margem = previsoes["Margem_de_Lucro"].dropna()
+    liquidez = previsoes["Liquidez_Corrente"].dropna()
+    assert list(margem.index.strftime("%Y-%m")) == ["2025-01", "2025-02", "2025-03"]
+    assert list(liquidez.index.strftime("%Y-%m")) == ["2024-11", "2024-12", "2025-01"]
+
+    # mesma previsão que a série isolada, com o mesmo rótulo
+    isolada, _ = previsao_rapida(tabela["Liquidez_Corrente"].dropna().set_axis(
+        pd.to_datetime(tabela.index[:-2])), horizon=3)
+    np.testing.assert_allclose(liquidez.to_numpy(), isolada.to_numpy())
+    assert (liquidez.index == isolada.index).all()
+
+
+def test_backtest_reduz_origens_em_historico_curto():
+    serie = pd.Series([1.0, 2.0, 3.0, 4.0],
+                      index=pd.date_range("2024-01-01", periods=4, freq="MS"))
+    resultado = backtest_rapido(serie, n_testes=6)
+    assert len(resultado["previsoes"]) == 3
+    assert resultado["previsoes"].notna().all()
+
+
+def test_backtest_sem_historico_tem_erro_claro():
+    serie = pd.Series([1.0], index=pd.to_datetime(["2024-01-01"]), name="Margem_de_Lucro")
+    with pytest.raises(ValueError, match="Histórico insuficiente"):
+        backtest_rapido(serie)
+
+
+def test_sazonal_ingenuo_sem_valores():
+    with pytest.raises(ValueError):
+        prever_sazonal_ingenuo(np.empty((1, 0)), 3)
+
+
+def test_buraco_interno_e_interpolado_como_no_lote(indicadores):
+    serie = indicadores["Receita_Bruta"].set_axis(pd.to_datetime(indicadores.index))
+    serie.iloc[:3] = np.nan
+    serie.iloc[20] = np.nan
+    previsoes, _ = previsao_rapida(serie, horizon=3)
+
+    lote = prever_lote(serie.to_frame(), horizon=3)["previsoes"]["Receita_Bruta"]
+    np.testing.assert_allclose(previsoes.to_numpy(), lote.to_numpy())
+    # o buraco não encosta os vizinhos: o mesmo que passar a série já interpolada
+    interpolada, _ = previsao_rapida(serie.iloc[3:].interpolate(), horizon=3)
+    np.testing.assert_allclose(previsoes.to_numpy(), interpolada.to_numpy())
+
+    backtest = backtest_rapido(serie, n_testes=20)
+    assert len(backtest["reais"]) == 20
+    assert backtest["reais"].notna().all()
+    np.testing.assert_allclose(backtest["reais"].iloc[4], serie.iloc[19:22:2].mean())
@@ -0,0 +1,17 @@
+from utils.plano_contas import PLANO_PADRAO
+from utils.relatorios import GeradorRelatorios
+
+
+def test_pool_so_e_criado_no_primeiro_relatorio():
+    gerador = GeradorRelatorios()
+    assert gerador._pool is None and gerador.max_workers == 2
+
+
+def test_caminho_separa_origem_da_previsao_e_plano(tmp_path):
+    gerador = GeradorRelatorios(tmp_path)
+    padrao = gerador.caminho("Empresa", "v1")
+    assert gerador.caminho("Empresa", "v1", plano=PLANO_PADRAO) == padrao
+    assert gerador.caminho("Empresa", "v1", origem_previsao="rapido") != padrao
+    proprio = gerador.caminho("Empresa", "v1", plano={"Receita_Bruta": {"conta": "3.1"}})
+    assert proprio != padrao
+    assert proprio == gerador.caminho("Empresa", "v1", plano={"Receita_Bruta": {"conta": "3.1"}})
@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from utils.previsao_rapida import prever_auto
+from utils.simulacao import SERIES_LIQUIDEZ, simular_conjunto, simular_liquidez
+
+
+def test_residuos_com_vies_sao_centralizados():
+    previsao = np.zeros((2, 4))
+    residuos = np.array([[1.0, 1.2, 0.8, 1.1, 0.9],
+                         [-3.0, -2.0, -4.0, -3.5, -2.5]])
+    caminhos = simular_conjunto(previsao, residuos, n_caminhos=4000, semente=0)
+    np.testing.assert_allclose(caminhos.mean(axis=1), 0.0, atol=0.05)
+    com_vies = simular_conjunto(previsao, residuos, n_caminhos=4000, centralizar=False,
+                                semente=0)
+    assert com_vies[1, :, -1].mean() < -10
+
+
+def test_passeio_aleatorio_acumula_a_variancia():
+    residuos = np.random.default_rng(1).normal(size=(1, 400))
+    caminhos = simular_conjunto(np.zeros((1, 9)), residuos, n_caminhos=20000, semente=2)
+    desvio = caminhos[0].std(axis=0)
+    esperado = residuos.std() * np.sqrt(np.arange(1, 10))
+    np.testing.assert_allclose(desvio, esperado, rtol=0.05)
+
+
+def test_liquidez_centrada_na_previsao_pontual(indicadores):
+    resultado = simular_liquidez(indicadores, horizon=6, n_caminhos=4000)
+    tabela = indicadores[SERIES_LIQUIDEZ].sort_index()
+    previsao, _, _ = prever_auto(tabela.to_numpy().T, 6)
+
+    caixa = resultado["caminhos"]["Disponibilidade_Caixa"]
+    desvio = caixa.std(axis=0)
+    assert (np.abs(np.median(caixa, axis=0) - previsao[0]) < 0.25 * desvio + 1e-9).all()
+
+    probabilidades = resultado["probabilidades"].to_numpy()
+    assert ((probabilidades >= 0) & (probabilidades <= 1)).all()
+    assert (resultado["faixas"]["Liquidez_Corrente_p5"]
+            <= resultado["faixas"]["Liquidez_Corrente_p95"]).all()
+
+
+def test_historico_curto_e_rejeitado(indicadores):
+    with pytest.raises(ValueError, match="Histórico insuficiente"):
+        simular_liquidez(indicadores.iloc[:5])
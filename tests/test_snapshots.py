@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.snapshots import RepositorioSnapshots, registrar_snapshot
+
+
+def _retificada(indicadores, mes="2023-06", coluna="Receita_Bruta", delta=1.0):
+    tabela = indicadores.copy()
+    tabela.loc[mes, coluna] += delta
+    return tabela
+
+
+def test_mesma_tabela_mesma_versao(tmp_path, indicadores):
+    repo = RepositorioSnapshots(tmp_path)
+    assert repo.gravar("empresa", indicadores) == 1
+    assert repo.gravar("empresa", indicadores.copy()) == 1
+    assert list(repo.versoes("empresa")["versao"]) == [1]
+
+
+def test_retificacao_cria_v2_e_diferencas_aponta_a_celula(tmp_path, indicadores):
+    repo = RepositorioSnapshots(tmp_path)
+    repo.gravar("empresa", indicadores)
+    assert repo.gravar("empresa", _retificada(indicadores), descricao="retificação") == 2
+
+    diferencas = repo.diferencas("empresa")
+    alteracoes = diferencas["alteracoes"]
+    assert len(alteracoes) == 1
+    assert (alteracoes.iloc[0]["mes"], alteracoes.iloc[0]["indicador"]) == \
+        ("2023-06", "Receita_Bruta")
+    assert alteracoes.iloc[0]["diferenca"] == pytest.approx(1.0)
+    assert diferencas["meses_alterados"] == ["2023-06"]
+    assert diferencas["meses_novos"] == [] and diferencas["colunas_novas"] == []
+    assert repo.manifesto("empresa")["anterior"] == 1
+
+
+def test_abrir_devolve_memmap_somente_leitura(tmp_path, indicadores):
+    repo = RepositorioSnapshots(tmp_path)
+    repo.gravar("empresa", indicadores)
+    tabela = repo.abrir("empresa")
+
+    pd.testing.assert_frame_equal(tabela, indicadores.astype(float), check_column_type=False)
+    valores = tabela.to_numpy()
+    assert not valores.flags.writeable
+    base = valores
+    while base.base is not None and not isinstance(base, np.memmap):
+        base = base.base
+    assert isinstance(base, np.memmap)
+    with pytest.raises(ValueError):
+        valores[0, 0] = 0.0
+
+
+def test_resumo_de_registrar_snapshot(tmp_path, indicadores):
+    primeiro = registrar_snapshot(tmp_path, "empresa", indicadores.iloc[:-1])
+    assert primeiro == {"versao": 1, "nova": True, "meses_alterados": [], "meses_novos": []}
+    assert registrar_snapshot(tmp_path, "empresa", indicadores.iloc[:-1])["nova"] is False
+
+    segundo = registrar_snapshot(tmp_path, "empresa", _retificada(indicadores))
+    assert segundo == {"versao": 2, "nova": True, "meses_alterados": ["2023-06"],
+                       "meses_novos": [indicadores.index[-1]]}
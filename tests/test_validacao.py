@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from tests.conftest import BALANCETES
+from utils.db import load_all_rows_from_json
+from utils.validacao import validar_balancetes
+
+
+@pytest.fixture(scope="module")
+def folhas():
+    """Contas analíticas com saldos completos (o exemplo fecha o movimento, não o equilíbrio)."""
+    return pd.DataFrame(load_all_rows_from_json(BALANCETES / "industrial_nordeste",
+                                                saldos_completos=True))
+
+
+def _ocorrencias(df, verificacao, **kwargs):
+    ocorrencias = validar_balancetes(df, **kwargs)["ocorrencias"]
+    return ocorrencias.loc[ocorrencias["verificacao"] == verificacao]
+
+
+def _primeira(df, nivel_1, mes="2023-06"):
+    return df.index[(df["nivel_1"] == nivel_1) & (df["mes"] == mes)][0]
+
+
+def test_movimento_com_sinal_pela_natureza(folhas):
+    assert _ocorrencias(folhas, "movimento").empty
+    df = folhas.copy()
+    ativo, passivo = _primeira(df, "ATIVO"), _primeira(df, "PASSIVO")
+    df.loc[[ativo, passivo], "debito"] += 10.0
+
+    movimento = _ocorrencias(df, "movimento").set_index("conta")
+    assert set(movimento.index) == {df.at[ativo, "conta"], df.at[passivo, "conta"]}
+    # devedora: débito a mais aumenta o esperado; credora: diminui
+    assert movimento.at[df.at[ativo, "conta"], "diferenca"] == pytest.approx(-10.0)
+    assert movimento.at[df.at[passivo, "conta"], "diferenca"] == pytest.approx(10.0)
+
+
+def test_equilibrio_inclui_o_resultado_do_periodo(folhas):
+    mes = folhas.loc[folhas["mes"] == "2023-06"]
+    totais = mes.groupby("nivel_1")["saldo_atual"].sum()
+    resultado = totais["RECEITAS"] - totais["CUSTOS E DESPESAS"]
+    # conta de ajuste no PASSIVO para fechar o mês com o resultado
+    ajuste = mes.loc[[_primeira(mes, "PASSIVO")]].assign(
+        conta="9.9.9", saldo_atual=totais["ATIVO"] - totais["PASSIVO"] - resultado,
+        saldo_anterior=np.nan, debito=np.nan, credito=np.nan)
+    fechado = pd.concat([mes, ajuste], ignore_index=True)
+
+    assert _ocorrencias(fechado, "equilibrio").empty
+    sem_resultado = _ocorrencias(fechado, "equilibrio", incluir_resultado=False)
+    assert sem_resultado["diferenca"].iloc[0] == pytest.approx(resultado)
+
+    fechado.loc[_primeira(fechado, "ATIVO"), "saldo_atual"] += 500.0
+    quebrado = _ocorrencias(fechado, "equilibrio")
+    assert list(quebrado["mes"]) == ["2023-06"]
+    assert quebrado["diferenca"].iloc[0] == pytest.approx(500.0)
+
+
+def test_linha_duplicada(folhas):
+    df = pd.concat([folhas, folhas.loc[[_primeira(folhas, "RECEITAS")]]], ignore_index=True)
+    duplicadas = _ocorrencias(df, "duplicada")
+    assert len(duplicadas) == 1
+    assert duplicadas["mes"].iloc[0] == "2023-06"
+    assert duplicadas["encontrado"].iloc[0] == 2
+
+
+def test_meses_invalidos_e_faltantes(folhas):
+    df = folhas.loc[folhas["mes"] != "2023-02"].copy()
+    df.loc[df.index[:3], "mes"] = None
+
+    relatorio = validar_balancetes(df)
+    assert not relatorio["ok"]
+    resumo = relatorio["resumo"]["ocorrencias"]
+    assert resumo["mes_invalido"] == 1 and resumo["mes_faltante"] == 1
+    invalido = _ocorrencias(df, "mes_invalido")
+    assert invalido["encontrado"].iloc[0] == 3
+    assert list(_ocorrencias(df, "mes_faltante")["mes"]) == ["2023-02"]
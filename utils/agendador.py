@@ -0,0 +1,495 @@
+"""
+agendador.py
+
+Fila de jobs para o fechamento de mês de muitas empresas de uma vez. Cada
+empresa vira uma cadeia de jobs (ETAPAS):
+
+    ingerir -> validar -> achatar -> indicadores -> previsao
+
+executada num pool limitado de processos, com prioridade por empresa,
+novas tentativas com espera exponencial e dependências (a previsão só começa
+depois que os indicadores da empresa existem). O estado dos jobs fica num
+arquivo SQLite: se o processo cair, uma nova execução com o mesmo arquivo
+retoma de onde parou (jobs concluídos não são refeitos; os que estavam em
+execução voltam para a fila). Erros da entrada (fonte vazia, histórico
+insuficiente, ...) dão o mesmo resultado a cada tentativa e falham o job de
+imediato, sem novas tentativas.
+
+Exemplos:
+    python -m utils.agendador --estado fechamento.sqlite3 \\
+        --json balancetes/industrial_nordeste balancetes/tecnotubo --previsao rapido
+    python -m utils.agendador --estado fechamento.sqlite3 --json balancetes/novos \\
+        --destino ConsulX_db --workers 8
+    python -m utils.agendador --estado fechamento.sqlite3 --status
+
+Os arquivos de cada empresa seguem os nomes de utils.cli em --saida:
+{empresa}_validacao, {empresa}_folhas, {empresa}_indicadores e
+{empresa}_previsoes.
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import (FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor,
+                                wait)
+from pathlib import Path
+
+import pandas as pd
+
+
+ETAPAS = ("ingerir", "validar", "achatar", "indicadores", "previsao")
+
+ESTADOS = ("pendente", "executando", "concluido", "falhou", "cancelado")
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    seq INTEGER NOT NULL,
+    empresa TEXT NOT NULL,
+    etapa TEXT NOT NULL,
+    parametros TEXT NOT NULL,
+    prioridade INTEGER NOT NULL DEFAULT 0,
+    estado TEXT NOT NULL DEFAULT 'pendente',
+    tentativas INTEGER NOT NULL DEFAULT 0,
+    max_tentativas INTEGER NOT NULL DEFAULT 3,
+    disponivel_em REAL NOT NULL DEFAULT 0,
+    resultado TEXT,
+    erro TEXT,
+    atualizado_em REAL
+);
+CREATE TABLE IF NOT EXISTS dependencias (
+    job TEXT NOT NULL,
+    depende TEXT NOT NULL,
+    PRIMARY KEY (job, depende)
+);
+CREATE INDEX IF NOT EXISTS jobs_fila ON jobs (estado, prioridade DESC, seq);
+"""
+
+
+class ErroEntrada(ValueError):
+    """Entrada vazia ou inválida: repetir o job não muda o resultado."""
+
+
+# Erros determinísticos, que falham o job sem novas tentativas: os da entrada
+# (ErroEntrada, pandas.errors.EmptyDataError e os ValueError das etapas, como o
+# "Histórico insuficiente" de previsao_rapida.backtest_rapido) e os de dados
+# fora do formato esperado
+ERROS_DEFINITIVOS = (ValueError, KeyError, IndexError)
+
+
+# ======================
+# Etapas (executadas nos processos trabalhadores)
+# ======================
+def _fonte(parametros):
+    """Fonte de leitura: depois da ingestão de JSON no MongoDB, a coleção."""
+    if parametros["tipo"] == "json" and parametros.get("destino"):
+        return "mongo", f"{parametros['destino']}/{parametros['empresa']}"
+    return parametros["tipo"], parametros["origem"]
+
+
+def _arquivo(parametros, nome):
+    return Path(parametros["saida"]) / f"{parametros['empresa']}_{nome}.{parametros['formato']}"
+
+
+def etapa_ingerir(parametros):
+    # fontes JSON sem destino são lidas direto dos arquivos: nada a ingerir
+    if parametros["tipo"] != "json" or not parametros.get("destino"):
+        return {"documentos": 0}
+    from utils import db
+    resultado = db.ingerir_json(parametros["origem"], db_name=parametros["destino"],
+                                coll_name=parametros["empresa"], validar=False)
+    return {"documentos": resultado["documentos"], "meses": resultado["meses"]}
+
+
+def etapa_validar(parametros):
+    from utils.cli import carregar_linhas, gravar
+    from utils.validacao import validar_balancetes
+
+    tipo, origem = _fonte(parametros)
+    linhas, _ = carregar_linhas(tipo, origem, saldos_completos=True)
+    if not linhas:
+        raise ErroEntrada(f"Nenhuma conta encontrada em {origem}.")
+    validacao = validar_balancetes(pd.DataFrame(linhas))
+    resumo = validacao["resumo"]["ocorrencias"]
+    return {"ok": bool(validacao["ok"]),
+            "problemas": {k: int(v) for k, v in resumo[resumo > 0].items()},
+            "arquivos": [gravar(validacao["ocorrencias"], _arquivo(parametros, "validacao"),
+                                parametros["formato"])]}
+
+
+def etapa_achatar(parametros):
+    """Contas analíticas (folhas): coleção de folhas no MongoDB ou arquivo local."""
+    tipo, origem = _fonte(parametros)
+    if tipo == "mongo":
+        from utils import db
+        db_name, coll_name = origem.split("/", 1)
+        folhas = db.sincronizar_folhas(db_name, coll_name)
+        if not folhas:
+            raise ErroEntrada(f"Nenhuma conta encontrada em {origem}.")
+        return {"folhas": folhas}
+
+    from utils.cli import carregar_linhas, gravar
+    linhas, _ = carregar_linhas(tipo, origem, saldos_completos=True)
+    if not linhas:
+        raise ErroEntrada(f"Nenhuma conta encontrada em {origem}.")
+    return {"folhas": len(linhas),
+            "arquivos": [gravar(pd.DataFrame(linhas), _arquivo(parametros, "folhas"),
+                                parametros["formato"])]}
+
+
+def etapa_indicadores(parametros):
+    from utils.cli import gravar, ler
+    from utils.plano_contas import processar_indicadores_por_plano
+
+    tipo, origem = _fonte(parametros)
+    plano = parametros.get("plano")
+    if tipo == "mongo":
+        from utils import db
+        db_name, coll_name = origem.split("/", 1)
+        if plano is None:
+            indicadores = db.load_indicadores_from_mongo(db_name, coll_name)
+        else:
+            indicadores = processar_indicadores_por_plano(
+                db.load_folhas_from_mongo(db_name, coll_name).drop(columns="empresa"), plano=plano)
+    else:
+        try:
+            folhas = ler(_arquivo(parametros, "folhas"), parametros["formato"])
+        except pd.errors.EmptyDataError:
+            raise ErroEntrada(f"Arquivo de folhas vazio para {origem}.") from None
+        if folhas.empty:
+            raise ErroEntrada(f"Arquivo de folhas vazio para {origem}.")
+        folhas["mes"] = folhas["mes"].astype(str)
+        indicadores = processar_indicadores_por_plano(folhas, plano=plano)
+
+    if indicadores.empty:
+        raise ErroEntrada(f"Nenhuma conta encontrada em {origem}.")
+    resultado = {"meses": len(indicadores),
+                 "arquivos": [gravar(indicadores.reset_index(),
+                                     _arquivo(parametros, "indicadores"), parametros["formato"])]}
+    if parametros.get("snapshots"):
+        from utils.snapshots import registrar_snapshot
+        resultado["snapshot"] = registrar_snapshot(parametros["snapshots"],
+                                                   parametros["empresa"], indicadores)
+    return resultado
+
+
+def etapa_previsao(parametros):
+    from utils.cli import gravar, ler, prever_colunas
+
+    indicadores = ler(_arquivo(parametros, "indicadores"), parametros["formato"])
+    indicadores["mes"] = indicadores["mes"].astype(str)
+    previsoes = prever_colunas(indicadores.set_index("mes"), parametros["colunas"],
+                               backend=parametros["previsao"], horizon=parametros["horizonte"])
+    return {"arquivos": [gravar(previsoes, _arquivo(parametros, "previsoes"),
+                                parametros["formato"])]}
+
+
+FUNCOES_ETAPAS = {
+    "ingerir": etapa_ingerir,
+    "validar": etapa_validar,
+    "achatar": etapa_achatar,
+    "indicadores": etapa_indicadores,
+    "previsao": etapa_previsao,
+}
+
+
+def executar_etapa(etapa, parametros):
+    """Ponto de entrada dos trabalhadores (precisa ser importável para o pickle)."""
+    return FUNCOES_ETAPAS[etapa](parametros)
+
+
+# ======================
+# Fila persistente
+# ======================
+class Agendador:
+    """
+    Fila de jobs por empresa com estado em SQLite.
+
+    Parâmetros:
+    -----------
+    caminho : str ou Path
+        Arquivo SQLite do estado (":memory:" para uma fila descartável).
+    workers : int, opcional
+        Jobs simultâneos (default: número de CPUs).
+    espera_base : float
+        Segundos antes da 1ª nova tentativa; dobra a cada falha. Erros de
+        ERROS_DEFINITIVOS falham o job sem novas tentativas.
+    processos : bool
+        Executa os jobs em processos (default) ou em threads.
+
+    Exemplo:
+    --------
+    >>> agendador = Agendador("fechamento.sqlite3", workers=8)
+    >>> agendador.enfileirar_empresa("json", "balancetes/industrial_nordeste",
+    ...                              saida="resultados", prioridade=10)
+    >>> agendador.executar()
+    {'concluido': 4, 'pendente': 0, ...}
+    """
+
+    def __init__(self, caminho="agendador.sqlite3", workers=None, espera_base=5.0,
+                 processos=True):
+        self.workers = workers or os.cpu_count() or 1
+        self.espera_base = espera_base
+        self.processos = processos
+        self._conexao = sqlite3.connect(str(caminho))
+        self._conexao.row_factory = sqlite3.Row
+        with self._conexao:
+            self._conexao.executescript(_ESQUEMA)
+
+    def fechar(self):
+        self._conexao.close()
+
+    def enfileirar(self, empresa, etapa, parametros, depende=(), prioridade=0,
+                   max_tentativas=3, refazer=False):
+        """
+        Enfileira um job (id '{empresa}/{etapa}'). Um job que já existe no
+        estado é mantido como está, a menos que refazer=True.
+        """
+        id_job = f"{empresa}/{etapa}"
+        with self._conexao:
+            if refazer:
+                self._conexao.execute("DELETE FROM jobs WHERE id = ?", (id_job,))
+                self._conexao.execute("DELETE FROM dependencias WHERE job = ?", (id_job,))
+            seq = self._conexao.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM jobs").fetchone()[0]
+            self._conexao.execute(
+                "INSERT OR IGNORE INTO jobs (id, seq, empresa, etapa, parametros, prioridade, "
+                "max_tentativas, atualizado_em) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (id_job, seq, empresa, etapa, json.dumps(parametros), prioridade,
+                 max_tentativas, time.time()))
+            self._conexao.executemany(
+                "INSERT OR IGNORE INTO dependencias (job, depende) VALUES (?, ?)",
+                [(id_job, d) for d in depende])
+        return id_job
+
+    def enfileirar_empresa(self, tipo, origem, saida="resultados", etapas=ETAPAS,
+                           prioridade=0, formato="csv", destino=None, plano=None, snapshots=None,
+                           previsao="rapido", colunas=("Margem_de_Lucro",), horizonte=6,
+                           max_tentativas=3, refazer=False):
+        """
+        Enfileira a cadeia de etapas de uma fonte ('json' caminho ou 'mongo'
+        DB/COLECAO), cada etapa dependendo da anterior. Com `destino` (nome do
+        banco), fontes JSON são ingeridas no MongoDB e as etapas seguintes
+        leem a coleção; `plano` é um plano de contas de utils.plano_contas e
+        `snapshots` o diretório de versões de utils.snapshots.
+
+        Retorna:
+        --------
+        list com os ids dos jobs enfileirados
+        """
+        from utils.cli import nome_empresa
+
+        etapas = [e for e in ETAPAS if e in etapas]
+        empresa = nome_empresa(tipo, origem)
+        parametros = {"empresa": empresa, "tipo": tipo, "origem": str(origem),
+                      "saida": str(saida), "formato": formato, "destino": destino,
+                      "plano": plano, "snapshots": snapshots and str(snapshots),
+                      "previsao": previsao, "colunas": list(colunas), "horizonte": horizonte}
+        Path(saida).mkdir(parents=True, exist_ok=True)
+
+        ids = []
+        for etapa in etapas:
+            ids.append(self.enfileirar(empresa, etapa, parametros, depende=ids[-1:],
+                                       prioridade=prioridade, max_tentativas=max_tentativas,
+                                       refazer=refazer))
+        return ids
+
+    def _prontos(self, limite):
+        """Jobs pendentes, disponíveis e com todas as dependências concluídas."""
+        return self._conexao.execute(
+            """SELECT * FROM jobs WHERE estado = 'pendente' AND disponivel_em <= ?
+               AND NOT EXISTS (SELECT 1 FROM dependencias d JOIN jobs j ON j.id = d.depende
+                               WHERE d.job = jobs.id AND j.estado != 'concluido')
+               ORDER BY prioridade DESC, seq LIMIT ?""", (time.time(), limite)).fetchall()
+
+    def _proxima_tentativa(self):
+        """Instante da próxima nova tentativa agendada (None se não houver)."""
+        linha = self._conexao.execute(
+            "SELECT MIN(disponivel_em) FROM jobs WHERE estado = 'pendente' AND disponivel_em > ?",
+            (time.time(),)).fetchone()
+        return linha[0]
+
+    def _atualizar(self, id_job, **campos):
+        campos["atualizado_em"] = time.time()
+        with self._conexao:
+            self._conexao.execute(
+                f"UPDATE jobs SET {', '.join(f'{c} = ?' for c in campos)} WHERE id = ?",
+                (*campos.values(), id_job))
+
+    def _cancelar_dependentes(self, id_job):
+        with self._conexao:
+            self._conexao.execute(
+                """WITH RECURSIVE afetados(id) AS (
+                       SELECT job FROM dependencias WHERE depende = ?
+                       UNION SELECT d.job FROM dependencias d JOIN afetados a ON d.depende = a.id)
+                   UPDATE jobs SET estado = 'cancelado', erro = ?, atualizado_em = ?
+                   WHERE id IN (SELECT id FROM afetados) AND estado = 'pendente'""",
+                (id_job, f"dependência {id_job} falhou", time.time()))
+
+    def _concluir(self, job, futuro, ao_concluir):
+        try:
+            resultado = futuro.result()
+        except Exception as e:
+            tentativas = job["tentativas"] + 1
+            erro = f"{type(e).__name__}: {e}"
+            if tentativas < job["max_tentativas"] and not isinstance(e, ERROS_DEFINITIVOS):
+                espera = self.espera_base * 2 ** (tentativas - 1)
+                self._atualizar(job["id"], estado="pendente", tentativas=tentativas, erro=erro,
+                                disponivel_em=time.time() + espera)
+            else:
+                self._atualizar(job["id"], estado="falhou", tentativas=tentativas, erro=erro)
+                self._cancelar_dependentes(job["id"])
+        else:
+            self._atualizar(job["id"], estado="concluido", tentativas=job["tentativas"] + 1,
+                            resultado=json.dumps(resultado, default=str), erro=None)
+        if ao_concluir:
+            ao_concluir(self.job(job["id"]))
+
+    def executar(self, ao_concluir=None):
+        """
+        Executa a fila até não haver jobs pendentes. Jobs que estavam
+        'executando' (execução anterior interrompida) voltam para a fila.
+
+        Parâmetros:
+        -----------
+        ao_concluir : callable, opcional
+            Chamada com o dict do job a cada término (sucesso ou falha).
+
+        Retorna:
+        --------
+        dict estado -> quantidade de jobs (resumo)
+        """
+        with self._conexao:
+            self._conexao.execute(
+                "UPDATE jobs SET estado = 'pendente' WHERE estado = 'executando'")
+
+        Executor = ProcessPoolExecutor if self.processos else ThreadPoolExecutor
+        em_execucao = {}
+        with Executor(max_workers=self.workers) as pool:
+            while True:
+                livres = self.workers - len(em_execucao)
+                for job in (self._prontos(livres) if livres > 0 else []):
+                    self._atualizar(job["id"], estado="executando")
+                    futuro = pool.submit(executar_etapa, job["etapa"], json.loads(job["parametros"]))
+                    em_execucao[futuro] = job
+
+                proxima = self._proxima_tentativa()
+                espera = None if proxima is None else max(0.0, proxima - time.time())
+                if not em_execucao:
+                    # o que sobrar pendente depende de jobs que não estão na fila
+                    if espera is None:
+                        break
+                    # sem nada em execução, espera a próxima tentativa agendada
+                    time.sleep(espera)
+                    continue
+                feitos, _ = wait(em_execucao, timeout=espera, return_when=FIRST_COMPLETED)
+                for futuro in feitos:
+                    self._concluir(em_execucao.pop(futuro), futuro, ao_concluir)
+        return self.resumo()
+
+    def job(self, id_job):
+        linha = self._conexao.execute("SELECT * FROM jobs WHERE id = ?", (id_job,)).fetchone()
+        return dict(linha) if linha else None
+
+    def resumo(self):
+        contagem = dict(self._conexao.execute(
+            "SELECT estado, COUNT(*) FROM jobs GROUP BY estado").fetchall())
+        return {estado: contagem.get(estado, 0) for estado in ESTADOS}
+
+    def tabela(self):
+        """Estado de todos os jobs, na ordem de enfileiramento."""
+        return pd.read_sql_query(
+            "SELECT id, empresa, etapa, prioridade, estado, tentativas, erro, resultado "
+            "FROM jobs ORDER BY seq", self._conexao)
+
+    def reenfileirar_falhas(self):
+        """Volta jobs que falharam (e os dependentes cancelados) para a fila."""
+        with self._conexao:
+            cursor = self._conexao.execute(
+                "UPDATE jobs SET estado = 'pendente', tentativas = 0, disponivel_em = 0, "
+                "erro = NULL WHERE estado IN ('falhou', 'cancelado')")
+        return cursor.rowcount
+
+
+# ======================
+# Linha de comando
+# ======================
+def _argumentos(argv=None):
+    from utils.cli import BACKENDS, FORMATOS
+
+    parser = argparse.ArgumentParser(
+        prog="python -m utils.agendador",
+        description="Fechamento de mês de várias empresas com fila persistente de jobs.")
+    parser.add_argument("--estado", default="agendador.sqlite3",
+                        help="arquivo SQLite com o estado da fila (retomada após falhas)")
+    parser.add_argument("--mongo", nargs="+", default=[], metavar="DB/COLECAO")
+    parser.add_argument("--json", nargs="+", default=[], metavar="CAMINHO")
+    parser.add_argument("--destino", metavar="DB",
+                        help="fontes --json: ingere no MongoDB (uma coleção por empresa)")
+    parser.add_argument("--saida", default="resultados", help="pasta de saída")
+    parser.add_argument("--formato", choices=FORMATOS, default="csv")
+    parser.add_argument("--previsao", choices=BACKENDS,
+                        help="inclui a etapa de previsão com o backend indicado")
+    parser.add_argument("--colunas", nargs="+", default=["Margem_de_Lucro"])
+    parser.add_argument("--horizonte", type=int, default=6)
+    parser.add_argument("--planos", metavar="ARQUIVO",
+                        help="JSON {empresa: plano} com planos de contas (utils.plano_contas)")
+    parser.add_argument("--snapshots", metavar="DIR",
+                        help="grava versões imutáveis das tabelas de indicadores (utils.snapshots)")
+    parser.add_argument("--tentativas", type=int, default=3, help="tentativas por job")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--refazer", action="store_true",
+                        help="refaz as etapas já concluídas das fontes informadas")
+    parser.add_argument("--reenfileirar", action="store_true",
+                        help="volta para a fila os jobs que falharam")
+    parser.add_argument("--status", action="store_true",
+                        help="só mostra o estado da fila")
+    args = parser.parse_args(argv)
+
+    for origem in args.mongo:
+        if "/" not in origem:
+            parser.error(f"--mongo espera DB/COLECAO, recebido {origem!r}")
+    return args
+
+
+def main(argv=None):
+    from utils.cli import nome_empresa
+
+    args = _argumentos(argv)
+    agendador = Agendador(args.estado, workers=args.workers)
+    if args.status:
+        print(agendador.tabela().drop(columns="resultado").to_string(index=False))
+        return 0
+
+    planos = json.loads(Path(args.planos).read_text(encoding="utf-8")) if args.planos else {}
+    etapas = [e for e in ETAPAS if e != "previsao" or args.previsao]
+    fontes = [("mongo", o) for o in args.mongo] + [("json", o) for o in args.json]
+    # a ordem das fontes na linha de comando é a prioridade
+    for prioridade, (tipo, origem) in enumerate(reversed(fontes)):
+        agendador.enfileirar_empresa(
+            tipo, origem, saida=args.saida, etapas=etapas, prioridade=prioridade,
+            formato=args.formato, destino=args.destino, snapshots=args.snapshots,
+            plano=planos.get(nome_empresa(tipo, origem)), previsao=args.previsao,
+            colunas=args.colunas, horizonte=args.horizonte,
+            max_tentativas=args.tentativas, refazer=args.refazer)
+    if args.reenfileirar:
+        agendador.reenfileirar_falhas()
+
+    def relatar(job):
+        if job["estado"] == "concluido":
+            print(f"[ok] {job['id']}: {job['resultado']}")
+        elif job["estado"] == "falhou":
+            print(f"[erro] {job['id']}: {job['erro']}", file=sys.stderr)
+        else:
+            print(f"[repetir] {job['id']} (tentativa {job['tentativas']}): {job['erro']}",
+                  file=sys.stderr)
+
+    resumo = agendador.executar(ao_concluir=relatar)
+    print(" ".join(f"{estado}={n}" for estado, n in resumo.items()))
+    return 1 if resumo["falhou"] or resumo["cancelado"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""
+agregacao.py
+
+Agregação da tabela de indicadores em trimestres ou anos para os gráficos, de
+modo que o volume enviado ao navegador fique limitado qualquer que seja o
+tamanho do histórico. A semântica respeita cada tipo de coluna:
+
+- fluxos do período (receitas, impostos, custos) são somados
+- saldos (ativos, passivos, patrimônio, disponibilidades) usam o fim do período
+- índices (liquidez, margem, endividamento...) são recalculados a partir das
+  colunas agregadas, nunca somados ou tirados a média
+"""
+
+import pandas as pd
+
+from utils.functions import COLUNAS_FLUXO, COLUNAS_SALDO, calcular_indices
+
+
+FREQUENCIAS = {"M": 1, "T": 3, "A": 12}
+
+
+def escolher_frequencia(n_meses, max_pontos=36):
+    """
+    Menor granularidade ("M" mensal, "T" trimestral, "A" anual) que mantém o
+    número de pontos por série em até max_pontos.
+    """
+    for frequencia, meses in FREQUENCIAS.items():
+        if -(-n_meses // meses) <= max_pontos:
+            return frequencia
+    return "A"
+
+
+def _rotulo_periodo(meses, frequencia):
+    meses = pd.Index(meses).astype(str)
+    ano = meses.str[:4]
+    if frequencia == "A":
+        return ano
+    if frequencia == "T":
+        trimestre = (meses.str[5:7].astype(int) - 1) // 3 + 1
+        return ano + "-T" + trimestre.astype(str)
+    return meses
+
+
+def _fim_do_periodo(tabela, periodo, colunas):
+    """
+    Última linha de cada período, NaN inclusive: GroupBy.last pula os NaN e
+    devolveria o saldo de um mês anterior como se fosse o de fechamento.
+    """
+    return tabela[colunas].set_axis(periodo).groupby(level=0, sort=True).nth(-1)
+
+
+def agregar_indicadores(indicadores, frequencia="T"):
+    """
+    Agrega a tabela de indicadores (índice 'mes' no formato 'YYYY-MM').
+
+    Parâmetros:
+    -----------
+    indicadores : pd.DataFrame
+        Saída de processar_indicadores_financeiros.
+    frequencia : str
+        "M" (sem agregação), "T" (trimestre, rótulo 'YYYY-Tn') ou "A" (ano,
+        rótulo 'YYYY').
+
+    Retorna:
+    --------
+    pd.DataFrame com as mesmas colunas, uma linha por período, índice 'mes'.
+    """
+    if frequencia not in FREQUENCIAS:
+        raise ValueError(
+            f"Frequência inválida: {frequencia!r}. Use uma de {list(FREQUENCIAS)}.")
+    if frequencia == "M" or indicadores.empty:
+        return indicadores
+
+    tabela = indicadores.sort_index()
+    periodo = _rotulo_periodo(tabela.index, frequencia)
+    grupos = tabela.groupby(periodo, sort=True)
+
+    fluxos = [c for c in COLUNAS_FLUXO if c in tabela.columns]
+    saldos = [c for c in COLUNAS_SALDO if c in tabela.columns]
+    agregada = pd.concat([
+        _fim_do_periodo(tabela, periodo, saldos),
+        grupos[fluxos].sum(min_count=1),
+    ], axis=1)
+
+    # índices recalculados; colunas desconhecidas ficam com o fim do período
+    agregada = calcular_indices(agregada)
+    extras = [c for c in tabela.columns if c not in agregada.columns]
+    if extras:
+        agregada = agregada.join(_fim_do_periodo(tabela, periodo, extras))
+
+    agregada = agregada[[c for c in tabela.columns if c in agregada.columns]]
+    agregada.index.name = indicadores.index.name
+    return agregada
+
+
+def agregar_para_grafico(indicadores, max_pontos=36):
+    """
+    Escolhe automaticamente a frequência pelo número de meses e agrega.
+
+    Retorna:
+    --------
+    tuple : (tabela agregada, frequência escolhida)
+    """
+    frequencia = escolher_frequencia(len(indicadores), max_pontos=max_pontos)
+    return agregar_indicadores(indicadores, frequencia), frequencia
@@ -0,0 +1,158 @@
+"""
+anomalias.py
+
+Sinalização automática de movimentações atípicas: saltos repentinos nos
+débitos/créditos de uma conta analítica ou linhas de custo que rompem com o
+próprio histórico. Cada campo vira uma matriz conta × mês e cada célula é
+comparada com as `janela` células anteriores da mesma conta por um escore
+robusto (mediana e MAD, desvio absoluto mediano):
+
+    escore = 0,6745 · (valor - mediana) / MAD
+
+Janelas móveis são montadas com sliding_window_view e reduzidas por
+ordenação, de modo que dezenas de milhares de células conta-mês são
+avaliadas de uma só vez por empresa, sem laços em Python.
+"""
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+CAMPOS_ANOMALIAS = ("debito", "credito", "saldo_atual")
+
+# 0,6745 = quantil 75% da normal: torna o escore comparável a um z-score
+_CONSTANTE_MAD = 0.6745
+
+
+def matriz_contas(df, campo, chaves=("conta",)):
+    """
+    Pivota um campo das contas analíticas para uma matriz conta × mês.
+
+    Retorna:
+    --------
+    pd.DataFrame (índice = chaves, colunas = meses ordenados); NaN onde a
+    conta não aparece no mês. Linhas com chave NaN ficam de fora (o groupby
+    as descarta); detectar_anomalias troca antes a conta sem código pelo
+    caminho na hierarquia.
+    """
+    tabela = df.loc[df["mes"].notna(), list(chaves) + ["mes", campo]]
+    return (tabela.groupby(list(chaves) + ["mes"])[campo].sum()
+                  .unstack("mes").sort_index(axis=1))
+
+
+def _contas_com_caminho(df):
+    """Contas sem código identificadas pelo caminho nivel_1 > ... > nivel_n."""
+    sem_codigo = df["conta"].isna()
+    if not sem_codigo.any():
+        return df
+    from utils.hierarquia import colunas_niveis
+
+    caminhos = df.loc[sem_codigo, colunas_niveis(df)].apply(
+        lambda linha: " > ".join(v for v in linha if isinstance(v, str)), axis=1)
+    return df.assign(conta=df["conta"].where(~sem_codigo, caminhos))
+
+
+def mediana_janelas(janelas):
+    """
+    Mediana no último eixo ignorando NaN. Equivale a np.nanmedian, mas com
+    uma única ordenação (NaN vão para o fim) em vez de arrays mascarados,
+    que são lentos para janelas curtas.
+    """
+    ordenadas = np.sort(janelas, axis=-1)
+    quantidade = np.sum(~np.isnan(ordenadas), axis=-1)
+    baixo = np.maximum(quantidade - 1, 0) // 2
+    alto = quantidade // 2
+    mediana = (np.take_along_axis(ordenadas, baixo[..., None], axis=-1)[..., 0]
+               + np.take_along_axis(ordenadas, np.minimum(alto, janelas.shape[-1] - 1)[..., None],
+                                    axis=-1)[..., 0]) / 2
+    mediana[quantidade == 0] = np.nan
+    return mediana
+
+
+def escores_robustos(valores, janela=12, min_historico=6, escala_relativa=0.01,
+                     escala_minima=1.0):
+    """
+    Escore robusto de cada célula de `valores` (n, T) contra as `janela`
+    células anteriores da mesma linha.
+
+    Parâmetros:
+    -----------
+    janela : int
+        Meses de histórico comparados com cada mês.
+    min_historico : int
+        Mínimo de meses válidos no histórico; abaixo disso o escore é NaN.
+    escala_relativa, escala_minima : float
+        Piso da escala (fração da mediana e valor absoluto em R$), para que
+        contas de histórico constante (MAD = 0) não gerem escores infinitos
+        por variações de centavos.
+
+    Retorna:
+    --------
+    (escores, medianas) : dois np.ndarray (n, T)
+    """
+    valores = np.asarray(valores, dtype=float)
+    n, T = valores.shape
+    # janelas[:, t, :] = valores[:, t - janela .. t - 1]
+    preenchido = np.concatenate([np.full((n, janela), np.nan), valores], axis=1)
+    janelas = sliding_window_view(preenchido, janela, axis=1)[:, :T, :]
+
+    validos = np.sum(~np.isnan(janelas), axis=2)
+    mediana = mediana_janelas(janelas)
+    mad = mediana_janelas(np.abs(janelas - mediana[..., None]))
+
+    escala = np.maximum(mad / _CONSTANTE_MAD,
+                        np.maximum(escala_relativa * np.abs(mediana), escala_minima))
+    escores = (valores - mediana) / escala
+    escores[validos < min_historico] = np.nan
+    return escores, mediana
+
+
+def detectar_anomalias(df, campos=CAMPOS_ANOMALIAS, janela=12, min_historico=6,
+                       limiar=3.5):
+    """
+    Células conta × mês cujo escore robusto passa de `limiar` em módulo.
+
+    Parâmetros:
+    -----------
+    df : pd.DataFrame
+        Contas analíticas carregadas com saldos_completos=True (campos
+        ausentes são ignorados). Com coluna 'empresa', as contas são
+        separadas por empresa.
+    campos : sequência de str
+        Campos analisados (default: debito, credito e saldo_atual).
+    limiar : float
+        |escore| mínimo para sinalizar (3,5 é o corte usual do MAD).
+
+    Retorna:
+    --------
+    pd.DataFrame com empresa (se houver), conta, descricao, nivel_1, mes,
+    campo, valor, mediana e escore, ordenado do maior |escore| para o menor.
+    Contas sem código aparecem com o caminho na hierarquia em 'conta'.
+    """
+    df = _contas_com_caminho(df)
+    chaves = (["empresa"] if "empresa" in df.columns else []) + ["conta"]
+    descricoes = df.drop_duplicates(chaves).set_index(chaves)[["descricao", "nivel_1"]]
+
+    tabelas = []
+    for campo in campos:
+        if campo not in df.columns:
+            continue
+        matriz = matriz_contas(df, campo, chaves)
+        escores, medianas = escores_robustos(matriz.to_numpy(), janela=janela,
+                                             min_historico=min_historico)
+        linhas, colunas = np.nonzero(np.abs(np.nan_to_num(escores)) > limiar)
+        sinalizadas = matriz.index[linhas].to_frame(index=False)
+        sinalizadas["mes"] = matriz.columns[colunas]
+        sinalizadas["campo"] = campo
+        sinalizadas["valor"] = matriz.to_numpy()[linhas, colunas]
+        sinalizadas["mediana"] = medianas[linhas, colunas]
+        sinalizadas["escore"] = escores[linhas, colunas]
+        tabelas.append(sinalizadas)
+
+    colunas_saida = chaves + ["descricao", "nivel_1", "mes", "campo", "valor", "mediana", "escore"]
+    if not tabelas:
+        return pd.DataFrame(columns=colunas_saida)
+    anomalias = pd.concat(tabelas, ignore_index=True).join(descricoes, on=chaves)
+    ordem = np.argsort(-anomalias["escore"].abs().to_numpy(), kind="stable")
+    return anomalias.iloc[ordem][colunas_saida].reset_index(drop=True)
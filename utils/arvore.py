@@ -0,0 +1,241 @@
+"""
+arvore.py
+
+Representação compacta dos documentos de balancete para manter muitas
+empresas × meses residentes (app, trabalhadores da CLI, jobs em lote). Em vez
+de dicionários aninhados, cada documento vira uma ArvoreBalancete com a
+árvore em pré-ordem guardada em arrays NumPy:
+
+- pai, fim (índice após o último descendente) e profundidade de cada nó
+- descricao e conta como códigos inteiros numa tabela de textos compartilhada
+  (as mesmas descrições se repetem em todos os meses e empresas)
+- uma matriz nó × (saldo_anterior, debito, credito, saldo_atual)
+
+Uma subárvore é a fatia [i, fim[i]) e as folhas são os nós com
+fim[i] == i + 1, de modo que totais e percursos viram operações sobre
+fatias. ArvoreBalancete.linhas produz exatamente as linhas de
+linhas_do_documento (extract_accounts) sem reconstruir os dicionários.
+"""
+
+import numpy as np
+
+from utils.functions import (CAMPOS_MOVIMENTO, detectar_esquema, mes_do_documento,
+                             secao_do_documento)
+
+
+CAMPOS_VALORES = CAMPOS_MOVIMENTO + ("saldo_atual",)
+
+_SEM_CONTA = -1
+
+
+class TabelaTextos:
+    """Textos internados: cada descrição/código distinto é guardado uma vez."""
+
+    __slots__ = ("textos", "_codigos")
+
+    def __init__(self):
+        self.textos = []
+        self._codigos = {}
+
+    def codigo(self, texto):
+        codigo = self._codigos.get(texto)
+        if codigo is None:
+            codigo = self._codigos[texto] = len(self.textos)
+            self.textos.append(texto)
+        return codigo
+
+    def __getitem__(self, codigo):
+        return self.textos[codigo]
+
+    def __len__(self):
+        return len(self.textos)
+
+
+# Tabela do processo, compartilhada por todas as árvores
+TEXTOS = TabelaTextos()
+
+
+class ArvoreBalancete:
+    """
+    Um documento de balancete (um mês) em layout de arrays.
+
+    Construa com ArvoreBalancete.do_documento(doc), a partir do dicionário do
+    json.load ou do documento BSON devolvido pelo pymongo.
+    """
+
+    __slots__ = ("metadata", "mes", "id_documento", "secoes", "raizes", "pai", "fim",
+                 "profundidade", "folha", "descricao", "conta", "valores", "textos")
+
+    @classmethod
+    def do_documento(cls, doc, esquema=None, textos=TEXTOS):
+        """
+        Parâmetros:
+        -----------
+        doc : dict
+            Documento no formato do MongoDB/JSON.
+        esquema : tuple, opcional
+            Caminhos das seções (detectar_esquema); detectado quando ausente.
+        textos : TabelaTextos
+            Tabela onde descrições e contas são internadas.
+        """
+        secoes = [(c, secao_do_documento(doc, c)) for c in (esquema or detectar_esquema(doc))]
+        secoes = [(c, s) for c, s in secoes if s is not None]
+
+        pai, fim, profundidade, folha, descricao, conta, valores, raizes = \
+            [], [], [], [], [], [], [], []
+        for _, secao in secoes:
+            raizes.append(len(pai))
+            # pré-ordem iterativa; fim[i] é preenchido ao sair do nó
+            pilha = [(secao, -1, 0, False)]
+            while pilha:
+                no, indice_pai, nivel, saindo = pilha.pop()
+                if saindo:
+                    fim[no] = len(pai)
+                    continue
+                i = len(pai)
+                pai.append(indice_pai)
+                fim.append(i + 1)
+                profundidade.append(nivel)
+                folha.append("children" not in no)
+                descricao.append(textos.codigo(no["descricao"]))
+                codigo_conta = no.get("conta")
+                conta.append(_SEM_CONTA if codigo_conta is None else textos.codigo(codigo_conta))
+                valores.append([no.get(campo, 0.0) for campo in CAMPOS_VALORES])
+                if "children" in no:
+                    pilha.append((i, None, None, True))
+                    pilha.extend((filho, i, nivel + 1, False)
+                                 for filho in reversed(no["children"]))
+
+        arvore = cls()
+        arvore.metadata = dict(doc.get("metadata") or {})
+        arvore.mes = mes_do_documento(doc)
+        arvore.id_documento = doc.get("_id")
+        arvore.secoes = tuple(c for c, _ in secoes)
+        arvore.raizes = np.array(raizes, dtype=np.int32)
+        arvore.pai = np.array(pai, dtype=np.int32)
+        arvore.fim = np.array(fim, dtype=np.int32)
+        arvore.profundidade = np.array(profundidade, dtype=np.int8)
+        arvore.folha = np.array(folha, dtype=bool)
+        arvore.descricao = np.array(descricao, dtype=np.int32)
+        arvore.conta = np.array(conta, dtype=np.int32)
+        arvore.valores = np.array(valores, dtype=float).reshape(-1, len(CAMPOS_VALORES))
+        arvore.textos = textos
+        return arvore
+
+    def __len__(self):
+        return len(self.pai)
+
+    @property
+    def nbytes(self):
+        """Bytes ocupados pelos arrays (a tabela de textos é compartilhada)."""
+        return sum(getattr(self, a).nbytes for a in
+                   ("raizes", "pai", "fim", "profundidade", "folha", "descricao",
+                    "conta", "valores"))
+
+    def filhos(self, i):
+        """Índices dos filhos diretos do nó i."""
+        inicio, fim = i + 1, self.fim[i]
+        return inicio + np.flatnonzero(self.pai[inicio:fim] == i)
+
+    def folhas(self, i=None):
+        """Índices das folhas (contas analíticas) da árvore ou da subárvore de i."""
+        inicio, fim = (0, len(self)) if i is None else (i, self.fim[i])
+        return inicio + np.flatnonzero(self.folha[inicio:fim])
+
+    def total(self, i, campo="saldo_atual"):
+        """Soma de um campo nas folhas da subárvore de i."""
+        return self.valores[self.folhas(i), CAMPOS_VALORES.index(campo)].sum()
+
+    def caminho(self, i):
+        """Descrições de nivel_1 até o nó i."""
+        descricoes = []
+        while i >= 0:
+            descricoes.append(self.textos[self.descricao[i]])
+            i = self.pai[i]
+        return descricoes[::-1]
+
+    def linhas(self, source_id=None, saldos_completos=False):
+        """
+        Contas analíticas no formato de linhas_do_documento: nivel_1..n,
+        conta, descricao, (saldo_anterior, debito, credito,) saldo_atual, mes
+        e source_id.
+        """
+        if source_id is None:
+            source_id = self.id_documento
+        mes, textos = self.mes, self.textos
+        valores = self.valores.tolist()
+        campos = CAMPOS_VALORES if saldos_completos else ("saldo_atual",)
+        posicoes = [CAMPOS_VALORES.index(c) for c in campos]
+
+        rows = []
+        hierarquia = []
+        for i, (nivel, folha) in enumerate(zip(self.profundidade.tolist(), self.folha.tolist())):
+            del hierarquia[nivel:]
+            hierarquia.append(textos[self.descricao[i]])
+            if not folha:
+                continue
+            row = {f"nivel_{k + 1}": d for k, d in enumerate(hierarquia)}
+            conta = self.conta[i]
+            row["conta"] = None if conta == _SEM_CONTA else textos[conta]
+            row["descricao"] = hierarquia[-1]
+            for campo, posicao in zip(campos, posicoes):
+                row[campo] = valores[i][posicao]
+            row["mes"] = mes
+            row["source_id"] = source_id
+            rows.append(row)
+        return rows
+
+    def para_documento(self):
+        """Reconstrói o documento aninhado (para gravar de volta no MongoDB/JSON)."""
+        nos = []
+        for i in range(len(self)):
+            no = {"descricao": self.textos[self.descricao[i]]}
+            if self.conta[i] != _SEM_CONTA:
+                no["conta"] = self.textos[self.conta[i]]
+            if self.folha[i]:
+                no.update(zip(CAMPOS_VALORES, self.valores[i].tolist()))
+            else:
+                no["children"] = []
+            if self.pai[i] >= 0:
+                nos[self.pai[i]]["children"].append(no)
+            nos.append(no)
+
+        doc = {"metadata": dict(self.metadata)}
+        if self.id_documento is not None:
+            doc["_id"] = self.id_documento
+        for caminho, raiz in zip(self.secoes, self.raizes.tolist()):
+            destino = doc
+            for chave in caminho[:-1]:
+                destino = destino.setdefault(chave, {})
+            destino[caminho[-1]] = nos[raiz]
+        return doc
+
+
+class Carteira:
+    """
+    Balancetes de várias empresas residentes em memória, como ArvoreBalancete
+    sobre uma mesma tabela de textos.
+    """
+
+    __slots__ = ("arvores", "textos")
+
+    def __init__(self, textos=None):
+        self.arvores = {}
+        self.textos = textos or TabelaTextos()
+
+    def adicionar(self, empresa, documentos, esquema=None):
+        arvores = self.arvores.setdefault(empresa, [])
+        for doc in documentos:
+            arvores.append(ArvoreBalancete.do_documento(doc, esquema=esquema, textos=self.textos))
+        return len(arvores)
+
+    def linhas(self, empresa, saldos_completos=False):
+        """Linhas de todos os meses de uma empresa (formato de load_all_rows_from_*)."""
+        rows = []
+        for arvore in self.arvores.get(empresa, []):
+            rows.extend(arvore.linhas(saldos_completos=saldos_completos))
+        return rows
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for arvores in self.arvores.values() for a in arvores)
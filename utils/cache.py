@@ -0,0 +1,183 @@
+"""
+cache.py
+
+Cache de resultados compartilhado por todas as sessões do processo (e, se
+configurado, persistido em disco) para as saídas do pipeline: DataFrame achatado,
+tabela de indicadores e previsões.
+
+- As chaves devem incluir a empresa e a versão dos dados (ver
+  utils.db.versao_colecao), de modo que uma nova carga invalida naturalmente
+  as entradas antigas.
+- Single-flight: se várias sessões pedem a mesma chave ao mesmo tempo, apenas
+  uma executa o cálculo e as demais aguardam o resultado.
+- Despejo LRU limitado por número de itens (memória e disco).
+
+Os objetos devolvidos são compartilhados entre sessões: quem consome não deve
+alterá-los no lugar (use .copy() antes de mutar).
+"""
+
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from pathlib import Path
+
+
+class CacheResultados:
+    """
+    Cache LRU thread-safe com single-flight e camada opcional em disco.
+
+    Parâmetros:
+    -----------
+    max_itens : int
+        Número máximo de entradas mantidas em memória.
+    diretorio : str | Path, opcional
+        Pasta para persistir os resultados (pickle). Se None, só memória.
+    max_itens_disco : int
+        Número máximo de arquivos mantidos na pasta (os mais antigos saem).
+    """
+
+    def __init__(self, max_itens=64, diretorio=None, max_itens_disco=512):
+        self.max_itens = max_itens
+        self.max_itens_disco = max_itens_disco
+        self.diretorio = Path(diretorio) if diretorio else None
+        if self.diretorio is not None:
+            self.diretorio.mkdir(parents=True, exist_ok=True)
+
+        self._itens = OrderedDict()
+        self._em_calculo = {}
+        self._lock = threading.Lock()
+        self.estatisticas = {"acertos": 0, "acertos_disco": 0,
+                             "calculos": 0, "esperas": 0, "despejos": 0}
+
+    # ------------------------------------------------------------------
+    # API principal
+    # ------------------------------------------------------------------
+    def obter_ou_calcular(self, chave, funcao):
+        """
+        Retorna o valor em cache para `chave` ou executa `funcao()` uma única
+        vez, mesmo com várias sessões pedindo a mesma chave em paralelo.
+        Exceções de `funcao` são repassadas a todos que aguardavam e nada é
+        armazenado.
+        """
+        with self._lock:
+            if chave in self._itens:
+                self._itens.move_to_end(chave)
+                self.estatisticas["acertos"] += 1
+                return self._itens[chave]
+
+            futuro = self._em_calculo.get(chave)
+            dono = futuro is None
+            if dono:
+                futuro = Future()
+                self._em_calculo[chave] = futuro
+            else:
+                self.estatisticas["esperas"] += 1
+
+        if not dono:
+            return futuro.result()
+
+        try:
+            valor, do_disco = self._ler_disco(chave)
+            if do_disco:
+                self.estatisticas["acertos_disco"] += 1
+            else:
+                valor = funcao()
+                self.estatisticas["calculos"] += 1
+                self._gravar_disco(chave, valor)
+        except BaseException as e:
+            with self._lock:
+                del self._em_calculo[chave]
+            futuro.set_exception(e)
+            raise
+
+        with self._lock:
+            self._itens[chave] = valor
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+                self.estatisticas["despejos"] += 1
+            del self._em_calculo[chave]
+        futuro.set_result(valor)
+        return valor
+
+    def invalidar(self, filtro=None):
+        """
+        Remove entradas da memória. `filtro(chave) -> bool` escolhe quais;
+        sem filtro, limpa tudo. Os arquivos em disco não são apagados, pois
+        chaves com versão antiga simplesmente deixam de ser consultadas.
+        """
+        with self._lock:
+            if filtro is None:
+                self._itens.clear()
+                return
+            for chave in [c for c in self._itens if filtro(c)]:
+                del self._itens[chave]
+
+    def __contains__(self, chave):
+        with self._lock:
+            return chave in self._itens
+
+    def __len__(self):
+        with self._lock:
+            return len(self._itens)
+
+    # ------------------------------------------------------------------
+    # Camada em disco
+    # ------------------------------------------------------------------
+    def _caminho(self, chave):
+        nome = hashlib.sha1(repr(chave).encode("utf-8")).hexdigest()
+        return self.diretorio / f"{nome}.pkl"
+
+    def _ler_disco(self, chave):
+        if self.diretorio is None:
+            return None, False
+        caminho = self._caminho(chave)
+        try:
+            with open(caminho, "rb") as f:
+                valor = pickle.load(f)
+        except (OSError, pickle.PickleError, EOFError):
+            return None, False
+        os.utime(caminho)
+        return valor, True
+
+    def _gravar_disco(self, chave, valor):
+        if self.diretorio is None:
+            return
+        caminho = self._caminho(chave)
+        temporario = caminho.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        try:
+            with open(temporario, "wb") as f:
+                pickle.dump(valor, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temporario, caminho)
+        except (OSError, pickle.PickleError, TypeError, AttributeError):
+            # objeto não serializável: fica apenas em memória
+            temporario.unlink(missing_ok=True)
+            return
+
+        arquivos = sorted(self.diretorio.glob("*.pkl"),
+                          key=lambda p: p.stat().st_mtime)
+        for antigo in arquivos[:max(0, len(arquivos) - self.max_itens_disco)]:
+            antigo.unlink(missing_ok=True)
+
+
+_cache_processo = None
+_cache_lock = threading.Lock()
+
+
+def obter_cache():
+    """
+    Retorna o cache único do processo (compartilhado por todas as sessões do
+    Streamlit). Configurável pelas variáveis de ambiente CONSULX_CACHE_DIR
+    (ativa a persistência em disco) e CONSULX_CACHE_MAX_ITENS.
+    """
+    global _cache_processo
+    with _cache_lock:
+        if _cache_processo is None:
+            _cache_processo = CacheResultados(
+                max_itens=int(os.environ.get("CONSULX_CACHE_MAX_ITENS", 64)),
+                diretorio=os.environ.get("CONSULX_CACHE_DIR") or None,
+            )
+        return _cache_processo
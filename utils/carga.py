@@ -0,0 +1,310 @@
+"""
+carga.py
+
+Teste de carga do dashboard: simula N sessões simultâneas do app.py num único
+processo (como um worker do Streamlit, em que cada sessão é uma thread e o
+cache de utils.cache é compartilhado) e mede quanto tempo cada rerun leva.
+
+Cada sessão é um streamlit.testing.v1.AppTest que percorre um roteiro:
+carga inicial, troca de empresa, filtro de ano e interações com os widgets
+das abas (seletores e sliders de Índices, Projeção e Analítico). As abas do
+Streamlit são renderizadas a cada rerun, então "trocar de aba" não gera
+rerun no servidor; o que pesa são as interações dentro delas. Os dados vêm
+de balancetes JSON locais (CONSULX_DADOS_LOCAIS, ver utils.db_streamlit),
+sem MongoDB.
+
+Para cada nível de concorrência são registrados p50/p95/p99 da latência dos
+reruns, vazão, uso de CPU do processo e memória residente; CPU e memória
+por sessão são médias do processo, já que as sessões o compartilham. Uma
+sessão de aquecimento (fora da medição) importa o app e enche o cache antes
+do primeiro nível; com --cache-fria cada nível parte do cache vazio. O
+relatório de capacidade indica o maior nível com p95 dentro do limite.
+
+Exemplos:
+    python -m utils.carga --sessoes 1 2 4 8 --interacoes 6
+    python -m utils.carga --sessoes 4 16 --backend rapido --cache-fria --saida carga.csv
+"""
+
+import argparse
+import logging
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+# Coleções usadas pelo app; todas apontam para os mesmos balancetes locais
+COLECOES_PADRAO = ("industrial_nordeste", "Industria_Tecno_Metais")
+
+ROTULO_EMPRESA = "Selecione a Empresa:"
+ROTULO_ANO = "Selecione o(s) ano(s):"
+
+
+def memoria_residente():
+    """Memória residente do processo em bytes (pico, fora do Linux)."""
+    try:
+        paginas = int(Path("/proc/self/statm").read_text().split()[1])
+        return paginas * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return pico if sys.platform == "darwin" else pico * 1024
+
+
+def preparar_dados(dados, colecoes=COLECOES_PADRAO):
+    """
+    Pasta para CONSULX_DADOS_LOCAIS com uma entrada por coleção apontando para
+    `dados` (uma pasta de balancetes JSON). Quem chama apaga a pasta ao final.
+    """
+    raiz = Path(tempfile.mkdtemp(prefix="consulx_carga_"))
+    for colecao in colecoes:
+        (raiz / colecao).symlink_to(Path(dados).resolve(), target_is_directory=True)
+    return raiz
+
+
+def _widgets(app, tipo):
+    return [w for w in app.get(tipo) if not getattr(w, "disabled", False)]
+
+
+def _interagir(app, rng):
+    """Muda um widget aleatório das abas (exceto empresa e ano)."""
+    candidatos = [w for tipo in ("selectbox", "slider", "select_slider")
+                  for w in _widgets(app, tipo)
+                  if getattr(w, "label", None) not in (ROTULO_EMPRESA, ROTULO_ANO)]
+    if not candidatos:
+        return None
+    widget = rng.choice(candidatos)
+    if widget.type == "slider":
+        minimo, maximo = widget.min, widget.max
+        if isinstance(widget.value, (tuple, list)):
+            return None
+        passo = widget.step or 1
+        valores = np.arange(minimo, maximo + passo / 2, passo)
+        widget.set_value(type(widget.value)(rng.choice(list(valores))))
+    else:
+        widget.set_value(rng.choice(list(widget.options)))
+    return widget.label
+
+
+def roteiro_sessao(interacoes=4, semente=None, timeout=600):
+    """
+    Executa o roteiro de uma sessão e devolve a lista de reruns
+    [{'acao', 'latencia', 'erros'}] ('erros' = exceções exibidas pelo app).
+    """
+    from streamlit.testing.v1 import AppTest
+
+    rng = random.Random(semente)
+    app = AppTest.from_file(str(RAIZ / "app.py"), default_timeout=timeout)
+    reruns = []
+
+    def rerun(acao):
+        inicio = time.perf_counter()
+        app.run()
+        reruns.append({"acao": acao, "latencia": time.perf_counter() - inicio,
+                       "erros": len(app.exception)})
+
+    rerun("inicial")
+    empresa = [w for w in app.selectbox if w.label == ROTULO_EMPRESA]
+    if empresa:
+        empresa[0].set_value(rng.choice(list(empresa[0].options)))
+        rerun("empresa")
+    ano = [w for w in app.multiselect if w.label == ROTULO_ANO]
+    if ano and ano[0].options:
+        opcoes = list(ano[0].options)
+        ano[0].set_value(sorted(rng.sample(opcoes, rng.randint(1, len(opcoes)))))
+        rerun("ano")
+    for _ in range(interacoes):
+        rotulo = _interagir(app, rng)
+        if rotulo is None:
+            continue
+        rerun(f"widget:{rotulo}")
+    return reruns
+
+
+def medir_nivel(sessoes, interacoes=4, semente=0, timeout=600):
+    """
+    Roda `sessoes` sessões simultâneas e devolve (resumo do nível, reruns).
+    """
+    cpu_inicio, memoria_inicio = time.process_time(), memoria_residente()
+    inicio = time.perf_counter()
+    pico = [memoria_inicio]
+    parar = threading.Event()
+
+    def amostrar_memoria():
+        while not parar.wait(0.05):
+            pico[0] = max(pico[0], memoria_residente())
+    amostrador = threading.Thread(target=amostrar_memoria, daemon=True)
+    amostrador.start()
+
+    with ThreadPoolExecutor(max_workers=sessoes) as pool:
+        futuros = [pool.submit(roteiro_sessao, interacoes, semente + i, timeout)
+                   for i in range(sessoes)]
+        reruns = []
+        for i, futuro in enumerate(futuros):
+            reruns.extend(dict(r, sessao=i) for r in futuro.result())
+
+    parar.set()
+    amostrador.join()
+    duracao = time.perf_counter() - inicio
+    cpu = time.process_time() - cpu_inicio
+    reruns = pd.DataFrame(reruns)
+    latencias = reruns["latencia"].to_numpy()
+
+    resumo = {
+        "sessoes": sessoes,
+        "reruns": len(reruns),
+        "erros": int(reruns["erros"].sum()),
+        "p50": float(np.percentile(latencias, 50)),
+        "p95": float(np.percentile(latencias, 95)),
+        "p99": float(np.percentile(latencias, 99)),
+        "max": float(latencias.max()),
+        "reruns_por_s": len(reruns) / duracao,
+        "cpu_pct": 100 * cpu / duracao,
+        "cpu_s_por_sessao": cpu / sessoes,
+        "memoria_mb": memoria_residente() / 2 ** 20,
+        "memoria_pico_mb": pico[0] / 2 ** 20,
+        "memoria_mb_por_sessao": max(pico[0] - memoria_inicio, 0) / 2 ** 20 / sessoes,
+        "duracao_s": duracao,
+    }
+    return resumo, reruns
+
+
+def relatorio_capacidade(niveis, limite_p95=2.0):
+    """
+    Maior número de sessões simultâneas com p95 <= limite_p95 (s) e sem erros.
+
+    Parâmetros:
+    -----------
+    niveis : pd.DataFrame
+        Resumos de medir_nivel, um por nível.
+    """
+    dentro = niveis[(niveis["p95"] <= limite_p95) & (niveis["erros"] == 0)]
+    capacidade = int(dentro["sessoes"].max()) if len(dentro) else 0
+    texto = [f"Capacidade estimada: {capacidade} sessão(ões) simultânea(s) com p95 <= "
+             f"{limite_p95:.1f}s"]
+    if capacidade and capacidade == niveis["sessoes"].max():
+        texto.append("(o limite não foi atingido nos níveis testados; teste níveis maiores)")
+    gargalo = niveis.loc[niveis["sessoes"].idxmax()]
+    if gargalo["cpu_pct"] >= 90:
+        texto.append(f"CPU do processo em {gargalo['cpu_pct']:.0f}% no maior nível: "
+                     "o worker está saturado (GIL/CPU); escale em processos/réplicas.")
+    return {"capacidade": capacidade, "texto": "\n".join(texto)}
+
+
+def executar_carga(niveis=(1, 2, 4, 8), interacoes=4, dados=None, backend=None,
+                   cache_fria=False, aquecer=True, limite_p95=2.0, semente=0, timeout=600):
+    """
+    Mede cada nível de concorrência em sequência, no processo atual.
+
+    Parâmetros:
+    -----------
+    dados : str ou Path, opcional
+        Pasta de balancetes JSON (default: balancetes/industrial_nordeste).
+    backend : str, opcional
+        CONSULX_BACKEND_PREVISAO do app ('arima' ou 'rapido').
+    cache_fria : bool
+        Esvazia o cache compartilhado antes de cada nível (mede o pior caso,
+        sem reaproveitar cargas e ajustes do nível anterior).
+    aquecer : bool
+        Roda uma sessão fora da medição antes do primeiro nível (importação
+        do app e caches quentes); ignorado com cache_fria.
+
+    Retorna:
+    --------
+    dict com 'niveis' (pd.DataFrame, um resumo por nível), 'reruns'
+    (pd.DataFrame com todos os reruns) e 'capacidade' (relatorio_capacidade)
+    """
+    from utils.cache import obter_cache
+
+    dados = dados or RAIZ / "balancetes" / "industrial_nordeste"
+    raiz = preparar_dados(dados)
+    anteriores = {var: os.environ.get(var)
+                  for var in ("CONSULX_DADOS_LOCAIS", "CONSULX_BACKEND_PREVISAO")}
+    os.environ["CONSULX_DADOS_LOCAIS"] = str(raiz)
+    if backend:
+        os.environ["CONSULX_BACKEND_PREVISAO"] = backend
+
+    try:
+        if aquecer and not cache_fria:
+            roteiro_sessao(interacoes=0, semente=semente, timeout=timeout)
+
+        resumos, todos = [], []
+        for sessoes in niveis:
+            if cache_fria:
+                obter_cache().invalidar()
+            resumo, reruns = medir_nivel(sessoes, interacoes=interacoes, semente=semente,
+                                         timeout=timeout)
+            resumos.append(resumo)
+            todos.append(reruns.assign(nivel=sessoes))
+    finally:
+        # a pasta só tem links para `dados`: rmtree apaga os links, não os balancetes
+        shutil.rmtree(raiz, ignore_errors=True)
+        for var, valor in anteriores.items():
+            if valor is None:
+                os.environ.pop(var, None)
+            else:
+                os.environ[var] = valor
+
+    niveis = pd.DataFrame(resumos)
+    return {"niveis": niveis, "reruns": pd.concat(todos, ignore_index=True),
+            "capacidade": relatorio_capacidade(niveis, limite_p95=limite_p95)}
+
+
+def _argumentos(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m utils.carga",
+        description="Teste de carga do dashboard com sessões simuladas (AppTest).")
+    parser.add_argument("--sessoes", nargs="+", type=int, default=[1, 2, 4, 8],
+                        help="níveis de concorrência medidos, em ordem")
+    parser.add_argument("--interacoes", type=int, default=4,
+                        help="interações com widgets das abas por sessão")
+    parser.add_argument("--dados", help="pasta de balancetes JSON (default: industrial_nordeste)")
+    parser.add_argument("--backend", choices=("arima", "rapido"),
+                        help="backend de previsão do app (CONSULX_BACKEND_PREVISAO)")
+    parser.add_argument("--cache-fria", action="store_true",
+                        help="esvazia o cache compartilhado antes de cada nível")
+    parser.add_argument("--sem-aquecimento", action="store_true",
+                        help="mede também a primeira sessão (importação e cargas iniciais)")
+    parser.add_argument("--limite-p95", type=float, default=2.0,
+                        help="latência p95 (s) aceitável para o relatório de capacidade")
+    parser.add_argument("--semente", type=int, default=0)
+    parser.add_argument("--saida", help="CSV com os reruns (o resumo vai para *_niveis.csv)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = _argumentos(argv)
+    # sessões do AppTest rodam fora de um servidor: o aviso de contexto é esperado
+    import streamlit.testing.v1  # noqa: F401  (cria os loggers do streamlit)
+    for nome in list(logging.root.manager.loggerDict):
+        if nome.startswith("streamlit"):
+            logging.getLogger(nome).setLevel(logging.ERROR)
+    resultado = executar_carga(niveis=args.sessoes, interacoes=args.interacoes,
+                               dados=args.dados, backend=args.backend,
+                               cache_fria=args.cache_fria,
+                               aquecer=not args.sem_aquecimento, limite_p95=args.limite_p95,
+                               semente=args.semente)
+    niveis = resultado["niveis"]
+    with pd.option_context("display.width", 200, "display.max_columns", None):
+        print(niveis.round(3).to_string(index=False))
+    print(resultado["capacidade"]["texto"])
+
+    if args.saida:
+        saida = Path(args.saida)
+        resultado["reruns"].to_csv(saida, index=False)
+        niveis.to_csv(saida.with_name(f"{saida.stem}_niveis.csv"), index=False)
+    return 1 if niveis["erros"].sum() else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,370 @@
+"""
+cli.py
+
+Execução do pipeline de indicadores pela linha de comando, sem Streamlit, para
+os fechamentos de mês agendados (cron). Cada empresa é uma fonte (coleção do
+MongoDB ou arquivo/pasta JSON) e é processada num processo separado.
+
+Exemplos:
+    python -m utils.cli --mongo ConsulX_db/industrial_nordeste --saida resultados
+    python -m utils.cli --mongo ConsulX_db/industrial_nordeste --pushdown --sincronizar
+    python -m utils.cli --json balancetes/industrial_nordeste --formato parquet \\
+        --previsao rapido --colunas Margem_de_Lucro Liquidez_Corrente --workers 4
+    python -m utils.cli --json balancetes/tecnotubo --planos planos_contas.json
+    python -m utils.cli --json balancetes/industrial_nordeste balancetes/Tech_Solutions --lote
+
+--planos aponta para um JSON {empresa: plano} com o plano de contas das
+empresas que não seguem o plano padrão (ver utils.plano_contas). Com
+--snapshots DIR cada tabela de indicadores também é gravada como versão
+imutável em DIR (utils.snapshots), e os meses retificados são reportados.
+
+Com --lote as fontes JSON são processadas juntas no processo atual, mantidas
+em memória como árvores compactas (utils.arvore.Carteira).
+
+Para cada empresa são gravados {saida}/{empresa}_indicadores.{formato} e, com
+--previsao, {saida}/{empresa}_previsoes.{formato}.
+"""
+
+import argparse
+import json
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import pandas as pd
+
+
+FORMATOS = ("csv", "parquet", "json")
+BACKENDS = ("rapido", "arima")
+
+
+def nome_empresa(tipo, origem):
+    if tipo == "mongo":
+        return origem.split("/", 1)[1]
+    return Path(origem).stem if Path(origem).is_file() else Path(origem).name
+
+
+def carregar_linhas(tipo, origem, saldos_completos=False):
+    """
+    Linhas (contas analíticas) de uma fonte 'mongo' (DB/COLECAO) ou 'json'
+    (caminho), com os contadores de leitura (LeitorBalancetes.contadores).
+    """
+    from utils import db
+    if tipo == "mongo":
+        db_name, coll_name = origem.split("/", 1)
+        linhas = db.load_all_rows_from_mongo(db_name=db_name, coll_name=coll_name,
+                                             saldos_completos=saldos_completos)
+        return linhas, db.leitor_da_colecao(db_name, coll_name).contadores
+
+    from utils.functions import LeitorBalancetes
+    leitor = LeitorBalancetes()
+    linhas = db.load_all_rows_from_json(origem, leitor=leitor, saldos_completos=saldos_completos)
+    return linhas, leitor.contadores
+
+
+def prever_colunas(indicadores, colunas, backend="rapido", horizon=6, n_testes=6):
+    """
+    Previsão com intervalos (utils.intervalos) para cada coluna pedida.
+    Colunas que não estão na tabela são buscadas nas séries derivadas
+    (utils.derivadas: _TTM, _YTD, _MM3, ...).
+
+    Retorna:
+    --------
+    pd.DataFrame com colunas 'coluna', 'mes', 'forecast', 'inferior_80', ...
+    """
+    from utils.intervalos import intervalos_backtest
+
+    if backend == "rapido":
+        from utils.previsao_rapida import backtest_rapido, previsao_rapida
+
+        def prever(serie):
+            return previsao_rapida(serie, horizon=horizon)[0], None
+
+        def backtest(serie, n_testes):
+            return backtest_rapido(serie, n_testes=n_testes, horizonte=horizon)
+    else:
+        from utils.functions import backtest_auto_arima, previsao_auto_arima
+
+        def prever(serie):
+            previsoes, _, modelo = previsao_auto_arima(serie, horizon=horizon,
+                                                       retornar_modelo=True)
+            return previsoes, modelo
+        backtest = backtest_auto_arima
+
+    faltando = [c for c in colunas if c not in indicadores.columns]
+    if faltando:
+        from utils.derivadas import derivar_series
+        indicadores = indicadores.join(derivar_series(indicadores)[faltando])
+
+    tabelas = []
+    for coluna in colunas:
+        serie = indicadores[coluna]
+        previsoes, modelo = prever(serie)
+        tabela = intervalos_backtest(previsoes, backtest(serie, n_testes=n_testes), modelo=modelo)
+        tabela.index = pd.Index(tabela.index).strftime("%Y-%m")
+        tabelas.append(tabela.rename_axis("mes").reset_index().assign(coluna=coluna))
+
+    previsoes = pd.concat(tabelas, ignore_index=True)
+    return previsoes[["coluna"] + [c for c in previsoes.columns if c != "coluna"]]
+
+
+def gravar(tabela, caminho, formato):
+    if formato == "csv":
+        tabela.to_csv(caminho, index=False)
+    elif formato == "parquet":
+        tabela.to_parquet(caminho, index=False)
+    else:
+        tabela.to_json(caminho, orient="records", force_ascii=False, indent=2)
+    return str(caminho)
+
+
+def ler(caminho, formato):
+    """Lê uma tabela gravada por gravar."""
+    if formato == "csv":
+        return pd.read_csv(caminho)
+    if formato == "parquet":
+        return pd.read_parquet(caminho)
+    return pd.read_json(caminho, orient="records")
+
+
+def calcular_indicadores(tipo, origem, pushdown=False, sincronizar=False, validar=False,
+                         plano=None):
+    """
+    Indicadores de uma fonte, contadores de leitura e, com validar=True, o
+    relatório de utils.validacao. Com pushdown (só MongoDB), as somas por
+    grupo são feitas no servidor sobre a coleção de folhas, opcionalmente
+    sincronizada antes a partir das árvores. Com `plano` (utils.plano_contas)
+    os grupos seguem o plano de contas da empresa.
+    """
+    from utils.validacao import validar_balancetes
+
+    validacao = None
+    if pushdown and tipo == "mongo" and plano is None:
+        from utils import db
+        db_name, coll_name = origem.split("/", 1)
+        if sincronizar:
+            db.sincronizar_folhas(db_name, coll_name)
+        indicadores, contadores = db.load_indicadores_from_mongo(db_name, coll_name), {}
+        if validar:
+            validacao = validar_balancetes(db.load_folhas_from_mongo(db_name, coll_name))
+    else:
+        from utils.plano_contas import processar_indicadores_por_plano
+        linhas, contadores = carregar_linhas(tipo, origem, saldos_completos=validar)
+        df = pd.DataFrame(linhas)
+        indicadores = processar_indicadores_por_plano(df, plano=plano) if linhas else None
+        if validar and linhas:
+            validacao = validar_balancetes(df)
+
+    if indicadores is None or indicadores.empty:
+        raise ValueError(f"Nenhuma conta encontrada em {origem}.")
+    return indicadores, contadores, validacao
+
+
+def gravar_resultados(empresa, indicadores, saida, formato="csv", previsao=None,
+                      colunas=("Margem_de_Lucro",), horizon=6, validacao=None,
+                      snapshots=None, fallback=0):
+    """
+    Grava a tabela de indicadores de uma empresa e, conforme pedido, as
+    previsões, a validação e o snapshot.
+
+    Retorna:
+    --------
+    dict : {'empresa', 'meses', 'arquivos', 'fallback', 'problemas', 'snapshot'}
+    """
+    saida = Path(saida)
+    saida.mkdir(parents=True, exist_ok=True)
+    arquivos = [gravar(indicadores.reset_index(),
+                       saida / f"{empresa}_indicadores.{formato}", formato)]
+    if previsao:
+        previsoes = prever_colunas(indicadores, colunas, backend=previsao, horizon=horizon)
+        arquivos.append(gravar(previsoes, saida / f"{empresa}_previsoes.{formato}", formato))
+
+    problemas = {}
+    if validacao is not None:
+        arquivos.append(gravar(validacao["ocorrencias"],
+                               saida / f"{empresa}_validacao.{formato}", formato))
+        resumo = validacao["resumo"]["ocorrencias"]
+        problemas = resumo[resumo > 0].to_dict()
+
+    snapshot = None
+    if snapshots:
+        from utils.snapshots import registrar_snapshot
+        snapshot = registrar_snapshot(snapshots, empresa, indicadores)
+
+    return {"empresa": empresa, "meses": len(indicadores), "arquivos": arquivos,
+            "fallback": fallback, "problemas": problemas, "snapshot": snapshot}
+
+
+def processar_empresa(tipo, origem, saida, formato="csv", previsao=None,
+                      colunas=("Margem_de_Lucro",), horizon=6, pushdown=False,
+                      sincronizar=False, validar=False, planos=None, snapshots=None):
+    """
+    Pipeline completo de uma empresa; executado em cada processo trabalhador.
+    `planos` é o {empresa: plano} de --planos e `snapshots` o diretório de
+    --snapshots.
+
+    Retorna:
+    --------
+    dict : {'empresa', 'meses', 'arquivos', 'fallback', 'problemas', 'snapshot'}
+    """
+    empresa = nome_empresa(tipo, origem)
+    indicadores, contadores, validacao = calcular_indicadores(
+        tipo, origem, pushdown=pushdown, sincronizar=sincronizar, validar=validar,
+        plano=(planos or {}).get(empresa))
+    return gravar_resultados(empresa, indicadores, saida, formato=formato, previsao=previsao,
+                             colunas=colunas, horizon=horizon, validacao=validacao,
+                             snapshots=snapshots, fallback=contadores.get("fallback", 0))
+
+
+def processar_lote(origens, saida, formato="csv", previsao=None, colunas=("Margem_de_Lucro",),
+                   horizon=6, validar=False, planos=None, snapshots=None):
+    """
+    Processa juntas, no processo atual, várias fontes JSON (--lote): os
+    balancetes ficam em memória como árvores compactas numa única Carteira
+    (utils.arvore), com a tabela de textos compartilhada entre as empresas, em
+    vez de um processo com os dicionários do json.load por empresa. Os
+    indicadores de todas as empresas saem de uma só chamada a
+    processar_indicadores_por_plano, com o plano de cada uma (`planos`).
+
+    Retorna:
+    --------
+    list de (origem, dict de processar_empresa ou a exceção da empresa)
+    """
+    from utils import db
+    from utils.arvore import Carteira
+    from utils.plano_contas import processar_indicadores_por_plano
+    from utils.validacao import validar_balancetes
+
+    carteira = Carteira()
+    resultados, linhas = {}, []
+    for origem in origens:
+        empresa = nome_empresa("json", origem)
+        try:
+            db.load_carteira_from_json(origem, empresa=empresa, carteira=carteira)
+            df = pd.DataFrame(carteira.linhas(empresa, saldos_completos=validar))
+            if df.empty:
+                raise ValueError(f"Nenhuma conta encontrada em {origem}.")
+        except Exception as e:
+            resultados[origem] = e
+            continue
+        linhas.append(df.assign(empresa=empresa))
+
+    # um único cálculo para todas as empresas, cada uma com o seu plano de contas
+    df = pd.concat(linhas, ignore_index=True) if linhas else pd.DataFrame()
+    tabela = processar_indicadores_por_plano(df, planos=planos) if linhas else None
+
+    for origem in origens:
+        if origem in resultados:
+            continue
+        empresa = nome_empresa("json", origem)
+        try:
+            empresas = tabela.index.get_level_values("empresa")
+            indicadores = tabela.loc[empresas == empresa].droplevel("empresa")
+            if indicadores.empty:
+                raise ValueError(f"Nenhuma conta encontrada em {origem}.")
+            validacao = (validar_balancetes(df.loc[df["empresa"] == empresa].drop(columns="empresa"))
+                         if validar else None)
+            resultados[origem] = gravar_resultados(
+                empresa, indicadores, saida, formato=formato, previsao=previsao,
+                colunas=colunas, horizon=horizon, validacao=validacao, snapshots=snapshots)
+        except Exception as e:
+            resultados[origem] = e
+    return [(origem, resultados[origem]) for origem in origens]
+
+
+def _argumentos(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m utils.cli",
+        description="Calcula os indicadores financeiros (e previsões) por empresa.")
+    parser.add_argument("--mongo", nargs="+", default=[], metavar="DB/COLECAO",
+                        help="coleções do MongoDB (URI em MONGO_URI ou .streamlit/secrets.toml)")
+    parser.add_argument("--json", nargs="+", default=[], metavar="CAMINHO",
+                        help="arquivos ou pastas de balancetes JSON")
+    parser.add_argument("--saida", default="resultados", help="pasta de saída")
+    parser.add_argument("--formato", choices=FORMATOS, default="csv")
+    parser.add_argument("--previsao", choices=BACKENDS,
+                        help="também gera previsões com o backend indicado")
+    parser.add_argument("--colunas", nargs="+", default=["Margem_de_Lucro"],
+                        help="indicadores previstos (com --previsao); aceita as séries "
+                             "derivadas, ex: Margem_de_Lucro_TTM")
+    parser.add_argument("--horizonte", type=int, default=6, help="meses previstos")
+    parser.add_argument("--pushdown", action="store_true",
+                        help="fontes --mongo: soma os grupos no MongoDB (coleção de folhas)")
+    parser.add_argument("--sincronizar", action="store_true",
+                        help="com --pushdown, regrava antes a coleção de folhas")
+    parser.add_argument("--validar", action="store_true",
+                        help="valida a integridade dos balancetes (utils.validacao)")
+    parser.add_argument("--planos", metavar="ARQUIVO",
+                        help="JSON {empresa: plano} com planos de contas (utils.plano_contas)")
+    parser.add_argument("--snapshots", metavar="DIR",
+                        help="grava versões imutáveis das tabelas de indicadores (utils.snapshots)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="processos em paralelo (default: número de CPUs)")
+    parser.add_argument("--lote", action="store_true",
+                        help="fontes --json processadas juntas num só processo, como "
+                             "árvores compactas (utils.arvore)")
+    args = parser.parse_args(argv)
+
+    for origem in args.mongo:
+        if "/" not in origem:
+            parser.error(f"--mongo espera DB/COLECAO, recebido {origem!r}")
+    if not args.mongo and not args.json:
+        parser.error("informe ao menos uma fonte com --mongo ou --json")
+    if args.lote and args.mongo:
+        parser.error("--lote aceita apenas fontes --json")
+    return args
+
+
+def main(argv=None):
+    args = _argumentos(argv)
+    fontes = [("mongo", o) for o in args.mongo] + [("json", o) for o in args.json]
+    planos = json.loads(Path(args.planos).read_text(encoding="utf-8")) if args.planos else None
+
+    if args.lote:
+        resultados = processar_lote(args.json, args.saida, args.formato, args.previsao,
+                                    tuple(args.colunas), args.horizonte, args.validar,
+                                    planos, args.snapshots)
+    else:
+        resultados = _processar_em_paralelo(fontes, args, planos)
+
+    falhas = 0
+    for origem, resultado in resultados:
+        if isinstance(resultado, Exception):
+            falhas += 1
+            print(f"[erro] {origem}: {type(resultado).__name__}: {resultado}", file=sys.stderr)
+            continue
+        print(f"[ok] {resultado['empresa']}: {resultado['meses']} meses -> "
+              + ", ".join(resultado["arquivos"]))
+        snapshot = resultado["snapshot"]
+        if snapshot and snapshot["meses_alterados"]:
+            print(f"[retificacao] {resultado['empresa']}: versão {snapshot['versao']}, "
+                  "meses alterados: " + ", ".join(snapshot["meses_alterados"]),
+                  file=sys.stderr)
+        if resultado["problemas"]:
+            print(f"[validacao] {resultado['empresa']}: " + ", ".join(
+                f"{k}={v}" for k, v in resultado["problemas"].items()), file=sys.stderr)
+        if resultado["fallback"]:
+            print(f"[aviso] {resultado['empresa']}: {resultado['fallback']} documento(s) "
+                  "fora do esquema lidos pela heurística", file=sys.stderr)
+
+    return 1 if falhas else 0
+
+
+def _processar_em_paralelo(fontes, args, planos):
+    """Uma empresa por processo; gera (origem, resultado ou exceção) na ordem de conclusão."""
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        futuros = {
+            pool.submit(processar_empresa, tipo, origem, args.saida, args.formato,
+                        args.previsao, tuple(args.colunas), args.horizonte,
+                        args.pushdown, args.sincronizar, args.validar, planos, args.snapshots): origem
+            for tipo, origem in fontes
+        }
+        for futuro in as_completed(futuros):
+            try:
+                yield futuros[futuro], futuro.result()
+            except Exception as e:
+                yield futuros[futuro], e
+
+
+if __name__ == "__main__":
+    sys.exit(main())
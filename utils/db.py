@@ -1,74 +1,487 @@
-from utils.functions import processar_indicadores_financeiros, extract_accounts, extract_mes_from_periodo
+"""
+db.py
+
+Leitura dos balancetes (MongoDB ou JSON local), sem dependência do Streamlit:
+a configuração vem de provedores de URI e os problemas são reportados por
+exceções (ErroBancoDados), de modo que os mesmos loaders rodam no dashboard,
+na CLI, em processos trabalhadores e em jobs agendados. O dashboard usa o
+adaptador utils.db_streamlit, que acrescenta st.secrets e exibe os erros.
+"""
+
+from utils.validacao import validar_balancetes
+from utils.arvore import Carteira
+from utils.functions import (GRUPOS_INDICADORES, LeitorBalancetes, indicadores_de_somas,
+                             linhas_do_documento)
 from pymongo.mongo_client import MongoClient
 from pymongo.server_api import ServerApi
-import streamlit as st
+from pymongo.errors import PyMongoError
+from pathlib import Path
+import hashlib
+import json
+import re
+import pandas as pd
+import threading
+import tomllib
 import os
 
-def _get_mongo_uri_from_secrets():
-    try:
-        return st.secrets["mongo"]["uri"]
-    except Exception:
-        return os.environ.get("MONGO_URI")
 
+class ErroBancoDados(RuntimeError):
+    """Erro de configuração ou acesso à base de balancetes."""
+
+
+class ConfiguracaoAusente(ErroBancoDados):
+    """Nenhum provedor informou a URI do MongoDB."""
+
+
+class FalhaConexao(ErroBancoDados):
+    """O MongoDB não respondeu ou recusou a conexão."""
+
+
+# Um MongoClient por URI no processo: o driver já mantém um pool de conexões
+# thread-safe, então todas as sessões podem compartilhá-lo.
+_clientes = {}
+_clientes_lock = threading.Lock()
+
+# MongoClient não sobrevive a um fork: processos filhos abrem os seus
+os.register_at_fork(after_in_child=_clientes.clear)
+
+# Arquivos de secrets no formato do Streamlit ([mongo] uri = "..."), lidos
+# diretamente com tomllib, sem importar o Streamlit
+ARQUIVOS_SECRETS = (
+    Path(".streamlit") / "secrets.toml",
+    Path.home() / ".streamlit" / "secrets.toml",
+)
+
+
+def _uri_dos_arquivos_secrets():
+    for arquivo in ARQUIVOS_SECRETS:
+        try:
+            with open(arquivo, "rb") as f:
+                return tomllib.load(f)["mongo"]["uri"]
+        except (OSError, KeyError, TypeError, tomllib.TOMLDecodeError):
+            continue
+    return None
+
+
+def _uri_do_ambiente():
+    return os.environ.get("MONGO_URI")
 
-def get_db_client():
-    uri = _get_mongo_uri_from_secrets()
-    if not uri:
-        st.error(
-            "MONGO_URI não encontrado. Configure st.secrets ou a variável de ambiente 'MONGO_URI'.")
-        st.stop()
+
+# Consultados em ordem; o primeiro valor não vazio vence
+_provedores_uri = [_uri_dos_arquivos_secrets, _uri_do_ambiente]
+
+
+def registrar_provedor_uri(provedor, prioritario=True):
+    """
+    Acrescenta uma função sem argumentos que devolve a URI do MongoDB (ou None).
+    Com prioritario=True ela é consultada antes dos provedores padrão
+    (secrets.toml e variável de ambiente MONGO_URI).
+    """
+    if provedor in _provedores_uri:
+        return
+    if prioritario:
+        _provedores_uri.insert(0, provedor)
+    else:
+        _provedores_uri.append(provedor)
+
+
+def obter_uri_mongo():
+    """URI do primeiro provedor que responder; ConfiguracaoAusente se nenhum."""
+    for provedor in _provedores_uri:
+        uri = provedor()
+        if uri:
+            return uri
+    raise ConfiguracaoAusente(
+        "MONGO_URI não encontrado. Configure .streamlit/secrets.toml ([mongo] uri) "
+        "ou a variável de ambiente 'MONGO_URI'.")
+
+
+def get_db_client(uri=None):
+    """
+    MongoClient compartilhado para a URI (default: obter_uri_mongo()).
+
+    Levanta ConfiguracaoAusente sem URI e FalhaConexao se o servidor não
+    responder.
+    """
+    uri = uri or obter_uri_mongo()
+    with _clientes_lock:
+        if uri in _clientes:
+            return _clientes[uri]
     try:
         client = MongoClient(uri, serverSelectionTimeoutMS=5000)
         # força a checagem de conexão rápida
         client.server_info()
-        return client
     except Exception as e:
-        st.error(f"Falha ao conectar no MongoDB: {e}")
-        st.stop()
+        raise FalhaConexao(f"Falha ao conectar no MongoDB: {e}") from e
+    with _clientes_lock:
+        _clientes.setdefault(uri, client)
+        return _clientes[uri]
+
+
+# Carimbo de versão por coleção de balancetes ({_id: coleção, versao: n}),
+# incrementado a cada gravação feita por ingerir_balancetes
+COLECAO_VERSOES = "consulx_versoes"
+
+
+def registrar_alteracao(db_name="ConsulX_db", coll_name="industrial_nordeste", client=None):
+    """
+    Incrementa o carimbo de versão da coleção. A ingestão já o faz; chame
+    depois de alterar os documentos por outro caminho (uma retificação com
+    update_one num saldo, por exemplo).
+    """
+    client = client or get_db_client()
+    try:
+        client[db_name][COLECAO_VERSOES].update_one(
+            {"_id": coll_name}, {"$inc": {"versao": 1}}, upsert=True)
+    except PyMongoError as e:
+        raise FalhaConexao(f"Falha ao registrar a versão de {db_name}.{coll_name}: {e}") from e
+
+
+def versao_colecao(db_name="ConsulX_db", coll_name="industrial_nordeste", client=None):
+    """
+    Retorna uma impressão digital curta da coleção, usada como "versão dos
+    dados" nas chaves do cache (utils.cache). Combina o carimbo de
+    registrar_alteracao com a quantidade de documentos e o maior _id, sem
+    ler os documentos: consultas pontuais que podem rodar a cada rerun.
+    Inclusões e remoções diretas mudam a versão sozinhas; alterações no
+    próprio documento precisam passar por ingerir_balancetes ou
+    registrar_alteracao.
+    """
+    client = client or get_db_client()
+    colecao = client[db_name][coll_name]
+    try:
+        carimbo = client[db_name][COLECAO_VERSOES].find_one({"_id": coll_name}) or {}
+        quantidade = colecao.count_documents({})
+        ultimo = colecao.find_one({}, {"_id": 1}, sort=[("_id", -1)]) or {}
+    except PyMongoError as e:
+        raise FalhaConexao(f"Falha ao ler {db_name}.{coll_name}: {e}") from e
+    chave = f"{carimbo.get('versao', 0)}|{quantidade}|{ultimo.get('_id')}"
+    return hashlib.sha1(chave.encode()).hexdigest()[:16]
+
+
+# Esquemas declarados (caminhos das seções) por coleção de balancetes; as
+# demais têm o esquema detectado no primeiro documento lido
+ESQUEMA_PADRAO = (("ativo",), ("passivo",), ("receitas",), ("custos_despesas",))
+ESQUEMAS_COLECOES = {
+    "industrial_nordeste": ESQUEMA_PADRAO,
+    "Industria_Tecno_Metais": ESQUEMA_PADRAO,
+}
+
+# Um leitor por coleção no processo: guarda o esquema e os contadores
+_leitores = {}
+_leitores_lock = threading.Lock()
+
+
+def leitor_da_colecao(db_name, coll_name):
+    """LeitorBalancetes da coleção (esquema declarado ou detectado e contadores)."""
+    with _leitores_lock:
+        chave = (db_name, coll_name)
+        if chave not in _leitores:
+            _leitores[chave] = LeitorBalancetes(ESQUEMAS_COLECOES.get(coll_name))
+        return _leitores[chave]
+
+
+def estatisticas_leitura():
+    """
+    Contadores de leitura por coleção: documentos lidos, quantos foram pelo
+    caminho rápido, quantos caíram na heurística (fallback) e quantos vieram
+    sem mês reconhecível.
+    """
+    with _leitores_lock:
+        return {f"{db}.{coll}": dict(leitor.contadores, esquemas=list(leitor.esquemas))
+                for (db, coll), leitor in _leitores.items()}
 
 
 # @st.cache_data(ttl=60 * 30)  # cache por 30 minutos; ajusta se precisar
-def load_all_rows_from_mongo(db_name="ConsulX_db", coll_name="industrial_nordeste", limit=None):
+def load_all_rows_from_mongo(db_name="ConsulX_db", coll_name="industrial_nordeste", limit=None,
+                             client=None, saldos_completos=False):
     """
     Carrega e processa os balancetes da coleção. Cacheado para evitar re-leitura a cada rerun.
+    Com saldos_completos=True as linhas trazem também saldo_anterior, debito e credito.
+    Levanta ErroBancoDados (ConfiguracaoAusente/FalhaConexao) em caso de problema.
     """
-    client = get_db_client()
+    client = client or get_db_client()
     db = client[db_name]
     colecao = db[coll_name]
 
+    # com esquema conhecido só as seções dele, metadata e os nomes das demais
+    # chaves trafegam
+    leitor = leitor_da_colecao(db_name, coll_name)
     all_rows = []
+    projecao = leitor.projecao()
     # opcional: colocar limit para testes locais (evitar timeouts no deploy)
-    cursor = colecao.find()
-    if limit:
-        cursor = cursor.limit(limit)
-
-    for doc in cursor:
-        source_id = doc.get('_id')
-        metadata = doc.get('metadata', {}) or {}
-        periodo = metadata.get('periodo') or metadata.get(
-            'period') or metadata.get('periodo_referencia')
-        mes = extract_mes_from_periodo(periodo)
-
-        candidate_sections = []
-        for key in ('data', 'content', 'payload', 'balancete', 'document'):
-            if key in doc and isinstance(doc[key], dict):
-                # check values
-                for v in doc[key].values():
-                    if isinstance(v, dict) and 'descricao' in v:
-                        candidate_sections.append(v)
-                if isinstance(doc[key], dict) and 'descricao' in doc[key]:
-                    candidate_sections.append(doc[key])
-
-        if not candidate_sections:
-            for v in doc.values():
-                if isinstance(v, dict) and 'descricao' in v:
-                    candidate_sections.append(v)
-
-        for section in candidate_sections:
-            contas = extract_accounts(section)
-            for conta in contas:
-                conta["mes"] = mes
-                conta["source_id"] = source_id
-            all_rows.extend(contas)
+    pipeline = ([{"$limit": limit}] if limit else []) + \
+        ([{"$project": projecao}] if projecao else [])
+
+    try:
+        for doc in colecao.aggregate(pipeline):
+            if leitor.esquema and not leitor.confere(doc):
+                # fora do esquema (seção ausente ou a mais): relê o documento
+                # inteiro para a heurística
+                doc = colecao.find_one({"_id": doc["_id"]}) or doc
+            all_rows.extend(leitor.linhas(doc, saldos_completos=saldos_completos))
+    except PyMongoError as e:
+        raise FalhaConexao(f"Falha ao ler {db_name}.{coll_name}: {e}") from e
 
     return all_rows
+
+
+# ======================
+# Coleção de folhas
+# ======================
+# Coleção única com uma conta analítica por documento, de todas as empresas:
+#   {empresa, mes, conta, descricao, nivel_1..nivel_n (caminho na árvore),
+#    saldo_anterior, debito, credito, saldo_atual, source_id}
+# 'empresa' é o nome da coleção de balancetes de origem e source_id o _id da
+# árvore. Os códigos de conta são hierárquicos ('01.1.1' = DISPONIBILIDADES),
+# então "contas de um grupo" é um prefixo de conta, atendido pelo índice.
+COLECAO_FOLHAS = "balancete_folhas"
+INDICES_FOLHAS = (
+    [("empresa", 1), ("mes", 1)],
+    [("empresa", 1), ("conta", 1), ("mes", 1)],
+)
+
+
+def garantir_indices_folhas(db_name="ConsulX_db", coll_folhas=COLECAO_FOLHAS, client=None):
+    """Cria (se ainda não existem) os índices compostos da coleção de folhas."""
+    client = client or get_db_client()
+    try:
+        return [client[db_name][coll_folhas].create_index(chaves) for chaves in INDICES_FOLHAS]
+    except PyMongoError as e:
+        raise FalhaConexao(f"Falha ao indexar {db_name}.{coll_folhas}: {e}") from e
+
+
+def folhas_do_documento(doc, empresa):
+    """Documentos da coleção de folhas para uma árvore de balancete."""
+    return [dict(linha, empresa=empresa)
+            for linha in linhas_do_documento(doc, saldos_completos=True)]
+
+
+def _regravar_folhas(destino, filtro, folhas):
+    destino.delete_many(filtro)
+    if folhas:
+        destino.insert_many(folhas, ordered=False)
+
+
+def sincronizar_folhas(db_name="ConsulX_db", coll_name="industrial_nordeste",
+                       coll_folhas=COLECAO_FOLHAS, client=None):
+    """
+    Regrava todas as folhas de uma empresa a partir das árvores de coll_name
+    (carga inicial ou reparo). Retorna o número de folhas gravadas.
+    """
+    client = client or get_db_client()
+    folhas = [dict(linha, empresa=coll_name) for linha in load_all_rows_from_mongo(
+        db_name, coll_name, client=client, saldos_completos=True)]
+    garantir_indices_folhas(db_name, coll_folhas, client=client)
+    try:
+        _regravar_folhas(client[db_name][coll_folhas], {"empresa": coll_name}, folhas)
+    except PyMongoError as e:
+        raise FalhaConexao(f"Falha ao gravar {db_name}.{coll_folhas}: {e}") from e
+    return len(folhas)
+
+
+def ingerir_balancetes(documentos, db_name="ConsulX_db", coll_name="industrial_nordeste",
+                       coll_folhas=COLECAO_FOLHAS, client=None, validar=True):
+    """
+    Caminho de ingestão: grava as árvores em coll_name e as folhas na coleção
+    de folhas. Um balancete reemitido (mesmo metadata.periodo) substitui a
+    árvore e as folhas anteriores daquele mês. Com validar=True as folhas
+    recebidas passam por utils.validacao (o resultado só é reportado; a
+    gravação não é bloqueada).
+
+    Retorna:
+    --------
+    dict : {'documentos': n árvores inseridas, 'folhas': n folhas gravadas,
+            'meses': meses afetados, 'validacao': relatório de validar_balancetes ou None}
+    """
+    documentos = list(documentos)
+    if not documentos:
+        return {"documentos": 0, "folhas": 0, "meses": [], "validacao": None}
+
+    client = client or get_db_client()
+    garantir_indices_folhas(db_name, coll_folhas, client=client)
+    destino = client[db_name][coll_folhas]
+    try:
+        periodos = [(d.get("metadata") or {}).get("periodo") for d in documentos]
+        periodos = [p for p in periodos if p]
+        if periodos:
+            client[db_name][coll_name].delete_many({"metadata.periodo": {"$in": periodos}})
+        client[db_name][coll_name].insert_many(documentos)  # preenche _id nos documentos
+        por_mes = {}
+        for doc in documentos:
+            for folha in folhas_do_documento(doc, coll_name):
+                por_mes.setdefault(folha["mes"], []).append(folha)
+        for mes, folhas in por_mes.items():
+            _regravar_folhas(destino, {"empresa": coll_name, "mes": mes}, folhas)
+    except PyMongoError as e:
+        raise FalhaConexao(f"Falha na ingestão em {db_name}.{coll_name}: {e}") from e
+    registrar_alteracao(db_name, coll_name, client=client)
+
+    validacao = None
+    if validar:
+        validacao = validar_balancetes(pd.DataFrame(
+            [folha for folhas in por_mes.values() for folha in folhas]))
+    return {"documentos": len(documentos),
+            "folhas": sum(len(f) for f in por_mes.values()),
+            "meses": sorted(m for m in por_mes if m),
+            "validacao": validacao}
+
+
+def ingerir_json(caminho, db_name="ConsulX_db", coll_name="industrial_nordeste",
+                 coll_folhas=COLECAO_FOLHAS, client=None, validar=True):
+    """
+    Ingestão de arquivos JSON locais (arquivo ou pasta), registrando o nome do
+    arquivo de origem em 'filename'.
+    """
+    caminho = Path(caminho)
+    arquivos = sorted(caminho.rglob("*.json")) if caminho.is_dir() else [caminho]
+    documentos = [dict(doc, filename=arquivo.name)
+                  for arquivo in arquivos for doc in _documentos_json(arquivo)]
+    return ingerir_balancetes(documentos, db_name, coll_name, coll_folhas, client=client,
+                              validar=validar)
+
+
+def load_folhas_from_mongo(db_name="ConsulX_db", coll_name="industrial_nordeste",
+                           prefixo_conta=None, ultimos_meses=None, desde=None, ate=None,
+                           coll_folhas=COLECAO_FOLHAS, client=None):
+    """
+    Consulta a coleção de folhas de uma empresa. Os filtros viram varreduras
+    dos índices (empresa, mes) e (empresa, conta, mes).
+
+    Parâmetros:
+    -----------
+    prefixo_conta : str, opcional
+        Código de conta sintética ('01.1.1' = DISPONIBILIDADES); traz as folhas abaixo dela.
+    ultimos_meses : int, opcional
+        Janela que termina no último mês disponível da empresa.
+    desde, ate : str, opcional
+        Limites 'YYYY-MM' (inclusivos).
+
+    Retorna:
+    --------
+    pd.DataFrame no formato de load_all_rows_from_mongo (com saldos completos e 'empresa').
+
+    Ex.: contas de caixa dos últimos 12 meses:
+        load_folhas_from_mongo(coll_name="industrial_nordeste", prefixo_conta="01.1.1",
+                               ultimos_meses=12)
+    """
+    client = client or get_db_client()
+    colecao = client[db_name][coll_folhas]
+    filtro = {"empresa": coll_name}
+    try:
+        if ultimos_meses:
+            ultimo = colecao.find_one({"empresa": coll_name}, {"mes": 1},
+                                      sort=[("mes", -1)])
+            if ultimo is None:
+                return pd.DataFrame()
+            inicio = pd.Period(ultimo["mes"], freq="M") - (ultimos_meses - 1)
+            desde = max(desde or "", str(inicio))
+        if desde or ate:
+            filtro["mes"] = {k: v for k, v in (("$gte", desde), ("$lte", ate)) if v}
+        if prefixo_conta:
+            filtro["conta"] = {"$regex": f"^{re.escape(prefixo_conta)}"}
+        folhas = list(colecao.find(filtro, {"_id": 0}).sort([("mes", 1), ("conta", 1)]))
+    except PyMongoError as e:
+        raise FalhaConexao(f"Falha ao consultar {db_name}.{coll_folhas}: {e}") from e
+    return pd.DataFrame(folhas)
+
+
+# ======================
+# Agregação no servidor (pushdown)
+# ======================
+def pipeline_somas_grupos(empresa, grupos=GRUPOS_INDICADORES):
+    """
+    Pipeline de agregação que devolve, por mês, a soma do saldo_atual de cada
+    grupo (functions.GRUPOS_INDICADORES) e a quantidade de contas do grupo
+    (campo '<grupo>__n', para distinguir "sem contas" de "soma zero").
+    """
+    etapa_grupo = {"_id": "$mes"}
+    for nome, filtro in grupos.items():
+        condicao = {"$and": [{"$eq": [f"${campo}", valor]} for campo, valor in filtro.items()]}
+        etapa_grupo[nome] = {"$sum": {"$cond": [condicao, "$saldo_atual", 0]}}
+        etapa_grupo[f"{nome}__n"] = {"$sum": {"$cond": [condicao, 1, 0]}}
+
+    return [
+        # só as folhas que entram em algum grupo saem do índice/disco
+        {"$match": {"empresa": empresa, "$or": [dict(f) for f in grupos.values()]}},
+        {"$group": etapa_grupo},
+        {"$sort": {"_id": 1}},
+    ]
+
+
+def somas_por_grupo_mongo(db_name="ConsulX_db", coll_name="industrial_nordeste",
+                          grupos=GRUPOS_INDICADORES, coll_folhas=COLECAO_FOLHAS, client=None):
+    """
+    Equivalente a functions.somas_por_grupo calculado no MongoDB: só a matriz
+    mês × grupo trafega pela rede.
+    """
+    client = client or get_db_client()
+    try:
+        resultado = list(client[db_name][coll_folhas].aggregate(
+            pipeline_somas_grupos(coll_name, grupos)))
+    except PyMongoError as e:
+        raise FalhaConexao(f"Falha ao agregar {db_name}.{coll_folhas}: {e}") from e
+
+    tabela = pd.DataFrame(resultado, columns=["_id"] + [
+        c for nome in grupos for c in (nome, f"{nome}__n")])
+    tabela = tabela.rename(columns={"_id": "mes"}).set_index("mes")
+    somas = pd.DataFrame({nome: tabela[nome].where(tabela[f"{nome}__n"] > 0)
+                          for nome in grupos}, index=tabela.index, dtype=float)
+    return somas.sort_index()
+
+
+def load_indicadores_from_mongo(db_name="ConsulX_db", coll_name="industrial_nordeste",
+                                coll_folhas=COLECAO_FOLHAS, client=None):
+    """
+    Tabela de indicadores (mesma saída de processar_indicadores_financeiros)
+    com as somas feitas no servidor sobre a coleção de folhas.
+    """
+    somas = somas_por_grupo_mongo(db_name, coll_name, coll_folhas=coll_folhas, client=client)
+    return indicadores_de_somas(somas)
+
+
+def _documentos_json(caminho):
+    dados = json.loads(Path(caminho).read_text(encoding="utf-8"))
+    documentos = dados if isinstance(dados, list) else [dados]
+    return [d for d in documentos if isinstance(d, dict) and "metadata" in d]
+
+
+def load_all_rows_from_json(caminho, leitor=None, saldos_completos=False):
+    """
+    Carrega balancetes de arquivos JSON locais, no mesmo formato dos documentos
+    do MongoDB. `caminho` pode ser um arquivo (um documento ou uma lista de
+    documentos) ou uma pasta, lida recursivamente (*.json, um mês por arquivo).
+    Informe um LeitorBalancetes para declarar o esquema ou ler os contadores.
+    """
+    caminho = Path(caminho)
+    arquivos = sorted(caminho.rglob("*.json")) if caminho.is_dir() else [caminho]
+    leitor = leitor or LeitorBalancetes()
+
+    all_rows = []
+    for arquivo in arquivos:
+        for i, doc in enumerate(_documentos_json(arquivo)):
+            source_id = doc.get("_id") or (str(arquivo) if i == 0 else f"{arquivo}#{i}")
+            all_rows.extend(leitor.linhas(doc, source_id=source_id,
+                                          saldos_completos=saldos_completos))
+    return all_rows
+
+
+def load_carteira_from_json(caminho, empresa=None, carteira=None, esquema=None):
+    """
+    Carrega balancetes de JSON locais como árvores compactas (utils.arvore)
+    numa Carteira, em vez de manter os dicionários do json.load. `empresa`
+    (default: nome do arquivo/pasta) agrupa os meses; passe uma Carteira
+    existente para acumular várias empresas sobre a mesma tabela de textos.
+    """
+    caminho = Path(caminho)
+    arquivos = sorted(caminho.rglob("*.json")) if caminho.is_dir() else [caminho]
+    carteira = carteira if carteira is not None else Carteira()
+    empresa = empresa or caminho.stem
+
+    for arquivo in arquivos:
+        documentos = _documentos_json(arquivo)
+        carteira.adicionar(empresa, documentos, esquema=esquema)
+        # mesmo source_id de load_all_rows_from_json
+        for i, (doc, arvore) in enumerate(zip(documentos, carteira.arvores[empresa][-len(documentos):])):
+            arvore.id_documento = doc.get("_id") or (str(arquivo) if i == 0 else f"{arquivo}#{i}")
+    return carteira
@@ -0,0 +1,80 @@
+"""
+db_streamlit.py
+
+Adaptador do utils.db para o dashboard: registra st.secrets como provedor da
+URI do MongoDB e transforma as exceções da camada de dados em st.error +
+st.stop, o comportamento que o app sempre teve. Fora do Streamlit (CLI,
+trabalhadores, jobs) use utils.db diretamente.
+
+Com CONSULX_DADOS_LOCAIS=pasta, as coleções são lidas de pasta/{coleção}
+(balancetes JSON, como em db.load_all_rows_from_json) em vez do MongoDB:
+desenvolvimento offline e testes de carga (utils.carga).
+"""
+
+import functools
+import hashlib
+import os
+from pathlib import Path
+
+import streamlit as st
+
+from utils import db
+
+
+def _uri_st_secrets():
+    try:
+        return st.secrets["mongo"]["uri"]
+    except Exception:
+        return None
+
+
+db.registrar_provedor_uri(_uri_st_secrets)
+
+
+def _exibir_erro(funcao):
+    @functools.wraps(funcao)
+    def wrapper(*args, **kwargs):
+        try:
+            return funcao(*args, **kwargs)
+        except db.ErroBancoDados as e:
+            st.error(str(e))
+            st.stop()
+    return wrapper
+
+
+def _pasta_local(coll_name):
+    raiz = os.environ.get("CONSULX_DADOS_LOCAIS")
+    if not raiz:
+        return None
+    pasta = Path(raiz) / coll_name
+    if not pasta.exists():
+        raise db.ConfiguracaoAusente(f"Coleção {coll_name} não encontrada em {raiz}.")
+    return pasta
+
+
+def _versao_colecao(db_name="ConsulX_db", coll_name="industrial_nordeste", client=None):
+    pasta = _pasta_local(coll_name)
+    if pasta is None:
+        return db.versao_colecao(db_name, coll_name, client=client)
+    # nome, tamanho e data de modificação dos arquivos fazem o papel da versão
+    # da coleção, sem ler o conteúdo a cada rerun
+    resumo = hashlib.sha1()
+    for arquivo in sorted(pasta.rglob("*.json")):
+        info = arquivo.stat()
+        resumo.update(f"{arquivo}|{info.st_size}|{info.st_mtime_ns}".encode())
+    return resumo.hexdigest()
+
+
+def _load_all_rows(db_name="ConsulX_db", coll_name="industrial_nordeste", limit=None,
+                   client=None, saldos_completos=False):
+    pasta = _pasta_local(coll_name)
+    if pasta is None:
+        return db.load_all_rows_from_mongo(db_name, coll_name, limit=limit, client=client,
+                                           saldos_completos=saldos_completos)
+    return db.load_all_rows_from_json(pasta, saldos_completos=saldos_completos)
+
+
+get_db_client = _exibir_erro(db.get_db_client)
+versao_colecao = _exibir_erro(_versao_colecao)
+load_all_rows_from_mongo = _exibir_erro(_load_all_rows)
+load_indicadores_from_mongo = _exibir_erro(db.load_indicadores_from_mongo)
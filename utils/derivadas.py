@@ -0,0 +1,102 @@
+"""
+derivadas.py
+
+Séries derivadas da tabela de indicadores, calculadas numa única passada
+vetorizada (todas as colunas de uma vez, sobre a grade mensal completa):
+
+- _YoY: variação contra o mesmo mês do ano anterior (relativa para valores em
+  R$, diferença absoluta para os índices)
+- _TTM: soma dos últimos 12 meses dos fluxos (receitas, impostos, custos,
+  lucros) e a margem recalculada sobre essas somas (e a variação dessa margem
+  em 12 meses, Margem_de_Lucro_TTM_YoY)
+- _YTD: acumulado do ano dos fluxos e a margem acumulada
+- _MM{n}: média móvel de n meses de todas as colunas
+
+O resultado fica em cache junto da tabela de indicadores (mesma versão dos
+dados) para que gráficos e cartões leiam as séries prontas em vez de refazer
+fatias e razões; as previsões da CLI e do agendador aceitam essas colunas
+(ex: --colunas Margem_de_Lucro_TTM).
+"""
+
+import numpy as np
+import pandas as pd
+
+from utils.functions import COLUNAS_FLUXO, COLUNAS_SALDO
+
+
+# Fluxos do período: somáveis no tempo (TTM/YTD)
+FLUXOS = COLUNAS_FLUXO + ["Receita_Líquida", "Lucro_Bruto", "Lucro_Líquido"]
+
+# Colunas em R$ (YoY relativo); as demais são índices (YoY em diferença)
+VALORES = FLUXOS + COLUNAS_SALDO + ["Ativo_Total", "Passivo_Total"]
+
+
+def _grade_mensal(indicadores):
+    """Tabela reindexada para todos os meses entre o primeiro e o último."""
+    periodos = pd.PeriodIndex(pd.Index(indicadores.index).astype(str).str[:7], freq="M")
+    tabela = indicadores.set_axis(periodos).sort_index()
+    completa = pd.period_range(periodos.min(), periodos.max(), freq="M")
+    return tabela.reindex(completa), periodos
+
+
+def _margem(lucro, receita):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return (lucro / receita).replace([np.inf, -np.inf], np.nan)
+
+
+def derivar_series(indicadores, janela_media=3):
+    """
+    Parâmetros:
+    -----------
+    indicadores : pd.DataFrame
+        Saída de processar_indicadores_financeiros (índice 'mes', 'YYYY-MM').
+    janela_media : int
+        Meses da média móvel.
+
+    Retorna:
+    --------
+    pd.DataFrame com o mesmo índice de `indicadores` e as colunas
+    {coluna}_YoY, {fluxo}_TTM, {fluxo}_YTD, {coluna}_MM{janela_media},
+    Margem_de_Lucro_TTM, Margem_de_Lucro_TTM_YoY (diferença contra 12 meses
+    antes) e Margem_de_Lucro_YTD. Sem 12 meses de histórico (ou com meses
+    faltando na janela) os valores ficam NaN; no YTD, um mês faltando deixa
+    NaN o restante daquele ano.
+    """
+    if indicadores.empty:
+        return pd.DataFrame(index=indicadores.index)
+
+    numericas = indicadores.select_dtypes("number").astype(float)
+    numericas = numericas.replace([np.inf, -np.inf], np.nan)
+    tabela, periodos = _grade_mensal(numericas)
+    valores = [c for c in tabela.columns if c in VALORES]
+    indices = [c for c in tabela.columns if c not in VALORES]
+    fluxos = tabela[[c for c in FLUXOS if c in tabela.columns]]
+
+    # grade completa: deslocar 12 linhas é voltar 12 meses
+    anterior = tabela.shift(12)
+    base = anterior[valores].abs().where(anterior[valores] != 0)
+    yoy_valores = (tabela[valores] - anterior[valores]) / base
+    yoy = pd.concat([yoy_valores, tabela[indices] - anterior[indices]], axis=1)
+
+    ttm = fluxos.rolling(12, min_periods=12).sum()
+    # um mês sem dados invalida o acumulado dos meses seguintes do mesmo ano
+    lacuna = fluxos.isna().groupby(tabela.index.year).cummax()
+    ytd = fluxos.groupby(tabela.index.year).cumsum().mask(lacuna)
+    media = tabela.rolling(janela_media, min_periods=janela_media).mean()
+
+    derivadas = pd.concat([
+        yoy.add_suffix("_YoY"),
+        ttm.add_suffix("_TTM"),
+        ytd.add_suffix("_YTD"),
+        media.add_suffix(f"_MM{janela_media}"),
+    ], axis=1)
+    if {"Lucro_Líquido", "Receita_Líquida"} <= set(fluxos.columns):
+        margem_ttm = _margem(ttm["Lucro_Líquido"], ttm["Receita_Líquida"])
+        derivadas["Margem_de_Lucro_TTM"] = margem_ttm
+        derivadas["Margem_de_Lucro_TTM_YoY"] = margem_ttm - margem_ttm.shift(12)
+        derivadas["Margem_de_Lucro_YTD"] = _margem(ytd["Lucro_Líquido"], ytd["Receita_Líquida"])
+
+    # volta para os meses (e o índice) originais
+    derivadas = derivadas.reindex(periodos)
+    derivadas.index = indicadores.index
+    return derivadas
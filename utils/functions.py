@@ -13,11 +13,8 @@ extrai folhas (contas analíticas) e calcula indicadores financeiros:
 
 """
 
-from pmdarima import auto_arima
-import matplotlib.pyplot as plt
-import math
-from sklearn.metrics import mean_absolute_error, mean_squared_error
-from prophet import Prophet
+# pmdarima e prophet são importados dentro das funções de previsão: a extração
+# e os indicadores ficam leves para os loaders em processos trabalhadores
 import numpy as np
 from typing import List, Dict, Any
 from pathlib import Path
@@ -25,9 +22,15 @@ from datetime import datetime
 import pandas as pd
 import re
 
+from utils.metricas import calcular_metricas
+
 
 # Extrator de balancete para dataframe
-def extract_accounts(node, hierarchy=None):
+# Movimentos da conta analítica mantidos com saldos_completos=True
+CAMPOS_MOVIMENTO = ("saldo_anterior", "debito", "credito")
+
+
+def extract_accounts(node, hierarchy=None, saldos_completos=False):
     if hierarchy is None:
         hierarchy = []
 
@@ -36,12 +39,15 @@ def extract_accounts(node, hierarchy=None):
 
     if "children" in node:
         for child in node["children"]:
-            rows.extend(extract_accounts(child, current_hierarchy))
+            rows.extend(extract_accounts(child, current_hierarchy, saldos_completos))
     else:
         row = {f"nivel_{i+1}": level for i,
                level in enumerate(current_hierarchy)}
         row["conta"] = node["conta"]
         row["descricao"] = node["descricao"]
+        if saldos_completos:
+            for campo in CAMPOS_MOVIMENTO:
+                row[campo] = node.get(campo, 0.0)
         row["saldo_atual"] = node.get("saldo_atual", 0.0)
         rows.append(row)
 
@@ -68,6 +74,240 @@ def extract_mes_from_periodo(periodo_str):
         return None
 
 
+# Chaves que podem embrulhar as seções do balancete dentro do documento
+CHAVES_CONTEINER = ('data', 'content', 'payload', 'balancete', 'document')
+
+
+def _e_secao(valor):
+    return isinstance(valor, dict) and 'descricao' in valor and (
+        'children' in valor or 'conta' in valor)
+
+
+def detectar_esquema(doc):
+    """
+    Heurística de localização das seções (árvores com 'descricao') de um
+    documento: valores da raiz e, um nível abaixo, dos contêineres
+    data/content/payload/balancete/document.
+
+    Retorna:
+    --------
+    tuple de caminhos, ex: (('ativo',), ('passivo',), ('data', 'receitas'))
+    """
+    caminhos = []
+    for chave, valor in doc.items():
+        if _e_secao(valor):
+            caminhos.append((chave,))
+        elif chave in CHAVES_CONTEINER and isinstance(valor, dict):
+            caminhos.extend((chave, sub) for sub, v in valor.items() if _e_secao(v))
+    return tuple(caminhos)
+
+
+def secao_do_documento(doc, caminho):
+    """Seção no caminho de chaves dado (ex: ('data', 'ativo')) ou None se ausente/inválida."""
+    no = doc
+    for chave in caminho:
+        if not isinstance(no, dict) or chave not in no:
+            return None
+        no = no[chave]
+    return no if _e_secao(no) else None
+
+
+def mes_do_documento(doc):
+    """Mês 'YYYY-MM' do período em metadata (periodo/period/periodo_referencia)."""
+    metadata = doc.get('metadata', {}) or {}
+    periodo = metadata.get('periodo') or metadata.get(
+        'period') or metadata.get('periodo_referencia')
+    return extract_mes_from_periodo(periodo)
+
+
+def _linhas_das_secoes(secoes, mes, source_id, saldos_completos):
+    rows = []
+    for section in secoes:
+        contas = extract_accounts(section, saldos_completos=saldos_completos)
+        for conta in contas:
+            conta["mes"] = mes
+            conta["source_id"] = source_id
+        rows.extend(contas)
+    return rows
+
+
+def linhas_do_documento(doc, source_id=None, saldos_completos=False):
+    """
+    Extrai as contas analíticas de um documento de balancete (um mês), no
+    formato gravado no MongoDB ou nos arquivos JSON, localizando as seções
+    com detectar_esquema. Cada linha recebe 'mes' (de metadata.periodo) e
+    'source_id'; com saldos_completos=True também saldo_anterior, debito e
+    credito. Para muitos documentos do mesmo formato use LeitorBalancetes.
+    """
+    if source_id is None:
+        source_id = doc.get('_id')
+    secoes = [secao_do_documento(doc, c) for c in detectar_esquema(doc)]
+    return _linhas_das_secoes(secoes, mes_do_documento(doc), source_id, saldos_completos)
+
+
+# Campo acrescentado pela projeção do servidor (LeitorBalancetes.projecao):
+# os nomes das chaves de raiz do documento completo, para notar seções fora
+# do esquema sem trafegar o conteúdo delas
+CAMPO_CHAVES = "_chaves"
+
+# Chaves de raiz que não são seções
+CHAVES_SEM_SECAO = ("_id", "metadata", "filename", CAMPO_CHAVES)
+
+
+class LeitorBalancetes:
+    """
+    Extrator para uma coleção de documentos com o mesmo formato: o esquema
+    (caminhos das seções) é declarado ou detectado no primeiro documento e, a
+    partir daí, cada documento vai direto às seções conhecidas. Só quando o
+    documento não confere com nenhum esquema conhecido (seção ausente ou
+    inválida, ou uma seção a mais) a heurística de detectar_esquema roda para
+    ele, e isso é contado; o formato novo passa a ser conhecido (até
+    max_esquemas).
+
+    Atributos:
+    ----------
+    esquemas : list de esquemas (tuplas de caminhos); o primeiro é o principal
+    contadores : dict {'documentos', 'rapido', 'fallback', 'sem_mes'}
+    chaves_sem_secao : set das chaves de raiz já vistas que não são seções
+    """
+
+    def __init__(self, esquema=None, max_esquemas=4):
+        self.esquemas = [tuple(tuple(c) for c in esquema)] if esquema else []
+        self.max_esquemas = max_esquemas
+        self.contadores = {"documentos": 0, "rapido": 0, "fallback": 0, "sem_mes": 0}
+        self.chaves_sem_secao = set(CHAVES_SEM_SECAO)
+
+    @property
+    def esquema(self):
+        return self.esquemas[0] if self.esquemas else None
+
+    def projecao(self):
+        """
+        Estágio $project (pipeline de agregação do MongoDB) com metadata, as
+        chaves dos esquemas e, em CAMPO_CHAVES, os nomes de todas as chaves
+        do documento; None sem esquema.
+        """
+        if not self.esquemas:
+            return None
+        chaves = {c[0] for esquema in self.esquemas for c in esquema}
+        projecao = dict.fromkeys(["metadata"] + sorted(chaves), 1)
+        projecao[CAMPO_CHAVES] = {"$map": {"input": {"$objectToArray": "$$ROOT"},
+                                           "as": "campo", "in": "$$campo.k"}}
+        return projecao
+
+    def _fora_do_esquema(self, doc, esquema):
+        """True se o documento tem alguma seção (ou, projetado, chave desconhecida) a mais."""
+        if any(c not in esquema for c in detectar_esquema(doc)):
+            return True
+        raizes = {c[0] for c in esquema}
+        return any(k not in raizes and k not in self.chaves_sem_secao
+                   for k in doc.get(CAMPO_CHAVES, ()))
+
+    def _conferir(self, doc):
+        for esquema in self.esquemas:
+            secoes = [secao_do_documento(doc, c) for c in esquema]
+            if all(s is not None for s in secoes) and not self._fora_do_esquema(doc, esquema):
+                return secoes
+        return None
+
+    def confere(self, doc):
+        """True se as seções do documento são exatamente as de algum esquema conhecido."""
+        return self._conferir(doc) is not None
+
+    def secoes(self, doc):
+        """Seções do documento; (seções, True) no caminho rápido."""
+        secoes = self._conferir(doc)
+        if secoes is not None:
+            return secoes, True
+
+        esquema = detectar_esquema(doc)
+        raizes = {c[0] for c in esquema}
+        self.chaves_sem_secao.update(k for k in doc if k not in raizes)
+        if not self.esquemas:
+            # o primeiro documento com seções define o esquema principal
+            if esquema:
+                self.esquemas.append(esquema)
+            return [secao_do_documento(doc, c) for c in esquema], bool(esquema)
+        if esquema and esquema not in self.esquemas and len(self.esquemas) < self.max_esquemas:
+            self.esquemas.append(esquema)
+        return [secao_do_documento(doc, c) for c in esquema], False
+
+    def linhas(self, doc, source_id=None, saldos_completos=False):
+        if source_id is None:
+            source_id = doc.get('_id')
+        secoes, rapido = self.secoes(doc)
+        mes = mes_do_documento(doc)
+
+        self.contadores["documentos"] += 1
+        self.contadores["rapido" if rapido else "fallback"] += 1
+        if mes is None:
+            self.contadores["sem_mes"] += 1
+        return _linhas_das_secoes(secoes, mes, source_id, saldos_completos)
+
+
+# Grupos de contas somados por mês: coluna -> filtro (nível da hierarquia ->
+# descrição). A mesma definição alimenta o cálculo em pandas
+# (somas_por_grupo) e o pipeline de agregação no MongoDB (utils.db).
+GRUPOS_BALANCO = {
+    "Ativo_Circulante": {"nivel_2": "ATIVO CIRCULANTE"},
+    "Ativo_Nao_Circulante": {"nivel_2": "ATIVO NÃO CIRCULANTE"},
+    "Passivo_Circulante": {"nivel_2": "PASSIVO CIRCULANTE"},
+    "Passivo_Nao_Circulante": {"nivel_2": "PASSIVO NÃO CIRCULANTE"},
+    "Patrimonio_Liquido": {"nivel_2": "PATRIMÔNIO LÍQUIDO"},
+}
+GRUPOS_RESULTADO = {
+    "Receita_Bruta": {"nivel_1": "RECEITAS", "nivel_2": "Serviços Prestados a Prazo"},
+    "Impostos_Receita": {"nivel_1": "RECEITAS",
+                         "nivel_2": "Simples Nacional sobre vendas e serviços"},
+    "Custo_Total": {"nivel_1": "CUSTOS E DESPESAS"},
+    "Disponibilidade_Caixa": {"nivel_2": "ATIVO CIRCULANTE", "nivel_3": "DISPONIBILIDADES"},
+}
+GRUPOS_INDICADORES = {**GRUPOS_BALANCO, **GRUPOS_RESULTADO}
+
+
+def mascara_filtro(df, filtro):
+    """Máscara booleana das linhas de df que atendem a um filtro {coluna: valor}."""
+    mascara = np.ones(len(df), dtype=bool)
+    for coluna, valor in filtro.items():
+        if coluna not in df.columns:
+            mascara[:] = False
+            break
+        mascara &= (df[coluna] == valor).to_numpy()
+    return mascara
+
+
+def somas_por_grupo(df, grupos=GRUPOS_INDICADORES):
+    """
+    Soma o saldo_atual das contas de cada grupo por mês.
+
+    Retorna:
+    --------
+    pd.DataFrame (índice 'mes', uma coluna por grupo); NaN quando o grupo não
+    tem contas no mês.
+    """
+    somas = {}
+    for nome, filtro in grupos.items():
+        somas[nome] = df.loc[mascara_filtro(df, filtro)].groupby("mes")["saldo_atual"].sum()
+
+    tabela = pd.DataFrame(somas, columns=list(grupos))
+    tabela.index.name = "mes"
+    return tabela.sort_index()
+
+
+def indicadores_de_somas(somas):
+    """
+    Tabela de indicadores a partir da matriz mês × grupo de somas_por_grupo
+    (ou da mesma matriz calculada no MongoDB). Ficam os meses que têm ao menos
+    um grupo do balanço e um grupo de resultado.
+    """
+    balanco, resultado = list(GRUPOS_BALANCO), list(GRUPOS_RESULTADO)
+    somas = somas.reindex(columns=balanco + resultado)
+    meses = somas[balanco].notna().any(axis=1) & somas[resultado].notna().any(axis=1)
+    tabela = somas.loc[meses].sort_index()
+    tabela.index.name = "mes"
+    return calcular_indices(tabela)
+
+
 def processar_indicadores_financeiros(df: pd.DataFrame) -> pd.DataFrame:
     """
     Processa o DataFrame de dados financeiros e retorna uma tabela com indicadores
@@ -79,93 +319,67 @@ def processar_indicadores_financeiros(df: pd.DataFrame) -> pd.DataFrame:
     Returns:
         pd.DataFrame: Tabela com indicadores financeiros calculados
     """
-    # Filtragem dos dados básicos
-    receita_bruta = df[(df["nivel_1"] == "RECEITAS") &
-                       (df["nivel_2"] == "Serviços Prestados a Prazo")]
-    impostos_sobre_receita = df[(df["nivel_1"] == "RECEITAS") &
-                                (df["nivel_2"] == "Simples Nacional sobre vendas e serviços")]
-    custos_despesas = df[df["nivel_1"] == "CUSTOS E DESPESAS"]
-    caixa = df[(df["nivel_2"] == "ATIVO CIRCULANTE") &
-               (df["nivel_3"] == "DISPONIBILIDADES")]
-
-    # Agregação mensal dos dados
-    receita_bruta_mensal = receita_bruta.groupby("mes")["saldo_atual"].sum()
-    impostos_mensal = impostos_sobre_receita.groupby("mes")[
-        "saldo_atual"].sum()
-    custos_mensal = custos_despesas.groupby("mes")["saldo_atual"].sum()
-    caixa_mensal = caixa.groupby("mes")["saldo_atual"].sum()
-
-    # Criação da tabela de indicadores
-    df_indices = pd.DataFrame({
-        "Receita_Bruta": receita_bruta_mensal,
-        "Impostos_Receita": impostos_mensal,
-        "Custo_Total": custos_mensal,
-        "Disponibilidade_Caixa": caixa_mensal
-    })
+    return indicadores_de_somas(somas_por_grupo(df))
+
+
+# Colunas base da tabela de indicadores: fluxos do período (somáveis no tempo)
+# e saldos de fim de período. Os demais indicadores derivam delas.
+COLUNAS_FLUXO = ["Receita_Bruta", "Impostos_Receita", "Custo_Total"]
+COLUNAS_SALDO = ["Ativo_Circulante", "Ativo_Nao_Circulante", "Passivo_Circulante",
+                 "Passivo_Nao_Circulante", "Patrimonio_Liquido", "Disponibilidade_Caixa"]
+
+
+def calcular_indices(tabela):
+    """
+    Calcula os indicadores derivados a partir das colunas base (COLUNAS_FLUXO e
+    COLUNAS_SALDO), acrescentando as colunas na própria tabela.
+
+    Usa apenas indexação por nome de coluna e aritmética, então aceita tanto um
+    DataFrame quanto um dicionário de arrays NumPy (ex: cenários × meses).
+
+    Args:
+        tabela: DataFrame ou dict com as colunas base
 
+    Returns:
+        A mesma tabela, com os indicadores calculados
+    """
     # Cálculos de indicadores
-    df_indices["Receita_Líquida"] = df_indices["Receita_Bruta"] + \
-        df_indices["Impostos_Receita"]
-    df_indices["Lucro_Bruto"] = df_indices["Receita_Líquida"] - \
-        df_indices["Custo_Total"]
-    df_indices["Lucro_Líquido"] = df_indices["Lucro_Bruto"] 
-
-    # Processamento adicional para tabela pivot
-    df_agrupado = df.groupby(['nivel_2', 'mes'], as_index=False)[
-        'saldo_atual'].sum()
-    filtro = df_agrupado.loc[
-        df_agrupado['nivel_2'].isin(
-            ['ATIVO CIRCULANTE', 'PASSIVO CIRCULANTE',
-             'ATIVO NÃO CIRCULANTE', 'PASSIVO NÃO CIRCULANTE', 'PATRIMÔNIO LÍQUIDO'])
-    ]
-
-    # Criação da tabela pivot
-    tabela_pivot = pd.pivot_table(
-        filtro,
-        values='saldo_atual',
-        index='mes',
-        columns='nivel_2',
-        aggfunc='first'
-    )
-
-    # Mesclagem com indicadores
-    tabela_pivot = pd.merge(
-        tabela_pivot, df_indices, on='mes', how='inner'
-    )
+    tabela["Receita_Líquida"] = tabela["Receita_Bruta"] + \
+        tabela["Impostos_Receita"]
+    tabela["Lucro_Bruto"] = tabela["Receita_Líquida"] - \
+        tabela["Custo_Total"]
+    tabela["Lucro_Líquido"] = tabela["Lucro_Bruto"]
 
     # Cálculos finais
-    tabela_pivot['Ativo_Total'] = tabela_pivot['ATIVO CIRCULANTE'] + \
-        tabela_pivot['ATIVO NÃO CIRCULANTE']
-    tabela_pivot['Passivo_Total'] = tabela_pivot['PASSIVO CIRCULANTE'] + \
-        tabela_pivot['PASSIVO NÃO CIRCULANTE']
+    tabela['Ativo_Total'] = tabela['Ativo_Circulante'] + \
+        tabela['Ativo_Nao_Circulante']
+    tabela['Passivo_Total'] = tabela['Passivo_Circulante'] + \
+        tabela['Passivo_Nao_Circulante']
 
     # Indicadores de liquidez
-    tabela_pivot['Liquidez_Corrente'] = tabela_pivot['ATIVO CIRCULANTE'] / \
-        tabela_pivot['PASSIVO CIRCULANTE']
-    tabela_pivot['Liquidez_Imediata'] = tabela_pivot['Disponibilidade_Caixa'] / \
-        tabela_pivot['PASSIVO CIRCULANTE']
-    tabela_pivot['Liquidez_Geral'] = (tabela_pivot['ATIVO CIRCULANTE'] +
-                                      tabela_pivot['ATIVO NÃO CIRCULANTE']) / \
-        (tabela_pivot['PASSIVO CIRCULANTE'] +
-         tabela_pivot['PASSIVO NÃO CIRCULANTE'])
+    tabela['Liquidez_Corrente'] = tabela['Ativo_Circulante'] / \
+        tabela['Passivo_Circulante']
+    tabela['Liquidez_Imediata'] = tabela['Disponibilidade_Caixa'] / \
+        tabela['Passivo_Circulante']
+    tabela['Liquidez_Geral'] = (tabela['Ativo_Circulante'] +
+                                tabela['Ativo_Nao_Circulante']) / \
+        (tabela['Passivo_Circulante'] +
+         tabela['Passivo_Nao_Circulante'])
 
     # Indicadores de solvência
-    tabela_pivot['Solvencia_Geral'] = tabela_pivot['Ativo_Total'] / \
-        tabela_pivot['Passivo_Total']
-    tabela_pivot['Endividamento'] = tabela_pivot['Passivo_Total'] / \
-        tabela_pivot['Ativo_Total']
-    tabela_pivot['Endividamento_Geral'] = tabela_pivot['Endividamento']
-    
-    tabela_pivot["Margem_de_Lucro"] = (
-        tabela_pivot["Lucro_Líquido"] / tabela_pivot["Receita_Líquida"])
-    
-    tabela_pivot["Retorno_Sobre_Patrimonio_Liquido"] = (
-        tabela_pivot["Lucro_Líquido"] / tabela_pivot["PATRIMÔNIO LÍQUIDO"])
-    
-    tabela_pivot = tabela_pivot.rename(
-        columns={"ATIVO CIRCULANTE": "Ativo_Circulante", "ATIVO NÃO CIRCULANTE": "Ativo_Nao_Circulante", "PASSIVO CIRCULANTE": "Passivo_Circulante", "PASSIVO NÃO CIRCULANTE": "Passivo_Nao_Circulante", "PATRIMÔNIO LÍQUIDO": "Patrimonio_Liquido"})
+    tabela['Solvencia_Geral'] = tabela['Ativo_Total'] / \
+        tabela['Passivo_Total']
+    tabela['Endividamento'] = tabela['Passivo_Total'] / \
+        tabela['Ativo_Total']
+    tabela['Endividamento_Geral'] = tabela['Endividamento']
+
+    tabela["Margem_de_Lucro"] = (
+        tabela["Lucro_Líquido"] / tabela["Receita_Líquida"])
 
-    return tabela_pivot
+    tabela["Retorno_Sobre_Patrimonio_Liquido"] = (
+        tabela["Lucro_Líquido"] / tabela["Patrimonio_Liquido"])
+
+    return tabela
 
 
 def prophet_ar2_forecast(df, target_col, horizon=6, yearly_seasonality=True):
@@ -186,8 +400,11 @@ def prophet_ar2_forecast(df, target_col, horizon=6, yearly_seasonality=True):
     Retorna:
     --------
     dict :
-        {'MAE': valor, 'RMSE': valor, 'MAPE': valor, 'forecast_df': DataFrame}
+        {'MAE': valor, 'RMSE': valor, 'MAPE': valor, 'sMAPE': valor,
+         'MASE': valor, 'coef_ar': (lag1, lag2), 'forecast_df': DataFrame}
     """
+    from prophet import Prophet
+    from prophet.utilities import regressor_coefficients
 
     # --- Preparação ---
     s = df[target_col].astype(float).dropna()
@@ -220,6 +437,9 @@ def prophet_ar2_forecast(df, target_col, horizon=6, yearly_seasonality=True):
     m.add_regressor('lag2')
     m.fit(train[['ds', 'y', 'lag1', 'lag2']])
 
+    # coeficientes das defasagens na escala original (pesos psi dos intervalos)
+    coefs = regressor_coefficients(m).set_index('regressor')['coef']
+
     # --- Previsão recursiva ---
     last_row = train.iloc[-1].copy()
     preds, pred_dates = [], []
@@ -242,9 +462,8 @@ def prophet_ar2_forecast(df, target_col, horizon=6, yearly_seasonality=True):
     y_true = test['y'].values
     y_pred = np.array(preds)
 
-    mae = mean_absolute_error(y_true, y_pred)
-    rmse = math.sqrt(mean_squared_error(y_true, y_pred))
-    mape = np.mean(np.abs((y_true - y_pred) / y_true)) * 100
+    metricas = calcular_metricas(y_true, y_pred, y_treino=train['y'].values)
+    mae, rmse, mape = metricas['MAE'], metricas['RMSE'], metricas['MAPE']
 
     # montar DataFrame de resultados
     results = pd.DataFrame(
@@ -260,6 +479,9 @@ def prophet_ar2_forecast(df, target_col, horizon=6, yearly_seasonality=True):
         'MAE': mae,
         'RMSE': rmse,
         'MAPE': mape,
+        'sMAPE': metricas['sMAPE'],
+        'MASE': metricas['MASE'],
+        'coef_ar': (float(coefs['lag1']), float(coefs['lag2'])),
         'forecast_df': results
     }
 
@@ -268,6 +490,8 @@ def forecast_future_periods(df, target_col, horizon=6, yearly_seasonality=True):
     """
     Usa Prophet com AR(2) para prever meses futuros após o último registro da série.
     """
+    from prophet import Prophet
+
     s = df[target_col].astype(float).dropna()
 
     # Detecta e converte o índice de data
@@ -338,9 +562,10 @@ def backtest_auto_arima(serie, n_testes=6, h=1, seasonal=False, plot=False):
     dict com:
         - previsoes: pd.Series com as previsões
         - reais: pd.Series com os valores reais
-        - mae, rmse, mape: métricas de erro
+        - mae, rmse, mape, smape, mase: métricas de erro (utils.metricas)
         - modelos: lista dos modelos ajustados (um por iteração)
     """
+    from pmdarima import auto_arima
 
     y = serie.copy()
     y_treino, y_teste = y[:-n_testes], y[-n_testes:]
@@ -369,12 +594,11 @@ def backtest_auto_arima(serie, n_testes=6, h=1, seasonal=False, plot=False):
     previsoes = pd.Series(previsoes, index=y_teste.index)
     reais = pd.Series(reais, index=y_teste.index)
 
-    # métricas
-    mae = mean_absolute_error(reais, previsoes)
-    rmse = np.sqrt(mean_squared_error(reais, previsoes))
-    mape = np.mean(np.abs((reais - previsoes) / reais)) * 100
+    # métricas (MAPE ignora meses com valor real zero)
+    metricas = calcular_metricas(reais.values, previsoes.values,
+                                 y_treino=y_treino.values)
+    mae, rmse, mape = metricas['MAE'], metricas['RMSE'], metricas['MAPE']
 
-   
 
     return {
         'previsoes': previsoes,
@@ -382,13 +606,28 @@ def backtest_auto_arima(serie, n_testes=6, h=1, seasonal=False, plot=False):
         'mae': mae,
         'rmse': rmse,
         'mape': mape,
+        'smape': metricas['sMAPE'],
+        'mase': metricas['MASE'],
         'modelos': modelos
     }
 
 
-def previsao_auto_arima(serie):
+def previsao_auto_arima(serie, horizon=6, retornar_modelo=False):
+    """
+    Previsão de `horizon` meses com auto_arima na série inteira.
+
+    Retorna:
+    --------
+    tuple : (previsões, ordem do modelo) ou, com retornar_modelo=True,
+            (previsões, ordem, modelo ajustado), para que os intervalos de
+            utils.intervalos usem os pesos psi do mesmo modelo da previsão
+    """
+    from pmdarima import auto_arima
+
     modelo_auto = auto_arima(
         serie, seasonal=False, trace=True)
-    previsoes = modelo_auto.predict(n_periods=6)
+    previsoes = modelo_auto.predict(n_periods=horizon)
     ordem = modelo_auto.order
+    if retornar_modelo:
+        return previsoes, ordem, modelo_auto
     return previsoes, ordem
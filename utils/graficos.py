@@ -0,0 +1,322 @@
+"""
+graficos.py
+
+Construção das figuras Plotly da aba "Contábil". Cada função recebe o DataFrame
+já preparado (preparar_dados_contabil) e devolve um go.Figure pronto para o
+st.plotly_chart; figuras_contabil monta todas de uma vez para serem memorizadas
+no cache por (empresa, versão dos dados, anos selecionados), de forma que trocar
+de ano/aba não refaz nem o reshaping do pandas nem a especificação Plotly.
+
+As figuras ficam em cache como objetos go.Figure (e não como dicionários):
+o st.plotly_chart revalida dicionários reconstruindo um Figure a cada chamada,
+enquanto um Figure já validado só é serializado.
+"""
+
+import pandas as pd
+import plotly.express as px
+
+from utils.agregacao import agregar_para_grafico
+
+
+def preparar_dados_contabil(indicadores_historicos, anos, max_pontos=36):
+    """
+    Filtra pelos anos escolhidos, agrega em trimestres/anos quando o número de
+    meses passaria de max_pontos (utils.agregacao), converte o índice para
+    coluna e cria a composição da disponibilidade de caixa usada nos gráficos.
+    """
+    selecionados = indicadores_historicos[
+        pd.Index(indicadores_historicos.index).astype(str).str[:4].isin(anos)]
+    selecionados, _ = agregar_para_grafico(selecionados, max_pontos=max_pontos)
+
+    df_plot = selecionados.reset_index().sort_values("mes")
+    df_plot["mes"] = df_plot["mes"].astype(str)
+
+    df_plot["Banco"] = df_plot["Disponibilidade_Caixa"] * 0.5
+    df_plot["Investimento"] = df_plot["Disponibilidade_Caixa"] * 0.3
+    df_plot["Caixa"] = df_plot["Disponibilidade_Caixa"] * 0.2
+    return df_plot
+
+
+# 1️⃣ Receita Líquida / Receita Bruta
+def figura_receita(df_plot):
+    fig_receita = px.bar(
+        df_plot,
+        x="mes",
+        y=["Receita_Bruta", "Receita_Líquida"],
+        barmode="group",
+        title="RECEITA LÍQUIDA / RECEITA BRUTA",
+        labels={
+            "mes": "Mês",
+            "value": "Valor (R$)",
+            "variable": "Indicador"
+        },
+        color_discrete_map={
+            "Receita_Bruta": "#B0B0B0",   # Cinza médio
+            "Receita_Líquida": "#595959"  # Cinza escuro
+        },
+        text_auto=".2s"
+    )
+
+    fig_receita.update_traces(
+        textposition="outside",
+        marker_line_width=0.8,
+        marker_line_color="#E0E0E0"
+    )
+
+    fig_receita.update_layout(
+        title={
+            "text": "RECEITA LÍQUIDA / RECEITA BRUTA",
+            "x": 0.5,          # Centraliza o título
+            "xanchor": "center",
+            "yanchor": "top"
+
+        },
+        plot_bgcolor="#ffffff",
+        paper_bgcolor="#ffffff",
+        xaxis_title="Mês",
+        yaxis_title="Valor (R$)",
+        bargap=0.25,
+        font=dict(color="#333", size=13),
+        legend=dict(
+            orientation="h",
+            yanchor="top",
+            y=-0.25,
+            xanchor="center",
+            x=0.5,
+            title_text=""
+        ),
+        hovermode="x unified"
+    )
+    return fig_receita
+
+
+# 2️⃣ Disponibilidade de Caixa
+def figura_caixa(df_plot):
+    df_caixa_melt = df_plot.melt(
+        id_vars=["mes"],
+        value_vars=["Banco", "Investimento", "Caixa"],
+        var_name="Composição",
+        value_name="Valor"
+    )
+
+    fig_caixa = px.bar(
+        df_caixa_melt,
+        x="mes",
+        y="Valor",
+        color="Composição",
+        barmode="stack",
+        title="DISPONIBILIDADE DE CAIXA",
+        labels={
+            "mes": "Mês",
+            "Valor": "Valor (R$)",
+            "Composição": "Composição"
+        },
+        color_discrete_map={
+            "Banco": "#D9D9D9",         # cinza claro
+            "Investimento": "#A6A6A6",  # cinza médio
+            "Caixa": "#595959"          # cinza escuro
+        }
+    )
+
+    fig_caixa.update_traces(
+        texttemplate="%{y:,.0f}",
+        textposition="inside"
+    )
+
+    fig_caixa.update_layout(
+        title={
+            "text": "DISPONIBILIDADE DE CAIXA",
+            "x": 0.5,       # centraliza o título
+            "xanchor": "center",
+            "yanchor": "top"
+        },
+        plot_bgcolor="#ffffff",
+        paper_bgcolor="#ffffff",
+        xaxis_title="Mês",
+        yaxis_title="Valor (R$)",
+        font=dict(color="#333", size=11),
+        legend=dict(
+            orientation="h",
+            yanchor="top",
+            y=-0.25,
+            xanchor="center",
+            x=0.5,
+            title_text=""
+        ),
+        bargap=0.2,
+        hovermode="x unified"
+    )
+    return fig_caixa
+
+
+# 3️⃣ Custo / Receita Líquida
+def figura_custo(df_plot):
+    fig_custo = px.area(
+        df_plot,
+        x="mes",
+        y=["Custo_Total", "Receita_Líquida"],
+        title="CUSTO / RECEITA LÍQUIDA",
+        labels={
+            "mes": "Mês",
+            "value": "Valor (R$)",
+            "variable": "Indicador"
+        },
+        color_discrete_map={
+            "Custo_Total": "#595959",    # cinza escuro
+            "Receita_Líquida": "#D9D9D9" # dourado vibrante
+        }
+    )
+
+    # 🔹 Linhas mais suaves e preenchimento translúcido
+    fig_custo.update_traces(
+        mode="lines",
+        line=dict(width=3),
+        opacity=0.4
+    )
+
+    # 🔹 Layout refinado e legendas bem posicionadas
+    fig_custo.update_layout(
+        title={
+        "text": "CUSTO / RECEITA LÍQUIDA",
+        "x": 0.5,       # centraliza o título
+        "xanchor": "center",
+        "yanchor": "top"
+        },
+        plot_bgcolor="#ffffff",
+        paper_bgcolor="#ffffff",
+        xaxis_title="Mês",
+        yaxis_title="Valor (R$)",
+        font=dict(color="#333", size=13),
+        legend=dict(
+            orientation="h",
+            yanchor="top",
+            y=-0.2,
+            xanchor="center",
+            x=0.5,
+            title_text=""
+        ),
+        hovermode="x unified"
+    )
+    return fig_custo
+
+
+# 4️⃣ Receita Líquida (barra simples)
+def figura_receita_liquida(df_plot):
+    fig_liquida = px.bar(
+        df_plot,
+        x="mes",
+        y="Receita_Líquida",
+        title="RECEITA LÍQUIDA",
+        text_auto=".2s",
+        color_discrete_sequence=["#595959"],
+        labels={"mes": "Mês", "Receita_Líquida": "Valor (R$)"}
+    )
+
+    fig_liquida.update_layout(
+        title={
+        "text": "RECEITA LÍQUIDA",
+        "x": 0.5,       # centraliza o título
+        "xanchor": "center",
+        "yanchor": "top"
+        },
+        plot_bgcolor="#ffffff",
+        xaxis_title="Mês",
+        yaxis_title="Receita Líquida (R$)",
+        legend=dict(
+            orientation="h",
+            yanchor="top",
+            y=-0.25,
+            xanchor="center",
+            x=0.5
+        )
+    )
+    return fig_liquida
+
+
+# 5️⃣ Margem de Lucro (%)
+def figura_margem(df_plot):
+    # Margem_de_Lucro já vem de calcular_indices (e é recalculada na agregação)
+    # Cria gráfico de linha
+    fig_margem = px.line(
+        df_plot,
+        x="mes",
+        y="Margem_de_Lucro",
+        title="MARGEM DE LUCRO (%)",
+        markers=True,
+        labels={
+            "mes": "Mês",
+            "Margem_de_Lucro": "Margem (%)"
+        },
+        hover_data={
+            "Margem_de_Lucro": ":.1%",  # Formato percentual
+        }
+    )
+
+    # Ajusta visual da linha
+    fig_margem.update_traces(
+        line=dict(width=3, color="#595959"),
+        marker=dict(size=8)
+    )
+
+    # Margem dos últimos 12 meses (utils.derivadas), quando disponível
+    if "Margem_de_Lucro_TTM" in df_plot and df_plot["Margem_de_Lucro_TTM"].notna().any():
+        fig_margem.add_scatter(
+            x=df_plot["mes"], y=df_plot["Margem_de_Lucro_TTM"], name="Margem 12 meses",
+            mode="lines", line=dict(width=2, color="#A6A6A6", dash="dash"),
+            hovertemplate="%{y:.1%}")
+
+    # Layout do gráfico
+    fig_margem.update_layout(
+        title={
+            "text": "MARGEM DE LUCRO (%)",
+            "x": 0.5,
+            "xanchor": "center",
+            "yanchor": "top"
+        },
+        plot_bgcolor="#FFFFFF",
+        paper_bgcolor="#FFFFFF",
+        font=dict(color="#333333", size=12),
+        xaxis_title="Mês",
+        yaxis_title="Margem (%)",
+        xaxis=dict(showgrid=False),
+        yaxis=dict(showgrid=True, gridcolor="#E5E5E5", tickformat=".0%"),  # Eixo Y em porcentagem
+        hovermode="x unified",
+        title_font=dict(size=18, color="#000000"),
+        annotations=[
+            dict(
+                x=0.5,
+                y=1.08,
+                xref="paper",
+                yref="paper",
+                text="",  # sem texto visível
+                showarrow=False,
+                hovertext="A Margem de Lucro (%) indica a porcentagem da receita líquida que se transforma em lucro líquido, mostrando a eficiência da empresa em gerar lucro.",
+                hoverlabel=dict(bgcolor="white", font_size=12)
+            )
+        ]
+    )
+    return fig_margem
+
+
+def figuras_contabil(indicadores_historicos, anos, max_pontos=36, derivadas=None):
+    """
+    Monta todas as figuras da aba "Contábil" para os anos escolhidos. Com mais
+    de max_pontos meses selecionados, os gráficos passam a trimestrais/anuais.
+    `derivadas` (utils.derivadas.derivar_series) acrescenta as séries prontas,
+    como a margem dos últimos 12 meses.
+
+    Retorna:
+    --------
+    dict : {'receita', 'caixa', 'custo', 'receita_liquida', 'margem'} -> go.Figure
+    """
+    if derivadas is not None:
+        indicadores_historicos = indicadores_historicos.join(derivadas)
+    df_plot = preparar_dados_contabil(indicadores_historicos, list(anos),
+                                      max_pontos=max_pontos)
+    return {
+        'receita': figura_receita(df_plot),
+        'caixa': figura_caixa(df_plot),
+        'custo': figura_custo(df_plot),
+        'receita_liquida': figura_receita_liquida(df_plot),
+        'margem': figura_margem(df_plot),
+    }
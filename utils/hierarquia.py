@@ -0,0 +1,100 @@
+"""
+hierarquia.py
+
+Navegação (drill-down) pela árvore do balancete, de nivel_1 até as contas
+analíticas, sem materializar o df_hist inteiro na tela. IndiceHierarquia
+pré-calcula uma única vez os totais de todos os nós da árvore por mês (um
+groupby por nível sobre as contas analíticas) e guarda os valores numa matriz
+nó × mês, com um índice pai -> filhos. Expandir um nó apenas fatia as linhas
+dos filhos e as colunas dos meses pedidos, de modo que só o nível aberto é
+montado e enviado ao navegador, qualquer que seja a profundidade do plano de
+contas ou o número de meses.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def colunas_niveis(df):
+    """Colunas nivel_1..nivel_n de df, em ordem de profundidade."""
+    return sorted((c for c in df.columns if c.startswith("nivel_")),
+                  key=lambda c: int(c.split("_")[1]))
+
+
+class IndiceHierarquia:
+    """
+    Índice de totais por nó da hierarquia e por mês.
+
+    Parâmetros:
+    -----------
+    df : pd.DataFrame
+        Contas analíticas (load_all_rows_from_* ou coleção de folhas).
+    valor : str
+        Coluna somada (default: saldo_atual).
+
+    Exemplo:
+    --------
+    >>> indice = IndiceHierarquia(df_hist)
+    >>> indice.filhos(())                                # nivel_1
+    >>> indice.filhos(("ATIVO", "ATIVO CIRCULANTE"), meses=indice.meses[-12:])
+    """
+
+    def __init__(self, df, valor="saldo_atual"):
+        self.niveis = colunas_niveis(df)
+        df = df.loc[df["mes"].notna()]
+        self.meses = pd.Index(sorted(df["mes"].unique()), name="mes")
+
+        caminhos, matrizes = [], []
+        for k in range(1, len(self.niveis) + 1):
+            somas = (df.groupby(self.niveis[:k] + ["mes"], sort=False)[valor].sum()
+                       .unstack("mes").reindex(columns=self.meses))
+            caminhos.extend(somas.index if k > 1 else [(c,) for c in somas.index])
+            matrizes.append(somas.to_numpy())
+
+        self._valores = np.vstack(matrizes) if matrizes else np.empty((0, len(self.meses)))
+        self._posicao = {caminho: i for i, caminho in enumerate(caminhos)}
+        filhos = {}
+        for i, caminho in enumerate(caminhos):
+            filhos.setdefault(caminho[:-1], []).append(i)
+        self._filhos = {pai: np.array(posicoes) for pai, posicoes in filhos.items()}
+
+        # código das contas analíticas (nó cujo caminho é o caminho completo de uma conta)
+        contas = df[self.niveis + ["conta"]].drop_duplicates(self.niveis)
+        codigo = {tuple(v for v in linha[:-1] if isinstance(v, str)): linha[-1]
+                  for linha in contas.itertuples(index=False)}
+
+        self.nos = pd.DataFrame({
+            "caminho": caminhos,
+            "nivel": [len(c) for c in caminhos],
+            "descricao": [c[-1] for c in caminhos],
+            "folha": [c not in self._filhos for c in caminhos],
+            "conta": [codigo.get(c) for c in caminhos],
+        })
+
+    def filhos(self, caminho=(), meses=None):
+        """
+        Filhos de um nó (caminho = tupla de descrições a partir de nivel_1;
+        () para a raiz), com os totais dos meses pedidos (default: todos).
+
+        Retorna:
+        --------
+        pd.DataFrame indexado pela descrição, com 'conta', 'folha' e uma
+        coluna por mês
+        """
+        posicoes = self._filhos.get(tuple(caminho), np.array([], dtype=int))
+        colunas = (np.arange(len(self.meses)) if meses is None
+                   else self.meses.get_indexer(pd.Index(meses)))
+        colunas = colunas[colunas >= 0]
+
+        nos = self.nos.iloc[posicoes]
+        tabela = pd.DataFrame(self._valores[np.ix_(posicoes, colunas)],
+                              index=pd.Index(nos["descricao"], name="descricao"),
+                              columns=self.meses[colunas])
+        tabela.insert(0, "folha", nos["folha"].to_numpy())
+        tabela.insert(0, "conta", nos["conta"].to_numpy())
+        return tabela
+
+    def total(self, caminho, meses=None):
+        """Série mensal do total de um nó."""
+        serie = pd.Series(self._valores[self._posicao[tuple(caminho)]], index=self.meses)
+        return serie if meses is None else serie.reindex(meses)
@@ -0,0 +1,89 @@
+"""
+incremental.py
+
+Atualização incremental da tabela de indicadores quando chega o balancete de um
+único mês. Em vez de reagrupar todas as linhas de todos os meses, apenas as
+contas do(s) mês(es) recebido(s) passam por processar_indicadores_financeiros e
+a linha correspondente é inserida ou substituída na tabela existente.
+"""
+
+import numpy as np
+import pandas as pd
+
+from utils.functions import (GRUPOS_INDICADORES, indicadores_de_somas,
+                             processar_indicadores_financeiros)
+
+
+def atualizar_indicadores_mes(indicadores: pd.DataFrame, df_mes: pd.DataFrame,
+                              previsoes=None, tolerancia: float = 1e-9):
+    """
+    Insere ou substitui na tabela de indicadores os meses presentes em df_mes.
+
+    Como todos os agrupamentos de processar_indicadores_financeiros são feitos
+    por mês, calcular os indicadores só com as contas do mês novo produz
+    exatamente a mesma linha que um reprocessamento completo, com custo
+    proporcional ao tamanho do mês.
+
+    Parâmetros:
+    -----------
+    indicadores : pd.DataFrame
+        Tabela atual (saída de processar_indicadores_financeiros, índice 'mes').
+    df_mes : pd.DataFrame
+        Contas achatadas (formato de extract_accounts + coluna 'mes') do mês
+        recebido. Pode conter mais de um mês, por exemplo numa retificação.
+    previsoes : iterable de str, opcional
+        Colunas que alimentam previsões (ex: ['Margem_de_Lucro']). Se None,
+        todas as colunas da tabela são consideradas.
+    tolerancia : float
+        Diferença absoluta abaixo da qual um valor é considerado inalterado.
+
+    Retorna:
+    --------
+    tuple :
+        (tabela atualizada e ordenada por mês, lista das previsões desatualizadas)
+
+    Levanta:
+    --------
+    ValueError
+        Se algum mês de df_mes não tem nenhuma conta dos grupos do balanço ou
+        nenhuma dos grupos de resultado (o mês não geraria linha e a tabela
+        ficaria sem a atualização).
+    """
+    if df_mes is None or df_mes.empty:
+        if indicadores is None:
+            vazia = pd.DataFrame(columns=list(GRUPOS_INDICADORES), dtype=float)
+            return indicadores_de_somas(vazia), []
+        return indicadores.copy(), []
+
+    novas = processar_indicadores_financeiros(df_mes)
+    recebidos = pd.Index(df_mes["mes"].dropna().unique())
+    incompletos = recebidos.difference(novas.index)
+    if len(incompletos):
+        raise ValueError("Meses sem contas do balanço ou de resultado: "
+                         + ", ".join(map(str, incompletos.sort_values())))
+
+    if indicadores is None or indicadores.empty:
+        alvos = list(novas.columns) if previsoes is None else list(previsoes)
+        return novas.sort_index(), [c for c in alvos if c in novas.columns]
+
+    alvos = list(indicadores.columns) if previsoes is None else list(previsoes)
+    alvos = [c for c in alvos if c in novas.columns]
+
+    # Um mês que ainda não existia estende a série: toda previsão fica velha
+    meses_novos = ~novas.index.isin(indicadores.index)
+    if meses_novos.any():
+        desatualizadas = alvos
+    else:
+        antes = indicadores.loc[novas.index, alvos].to_numpy(dtype=float)
+        depois = novas[alvos].to_numpy(dtype=float)
+        iguais = np.isclose(depois, antes, rtol=0.0,
+                            atol=tolerancia, equal_nan=True)
+        desatualizadas = [c for c, ok in zip(alvos, iguais.all(axis=0)) if not ok]
+
+    tabela = pd.concat([
+        indicadores.drop(index=novas.index, errors="ignore"),
+        novas.reindex(columns=indicadores.columns)
+    ]).sort_index()
+    tabela.index.name = indicadores.index.name
+
+    return tabela, desatualizadas
@@ -0,0 +1,201 @@
+"""
+intervalos.py
+
+Intervalos de previsão por bootstrap dos resíduos do backtest, simulados em lote
+com NumPy. Em vez de "média ± 3·desvio" das próprias previsões, cada caminho
+futuro soma à previsão pontual choques reamostrados dos erros de um passo,
+propagados pelos pesos psi do modelo (representação MA(∞) do ARIMA/AR):
+
+    e_{T+k} = sum_{j=0}^{k-1} psi_j · eps_{T+k-j}
+
+Os resíduos são centralizados (o viés do backtest não desloca a faixa para
+longe da própria previsão) e suavizados com um ruído normal de variância
+compensada, para que poucos resíduos não produzam faixas de 80% e 95%
+idênticas. Depois que os resíduos existem, o custo é uma amostragem de
+índices e um produto de matrizes (caminhos × horizonte), qualquer que seja o
+número de caminhos.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+def pesos_psi(ar=(), ma=(), d=0, h=6):
+    """
+    Pesos psi_0..psi_{h-1} de um ARIMA(p, d, q) com coeficientes `ar` (phi) e
+    `ma` (theta), na convenção y_t = sum phi_i y_{t-i} + e_t + sum theta_j e_{t-j}.
+    """
+    # phi*(B) = phi(B)·(1 - B)^d, escrito como coeficientes do lado direito
+    poli = np.r_[1.0, -np.asarray(ar, dtype=float)]
+    for _ in range(d):
+        poli = np.convolve(poli, [1.0, -1.0])
+    phi = -poli[1:]
+    theta = np.asarray(ma, dtype=float)
+
+    psi = np.zeros(h)
+    psi[0] = 1.0
+    for j in range(1, h):
+        acc = theta[j - 1] if j <= len(theta) else 0.0
+        k = min(j, len(phi))
+        acc += np.dot(phi[:k], psi[j - 1::-1][:k])
+        psi[j] = acc
+    return psi
+
+
+def pesos_psi_modelo(modelo, h=6):
+    """
+    Pesos psi de um modelo pmdarima ajustado. Para objetos sem parâmetros ARIMA
+    usa o passeio aleatório (psi = 1), que acumula os choques e é a escolha
+    conservadora; o backend rápido informa os pesos do próprio modelo em
+    resultado_backtest['psi'].
+    """
+    try:
+        ar = modelo.arparams() if modelo.order[0] else ()
+        ma = modelo.maparams() if modelo.order[2] else ()
+        return pesos_psi(ar, ma, d=modelo.order[1], h=h)
+    except (AttributeError, TypeError, IndexError):
+        return np.ones(h)
+
+
+def simular_caminhos(previsao, residuos, psi=None, n_caminhos=2000,
+                     centralizar=True, suavizar=True, semente=None):
+    """
+    Simula caminhos futuros por bootstrap dos resíduos.
+
+    Parâmetros:
+    -----------
+    previsao : array-like (h,) ou (n_series, h)
+        Previsões pontuais.
+    residuos : array-like (r,) ou (n_series, r)
+        Erros de um passo (real - previsto) do backtest; NaN são descartados
+        (séries com quantidades diferentes de resíduos podem vir com NaN).
+    psi : array-like (h,) ou (n_series, h), opcional
+        Pesos psi do modelo (default: psi_0 = 1, demais 0 -> choques
+        independentes por mês).
+    n_caminhos : int
+        Número de caminhos simulados por série.
+    centralizar : bool
+        Se True (default), remove a média dos resíduos: a previsão pontual
+        fica no centro dos caminhos em vez de deslocada pelo viés do backtest.
+    suavizar : bool
+        Se True (default), soma a cada choque sorteado um ruído normal de
+        desvio 1,06·sigma·r^(-1/5) e reescala para manter a variância dos
+        resíduos (bootstrap suavizado).
+
+    Retorna:
+    --------
+    np.ndarray (n_caminhos, h) ou (n_series, n_caminhos, h)
+    """
+    previsao = np.asarray(previsao, dtype=float)
+    residuos = np.asarray(residuos, dtype=float)
+    unica = previsao.ndim == 1
+    previsao = np.atleast_2d(previsao)
+    residuos = np.atleast_2d(residuos)
+    n, h = previsao.shape
+
+    if psi is None:
+        psi = np.eye(1, h)[0]
+    psi = np.broadcast_to(np.asarray(psi, dtype=float), (n, h))
+
+    validos = ~np.isnan(residuos)
+    quantidade = validos.sum(axis=1)
+    if (quantidade == 0).any():
+        raise ValueError("Cada série precisa de ao menos um resíduo válido.")
+    # compacta os resíduos válidos no início de cada linha
+    ordem = np.argsort(~validos, axis=1, kind="stable")
+    residuos = np.take_along_axis(residuos, ordem, axis=1)
+    media = np.nanmean(residuos, axis=1)
+    if centralizar:
+        residuos = residuos - media[:, None]
+        media = np.zeros(n)
+
+    rng = np.random.default_rng(semente)
+    sorteio = rng.random((n, n_caminhos, h))
+    indices = (sorteio * quantidade[:, None, None]).astype(int)
+    choques = np.take_along_axis(residuos[:, None, :],
+                                 indices.reshape(n, 1, -1), axis=2).reshape(n, n_caminhos, h)
+    if suavizar:
+        desvio = np.sqrt(np.nanmean((residuos - media[:, None]) ** 2, axis=1))
+        banda = 1.06 * quantidade ** -0.2
+        ruido = rng.standard_normal((n, n_caminhos, h)) * (banda * desvio)[:, None, None]
+        choques = media[:, None, None] + (choques - media[:, None, None] + ruido) \
+            / np.sqrt(1 + banda ** 2)[:, None, None]
+
+    # L[s, k, i] = psi_{k-i} para i <= k
+    k, i = np.indices((h, h))
+    L = np.where(k >= i, psi[:, np.clip(k - i, 0, h - 1)], 0.0)
+    caminhos = previsao[:, None, :] + np.einsum("nck,nhk->nch", choques, L)
+    return caminhos[0] if unica else caminhos
+
+
+def intervalos_bootstrap(previsao, residuos, psi=None, niveis=(0.8, 0.95),
+                         n_caminhos=2000, centralizar=True, suavizar=True, semente=None):
+    """
+    Intervalos de previsão a partir dos caminhos de simular_caminhos.
+
+    Retorna:
+    --------
+    dict nível -> (limite inferior, limite superior), arrays com a forma da
+    previsão.
+    """
+    caminhos = simular_caminhos(previsao, residuos, psi=psi, n_caminhos=n_caminhos,
+                                centralizar=centralizar, suavizar=suavizar,
+                                semente=semente)
+    eixo = caminhos.ndim - 2
+    resultado = {}
+    for nivel in niveis:
+        alfa = (1 - nivel) / 2
+        inferior, superior = np.quantile(caminhos, [alfa, 1 - alfa], axis=eixo)
+        resultado[nivel] = (inferior, superior)
+    return resultado
+
+
+def intervalos_backtest(previsao, resultado_backtest, modelo=None, niveis=(0.8, 0.95),
+                        n_caminhos=2000, semente=0):
+    """
+    Intervalos para a previsão futura a partir do dicionário devolvido por
+    backtest_auto_arima/backtest_rapido (resíduos = reais - previsoes) ou por
+    prophet_ar2_forecast (resíduos = y_true - y_pred do forecast_df).
+
+    Parâmetros:
+    -----------
+    previsao : pd.Series
+        Previsão pontual futura (índice = meses).
+    resultado_backtest : dict
+        Saída do backtest. Os pesos psi vêm de `modelo`, de 'coef_ar' (AR(2)
+        via Prophet), de 'psi' (backend rápido) ou do último item de
+        resultado_backtest['modelos'].
+
+    Retorna:
+    --------
+    pd.DataFrame com colunas 'forecast', 'inferior_80', 'superior_80', ...
+    """
+    h = len(previsao)
+    if 'forecast_df' in resultado_backtest:
+        teste = resultado_backtest['forecast_df']
+        residuos = (teste['y_true'] - teste['y_pred']).to_numpy()
+    else:
+        residuos = (resultado_backtest['reais'] - resultado_backtest['previsoes']).to_numpy()
+
+    if modelo is None and 'coef_ar' in resultado_backtest:
+        psi = pesos_psi(resultado_backtest['coef_ar'], h=h)
+    elif modelo is None and 'psi' in resultado_backtest:
+        psi = np.asarray(resultado_backtest['psi'], dtype=float)
+        if len(psi) < h:
+            raise ValueError(f"O backtest informa pesos psi para {len(psi)} meses; a previsão "
+                             f"tem {h} (use backtest_rapido(..., horizonte={h})).")
+        psi = psi[:h]
+    else:
+        if modelo is None and resultado_backtest.get('modelos'):
+            modelo = resultado_backtest['modelos'][-1]
+        psi = pesos_psi_modelo(modelo, h=h)
+
+    faixas = intervalos_bootstrap(previsao.to_numpy(dtype=float), residuos, psi=psi,
+                                  niveis=niveis, n_caminhos=n_caminhos, semente=semente)
+    tabela = pd.DataFrame({'forecast': previsao.to_numpy(dtype=float)},
+                          index=previsao.index)
+    for nivel, (inferior, superior) in faixas.items():
+        rotulo = int(round(nivel * 100))
+        tabela[f'inferior_{rotulo}'] = inferior
+        tabela[f'superior_{rotulo}'] = superior
+    return tabela
@@ -0,0 +1,125 @@
+"""
+metricas.py
+
+Métricas de avaliação de previsões calculadas de forma vetorizada sobre arrays
+empilhados (séries × dobras de backtest × horizonte), sem laços Python por
+série:
+
+- MAE, RMSE
+- MAPE protegido contra meses com valor real zero (esses pontos são ignorados)
+- sMAPE (simétrico, 0 a 200%)
+- MASE (erro escalado pelo erro do ingênuo sazonal no treino)
+
+Valores NaN são ignorados, o que permite empilhar dobras de tamanhos diferentes
+preenchendo as posições vazias com NaN.
+"""
+
+import warnings
+
+import numpy as np
+import pandas as pd
+
+
+def _eixos_padrao(ndim):
+    # (série, dobra, horizonte) -> reduz dobra e horizonte;
+    # (série, horizonte) -> reduz horizonte; 1-D -> escalar
+    if ndim >= 3:
+        return (-2, -1)
+    if ndim == 2:
+        return (-1,)
+    return None
+
+
+def _media(x, eixos):
+    with warnings.catch_warnings():
+        # fatias inteiramente NaN viram NaN sem poluir o log
+        warnings.simplefilter("ignore", category=RuntimeWarning)
+        return np.nanmean(x, axis=eixos)
+
+
+def escala_mase(y_treino, sazonalidade=1):
+    """
+    Erro médio absoluto do previsor ingênuo sazonal no treino, ao longo do
+    último eixo. Escalas nulas (série constante) viram NaN.
+    """
+    y_treino = np.asarray(y_treino, dtype=float)
+    m = sazonalidade
+    if y_treino.shape[-1] <= m:
+        return np.full(y_treino.shape[:-1], np.nan)
+    escala = _media(np.abs(y_treino[..., m:] - y_treino[..., :-m]), -1)
+    return np.where(escala > 0, escala, np.nan)
+
+
+def calcular_metricas(y_true, y_pred, y_treino=None, sazonalidade=1,
+                      eixos="padrao", eps=1e-12):
+    """
+    Calcula todas as métricas numa única passada vetorizada.
+
+    Parâmetros:
+    -----------
+    y_true, y_pred : array-like
+        Valores reais e previstos, com formas compatíveis por broadcasting.
+        Ex: (séries, dobras, horizonte) ou (modelos, séries, dobras, horizonte)
+        contra reais (séries, dobras, horizonte).
+    y_treino : array-like, opcional
+        Histórico de treino para a escala do MASE, com o tempo no último eixo
+        (ex: (séries, T)). Sem ele, MASE não é calculado.
+    sazonalidade : int
+        Defasagem do ingênuo usado na escala do MASE (1 = passeio aleatório).
+    eixos : tuple, None ou "padrao"
+        Eixos reduzidos. "padrao" reduz os dois últimos eixos em arrays com 3+
+        dimensões, o último em 2-D e tudo em 1-D.
+    eps : float
+        Valores reais com |y| <= eps são excluídos do MAPE.
+
+    Retorna:
+    --------
+    dict :
+        {'MAE', 'RMSE', 'MAPE', 'sMAPE', 'MASE', 'n'} com escalares ou arrays
+        na forma das dimensões não reduzidas. MAPE e sMAPE em porcentagem.
+    """
+    y_true = np.asarray(y_true, dtype=float)
+    y_pred = np.asarray(y_pred, dtype=float)
+    y_true, y_pred = np.broadcast_arrays(y_true, y_pred)
+    if eixos == "padrao":
+        eixos = _eixos_padrao(y_true.ndim)
+
+    erro = y_pred - y_true
+    abs_erro = np.abs(erro)
+    valido = ~np.isnan(erro)
+
+    mae = _media(abs_erro, eixos)
+    rmse = np.sqrt(_media(erro ** 2, eixos))
+
+    abs_real = np.abs(y_true)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pct = np.where(abs_real > eps, abs_erro / abs_real, np.nan)
+        soma = abs_real + np.abs(y_pred)
+        # real e previsto nulos: acerto perfeito
+        sim = np.where(soma > 0, 2 * abs_erro / soma, np.where(valido, 0.0, np.nan))
+    mape = _media(pct, eixos) * 100
+    smape = _media(sim, eixos) * 100
+
+    resultado = {
+        'MAE': mae,
+        'RMSE': rmse,
+        'MAPE': mape,
+        'sMAPE': smape,
+        'MASE': None,
+        'n': valido.sum(axis=eixos),
+    }
+    if y_treino is not None:
+        resultado['MASE'] = mae / escala_mase(y_treino, sazonalidade)
+    return resultado
+
+
+def tabela_metricas(y_true, y_pred, indice=None, y_treino=None, sazonalidade=1):
+    """
+    Versão tabular de calcular_metricas para comparações em portfólio:
+    retorna um DataFrame com uma linha por série (ou por combinação das
+    dimensões não reduzidas, achatadas) e uma coluna por métrica.
+    """
+    m = calcular_metricas(y_true, y_pred, y_treino=y_treino,
+                          sazonalidade=sazonalidade)
+    colunas = {k: np.ravel(v) for k, v in m.items() if v is not None}
+    return pd.DataFrame(colunas, index=indice)
@@ -0,0 +1,175 @@
+"""
+plano_contas.py
+
+Mapeamento do plano de contas de cada empresa para os grupos padrão dos
+indicadores (GRUPOS_INDICADORES: Receita_Bruta, Custo_Total, Ativo_Circulante,
+...). Empresas com plano de contas diferente (outras descrições ou outra
+codificação) declaram seu próprio plano em vez de receberem zeros em silêncio.
+
+Um plano é {grupo: regra ou lista de regras}; uma conta entra no grupo se
+atender a alguma das regras, e grupos ausentes do plano seguem PLANO_PADRAO
+(uma lista vazia desliga o grupo). Cada regra é um filtro {coluna: valor}:
+
+- nivel_k / descricao: igualdade com a descrição (ou com um dos valores de
+  uma lista)
+- conta: prefixo do código hierárquico ('01.1.1' pega 01.1.1.01.001, ...)
+
+    registrar_plano("tecnotubo", {
+        "Receita_Bruta": [{"conta": "3.1.01"}, {"nivel_2": "Vendas de Produtos"}],
+        "Disponibilidade_Caixa": {"nivel_3": ["CAIXA", "BANCOS CONTA MOVIMENTO"]},
+        ...
+    })
+
+As regras são avaliadas uma única vez sobre as contas distintas de cada
+empresa (dezenas ou centenas), gerando uma tabela código da conta -> máscara
+de bits dos grupos (bit g ligado = conta pertence ao grupo g; os grupos podem
+se sobrepor, como Disponibilidade_Caixa dentro de Ativo_Circulante). As linhas
+consultam a tabela pelo código e as somas empresa × mês × grupo saem de
+np.bincount, de modo que um lote com várias empresas e planos diferentes é
+processado de uma vez, sem ramificações por empresa sobre as linhas.
+"""
+
+import numpy as np
+import pandas as pd
+
+from utils.functions import GRUPOS_INDICADORES, indicadores_de_somas
+
+
+# Plano das empresas sem plano registrado (o das empresas de exemplo)
+PLANO_PADRAO = {grupo: [filtro] for grupo, filtro in GRUPOS_INDICADORES.items()}
+
+PLANOS_EMPRESAS = {}
+
+
+def registrar_plano(empresa, plano):
+    """Declara o plano de contas de uma empresa."""
+    PLANOS_EMPRESAS[empresa] = plano
+
+
+def plano_da_empresa(empresa):
+    return PLANOS_EMPRESAS.get(empresa, PLANO_PADRAO)
+
+
+def _regras(plano, grupo):
+    regras = plano[grupo] if grupo in plano else PLANO_PADRAO.get(grupo, [])
+    return [regras] if isinstance(regras, dict) else list(regras)
+
+
+def _atende(contas, regra):
+    """Máscara das contas (tabela de contas distintas) que atendem a uma regra."""
+    mascara = np.ones(len(contas), dtype=bool)
+    for coluna, valor in regra.items():
+        if coluna not in contas.columns:
+            return np.zeros(len(contas), dtype=bool)
+        valores = [valor] if isinstance(valor, str) else list(valor)
+        if coluna == "conta":
+            codigo = contas["conta"].fillna("").astype(str)
+            atende = np.zeros(len(contas), dtype=bool)
+            for prefixo in valores:
+                atende |= ((codigo == prefixo) | codigo.str.startswith(prefixo + ".")).to_numpy()
+        else:
+            atende = contas[coluna].isin(valores).to_numpy()
+        mascara &= atende
+    return mascara
+
+
+def compilar_plano(contas, plano, grupos=None):
+    """
+    Tabela de consulta de um plano sobre um conjunto de contas distintas.
+
+    Parâmetros:
+    -----------
+    contas : pd.DataFrame
+        Uma linha por conta (nivel_*, conta, descricao).
+    plano : dict
+        {grupo: regra ou lista de regras}.
+    grupos : list, opcional
+        Ordem dos bits (default: GRUPOS_INDICADORES).
+
+    Retorna:
+    --------
+    np.ndarray int64 (len(contas),): máscara de bits dos grupos de cada conta
+    """
+    grupos = list(grupos or GRUPOS_INDICADORES)
+    if len(grupos) > 63:
+        raise ValueError("No máximo 63 grupos por plano de contas.")
+    bits = np.zeros(len(contas), dtype=np.int64)
+    for g, grupo in enumerate(grupos):
+        pertence = np.zeros(len(contas), dtype=bool)
+        for regra in _regras(plano, grupo):
+            pertence |= _atende(contas, regra)
+        bits |= pertence.astype(np.int64) << g
+    return bits
+
+
+def somas_por_plano(df, plano=None, planos=None, grupos=None):
+    """
+    Soma o saldo_atual de cada grupo por mês usando o plano de contas de cada
+    empresa. Sem planos informados ou registrados, o resultado é o mesmo de
+    functions.somas_por_grupo.
+
+    Parâmetros:
+    -----------
+    df : pd.DataFrame
+        Contas analíticas; com coluna 'empresa', várias empresas de uma vez.
+    plano : dict, opcional
+        Plano aplicado a todas as linhas.
+    planos : dict, opcional
+        {empresa: plano}; empresas fora dele usam plano_da_empresa.
+    grupos : list, opcional
+        Grupos calculados (default: GRUPOS_INDICADORES).
+
+    Retorna:
+    --------
+    pd.DataFrame (índice 'mes', ou ('empresa', 'mes') se df tem 'empresa';
+    uma coluna por grupo); NaN quando o grupo não tem contas no mês.
+    """
+    grupos = list(grupos or GRUPOS_INDICADORES)
+    planos = planos or {}
+    df = df.loc[df["mes"].notna()]
+    por_empresa = "empresa" in df.columns
+
+    # código de cada conta distinta (por empresa) e a tabela código -> grupos
+    chaves = (["empresa"] if por_empresa else []) + \
+        [c for c in df.columns if c.startswith("nivel_") or c in ("conta", "descricao")]
+    codigo = df.groupby(chaves, dropna=False, sort=False).ngroup().to_numpy()
+    contas = df.drop_duplicates(chaves)[chaves].reset_index(drop=True)
+    if plano is not None or not por_empresa:
+        tabela = compilar_plano(contas, plano or PLANO_PADRAO, grupos)
+    else:
+        # uma compilação por plano distinto, não por empresa
+        por_plano = {}
+        for empresa, posicoes in contas.groupby("empresa", sort=False).indices.items():
+            plano_empresa = planos[empresa] if empresa in planos else plano_da_empresa(empresa)
+            por_plano.setdefault(id(plano_empresa), (plano_empresa, []))[1].append(posicoes)
+        tabela = np.zeros(len(contas), dtype=np.int64)
+        for plano_empresa, posicoes in por_plano.values():
+            posicoes = np.concatenate(posicoes)
+            tabela[posicoes] = compilar_plano(contas.iloc[posicoes], plano_empresa, grupos)
+
+    # célula (empresa, mês) de cada linha e somas por grupo com bincount
+    colunas_celula = (["empresa"] if por_empresa else []) + ["mes"]
+    celulas = df[colunas_celula].drop_duplicates().sort_values(colunas_celula)
+    indice = (pd.MultiIndex.from_frame(celulas) if por_empresa
+              else pd.Index(celulas["mes"], name="mes"))
+    celula = indice.get_indexer(pd.MultiIndex.from_frame(df[colunas_celula]) if por_empresa
+                                else df["mes"])
+    bits = tabela[codigo]
+    saldo = df["saldo_atual"].to_numpy(dtype=float)
+
+    somas = {}
+    for g, grupo in enumerate(grupos):
+        pertence = ((bits >> g) & 1).astype(bool)
+        soma = np.bincount(celula[pertence], weights=saldo[pertence], minlength=len(indice))
+        quantidade = np.bincount(celula[pertence], minlength=len(indice))
+        somas[grupo] = np.where(quantidade > 0, soma, np.nan)
+    return pd.DataFrame(somas, index=indice, columns=grupos)
+
+
+def processar_indicadores_por_plano(df, plano=None, planos=None):
+    """
+    Tabela de indicadores (saída de processar_indicadores_financeiros) com os
+    grupos definidos pelo plano de contas de cada empresa; com coluna
+    'empresa' o índice é ('empresa', 'mes').
+    """
+    return indicadores_de_somas(somas_por_plano(df, plano=plano, planos=planos))
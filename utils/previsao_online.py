@@ -0,0 +1,222 @@
+"""
+previsao_online.py
+
+Modo de atualização online do previsor por regressores defasados (o AR(2) de
+forecast_future_periods / prever_ar): quando chega um mês novo, os
+coeficientes são atualizados por mínimos quadrados recursivos (RLS) em vez de
+reajustar o modelo em todo o histórico.
+
+Para cada série o estado é o vetor de coeficientes theta = [intercepto,
+phi_1, ..., phi_p], a matriz P = (X'X)^-1 e os últimos p valores. Absorver
+uma observação y com regressores x = [1, y_{t-1}, ..., y_{t-p}] custa O(p²):
+
+    k = P x / (lambda + x' P x)
+    theta <- theta + k (y - x' theta)
+    P <- (P - k x' P) / lambda
+
+Com lambda = 1 o resultado é o ajuste de mínimos quadrados no histórico
+estendido (o mesmo de prever_ar, a menos da regularização mínima aplicada no
+ajuste inicial); lambda < 1 esquece gradualmente os meses antigos. Como em
+previsao_rapida, todas as séries (indicadores × empresas) são atualizadas
+juntas, como matriz. A cada `reajustar_a_cada` meses absorvidos o modelo é
+reajustado do zero sobre o histórico guardado, zerando o acúmulo de erros
+numéricos.
+
+Meses sem valor ficam como NaN no histórico. Cada série é ajustada só na sua
+janela válida (sem os meses antes do primeiro valor, como os blocos de
+prever_lote), com os buracos internos interpolados; depois do último valor,
+as defasagens seguem com os valores previstos.
+"""
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+class PrevisorRLS:
+    """
+    AR(p) com intercepto para n séries, atualizável um mês por vez.
+
+    Parâmetros:
+    -----------
+    p : int
+        Número de defasagens (2 = o AR(2) dos previsores por regressores).
+    esquecimento : float
+        Fator lambda do RLS (1.0 = mínimos quadrados exatos).
+    reajustar_a_cada : int ou None
+        Meses absorvidos entre reajustes completos (None desliga).
+
+    Exemplo:
+    --------
+    >>> previsor = PrevisorRLS().ajustar(Y)     # Y: (séries, meses)
+    >>> previsor.atualizar(y_mes)               # y_mes: (séries,)
+    >>> previsor.prever(6)                      # (séries, 6)
+    """
+
+    def __init__(self, p=2, esquecimento=1.0, reajustar_a_cada=12):
+        self.p = p
+        self.esquecimento = esquecimento
+        self.reajustar_a_cada = reajustar_a_cada
+        self.reajustes = 0
+
+    def ajustar(self, Y):
+        """Ajuste completo em Y (n, T), que pode ter NaN; substitui o estado e o histórico."""
+        Y = np.asarray(Y, dtype=float)
+        n, T = Y.shape
+        p = self.p
+        if T < p + 3:
+            raise ValueError(f"Histórico insuficiente para AR({p}) (mínimo de {p + 3} meses).")
+
+        # buracos internos interpolados; antes do início e depois do fim de
+        # cada série as linhas da regressão ficam de fora
+        Z = pd.DataFrame(Y.T).interpolate(limit_area="inside").to_numpy().T
+        # janelas (y_t, ..., y_{t+p-1}) invertidas -> (lag1, ..., lagp) do alvo y_{t+p}
+        lags = sliding_window_view(Z, p, axis=1)[:, :-1, ::-1]
+        X = np.concatenate([np.ones((n, T - p, 1)), lags], axis=2)
+        alvo = Z[:, p:]
+        valida = np.isfinite(alvo) & np.isfinite(lags).all(axis=2)
+        X = np.where(valida[:, :, None], X, 0.0)
+        alvo = np.where(valida, alvo, 0.0)
+        XtX = np.einsum("ntk,ntj->nkj", X, X)
+        Xty = np.einsum("ntk,nt->nk", X, alvo)
+        # mesma regularização de previsao_rapida para séries constantes
+        escala = np.trace(XtX, axis1=1, axis2=2)[:, None, None] / (p + 1)
+        XtX = XtX + (1e-8 * escala + 1e-12) * np.eye(p + 1)
+
+        self.P = np.linalg.inv(XtX)
+        self.theta = np.einsum("nkj,nj->nk", self.P, Xty)
+        self.observacoes = valida.sum(axis=1)
+
+        # depois do último valor de cada série, as defasagens seguem com os previstos
+        for t in range(p, T):
+            faltando = np.isnan(Z[:, t])
+            if faltando.any():
+                Z[faltando, t] = self._um_passo(Z[faltando, t - p:t][:, ::-1], faltando)
+        self.lags = Z[:, -p:][:, ::-1].copy()
+        self._historico = [Y]
+        self._desde_reajuste = 0
+        self.reajustes += 1
+        return self
+
+    def _um_passo(self, lags, linhas=slice(None)):
+        """Previsão de um mês a partir das defasagens; NaN nas séries sem ajuste."""
+        theta = self.theta[linhas]
+        previsto = theta[:, 0] + np.einsum("nk,nk->n", theta[:, 1:], lags)
+        return np.where(self.observacoes[linhas] > self.p, previsto, np.nan)
+
+    @property
+    def historico(self):
+        """Matriz (n, T) com todos os meses vistos."""
+        if len(self._historico) > 1:
+            self._historico = [np.concatenate(self._historico, axis=1)]
+        return self._historico[0]
+
+    def atualizar(self, y):
+        """
+        Absorve um mês novo, y (n,). Séries com NaN no mês (ou ainda sem p
+        meses observados) não atualizam os coeficientes; o NaN fica no
+        histórico e as defasagens seguem com o valor previsto.
+        """
+        y = np.asarray(y, dtype=float).reshape(-1)
+        x = np.concatenate([np.ones((len(y), 1)), self.lags], axis=1)
+        previsto = self._um_passo(self.lags)
+        observado = np.isfinite(y) & np.isfinite(self.lags).all(axis=1)
+        x = np.where(observado[:, None], x, 0.0)
+
+        Px = np.einsum("nkj,nj->nk", self.P, x)
+        ganho = Px / (self.esquecimento + np.einsum("nk,nk->n", x, Px))[:, None]
+        erro = np.where(observado, y - np.einsum("nk,nk->n", self.theta, x), 0.0)
+        self.theta = self.theta + ganho * erro[:, None]
+        P = (self.P - np.einsum("nk,nj->nkj", ganho, Px)) / self.esquecimento
+        self.P = np.where(observado[:, None, None], P, self.P)
+        self.observacoes = self.observacoes + observado
+
+        self.lags[:, 1:] = self.lags[:, :-1]
+        self.lags[:, 0] = np.where(np.isfinite(y), y, previsto)
+        self._historico.append(y[:, None])
+
+        self._desde_reajuste += 1
+        if self.reajustar_a_cada and self._desde_reajuste >= self.reajustar_a_cada:
+            self.ajustar(self.historico)
+        return previsto
+
+    def prever(self, h):
+        """Previsão recursiva de h meses, (n, h)."""
+        lags = self.lags.copy()
+        previsoes = np.empty((lags.shape[0], h))
+        for k in range(h):
+            yhat = self._um_passo(lags)
+            previsoes[:, k] = yhat
+            lags[:, 1:] = lags[:, :-1]
+            lags[:, 0] = yhat
+        return previsoes
+
+
+class PrevisorOnline:
+    """
+    PrevisorRLS sobre as colunas de uma tabela de indicadores (índice 'mes',
+    'YYYY-MM'); com colunas (empresa, indicador), uma carteira inteira.
+
+    Exemplo:
+    --------
+    >>> previsor = PrevisorOnline(indicadores, ["Margem_de_Lucro", "Liquidez_Corrente"])
+    >>> tabela, _ = atualizar_indicadores_mes(indicadores, df_mes)
+    >>> previsor.absorver(tabela)
+    >>> previsor.prever(6)
+    """
+
+    def __init__(self, indicadores, colunas=None, p=2, esquecimento=1.0, reajustar_a_cada=12):
+        tabela = self._tabela(indicadores, colunas)
+        self.colunas = tabela.columns
+        self.meses = list(tabela.index)
+        self.modelo = PrevisorRLS(p=p, esquecimento=esquecimento,
+                                  reajustar_a_cada=reajustar_a_cada)
+        self.modelo.ajustar(tabela.to_numpy().T)
+
+    def _tabela(self, indicadores, colunas):
+        tabela = indicadores if colunas is None else indicadores[list(colunas)]
+        tabela = tabela.select_dtypes("number").astype(float).sort_index()
+        # sem interpolar: os NaN ficam no histórico, como os de atualizar_mes
+        return tabela.replace([np.inf, -np.inf], np.nan)
+
+    def atualizar_mes(self, mes, valores):
+        """Absorve um mês (valores: Series/dict coluna -> valor)."""
+        if self.meses and str(mes) <= str(self.meses[-1]):
+            raise ValueError(f"Mês {mes} não é posterior a {self.meses[-1]}; use absorver().")
+        linha = pd.Series(valores, dtype=float).reindex(self.colunas)
+        self.modelo.atualizar(linha.to_numpy())
+        self.meses.append(mes)
+
+    def absorver(self, indicadores):
+        """
+        Sincroniza com uma tabela de indicadores atualizada: meses novos são
+        absorvidos em ordem; se algum mês já visto mudou (retificação), o
+        modelo é reajustado do zero na tabela inteira. Meses NaN na tabela e
+        no histórico contam como iguais; um NaN que ganhou valor (ou o
+        contrário) é uma retificação.
+
+        Retorna:
+        --------
+        int : meses absorvidos (ou -1 quando houve reajuste completo)
+        """
+        tabela = self._tabela(indicadores, self.colunas)
+        vistos = tabela.index.isin(self.meses)
+        antes = self.modelo.historico[:, :len(self.meses)]
+        depois = tabela.reindex(self.meses).to_numpy().T
+        if (vistos.sum() != len(self.meses)
+                or not np.allclose(antes, depois, rtol=1e-9, atol=1e-9, equal_nan=True)):
+            self.meses = list(tabela.index)
+            self.modelo.ajustar(tabela.to_numpy().T)
+            return -1
+
+        novos = tabela.loc[~vistos]
+        for mes, linha in novos.iterrows():
+            self.atualizar_mes(mes, linha)
+        return len(novos)
+
+    def prever(self, horizon=6):
+        """pd.DataFrame (meses futuros × colunas) com as previsões."""
+        ultimo = pd.Period(str(self.meses[-1])[:7], freq="M")
+        meses = pd.period_range(ultimo + 1, periods=horizon, freq="M").strftime("%Y-%m")
+        return pd.DataFrame(self.modelo.prever(horizon).T, index=pd.Index(meses, name="mes"),
+                            columns=self.colunas)
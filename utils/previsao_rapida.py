@@ -0,0 +1,449 @@
+"""
+previsao_rapida.py
+
+Backend estatístico leve como alternativa a auto_arima/Prophet para as séries
+mensais curtas (~36 pontos) da tabela de indicadores. Todos os modelos ajustam
+várias séries de uma vez, como uma matriz (séries × meses):
+
+- AR(p) com intercepto via mínimos quadrados (equações normais em lote)
+- Holt-Winters aditivo (nível, tendência e sazonalidade), com as atualizações
+  recursivas fechadas avaliadas numa grade de parâmetros de suavização
+- Sazonal ingênuo (repete o mesmo mês do ano anterior)
+
+O modo "auto" escolhe, por série, o modelo com menor MAE num backtest de origem
+móvel. As funções previsao_rapida, backtest_rapido e
+forecast_future_periods_rapido têm a mesma interface de previsao_auto_arima,
+backtest_auto_arima e forecast_future_periods.
+"""
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from utils.intervalos import pesos_psi
+from utils.metricas import calcular_metricas
+
+
+MODELOS = ("ar", "holt_winters", "sazonal_ingenuo")
+
+NOMES_MODELOS = {
+    "ar": "AR({p})",
+    "holt_winters": "Holt-Winters",
+    "sazonal_ingenuo": "Sazonal ingênuo",
+}
+
+# Grade (alfa, beta, gama) avaliada em paralelo para todas as séries
+_GRADE_HW = [(a, b, g)
+             for a in (0.2, 0.5, 0.8)
+             for b in (0.05, 0.2)
+             for g in (0.1, 0.3)]
+
+
+# ======================
+# MODELOS EM MATRIZ
+# ======================
+def _ajustar_ar(Y, p):
+    """
+    Ajusta AR(p) com intercepto em cada linha de Y (n, T).
+    Retorna coeficientes (n, p + 1): [intercepto, phi_1, ..., phi_p].
+    """
+    n, T = Y.shape
+    # janelas (y_t, ..., y_{t+p-1}) invertidas -> (lag1, ..., lagp) do alvo y_{t+p}
+    lags = sliding_window_view(Y, p, axis=1)[:, :-1, ::-1]
+    X = np.concatenate([np.ones((n, T - p, 1)), lags], axis=2)
+    alvo = Y[:, p:]
+
+    XtX = np.einsum("ntk,ntj->nkj", X, X)
+    Xty = np.einsum("ntk,nt->nk", X, alvo)
+    # pequena regularização para séries constantes (XtX singular)
+    escala = np.trace(XtX, axis1=1, axis2=2)[:, None, None] / (p + 1)
+    XtX = XtX + (1e-8 * escala + 1e-12) * np.eye(p + 1)
+    return np.linalg.solve(XtX, Xty[..., None])[..., 0]
+
+
+def _prever_ar(Y, coef, h):
+    p = coef.shape[1] - 1
+    lags = Y[:, -p:][:, ::-1].copy()
+    previsoes = np.empty((Y.shape[0], h))
+    for k in range(h):
+        yhat = coef[:, 0] + np.einsum("nk,nk->n", coef[:, 1:], lags)
+        previsoes[:, k] = yhat
+        lags[:, 1:] = lags[:, :-1]
+        lags[:, 0] = yhat
+    return previsoes
+
+
+def prever_ar(Y, h, p=2):
+    """Previsão AR(p) recursiva de h passos para cada linha de Y (n, T)."""
+    if Y.shape[1] < p + 3:
+        return prever_sazonal_ingenuo(Y, h, m=1)
+    return _prever_ar(Y, _ajustar_ar(Y, p), h)
+
+
+def _ajustar_holt_winters(Y, m=12, grade=_GRADE_HW):
+    """
+    Ajusta Holt-Winters aditivo em cada linha de Y (n, T), T >= 3. Cada
+    combinação da grade roda em paralelo e, por série, fica a de menor erro
+    quadrático de um passo.
+
+    Retorna:
+    --------
+    tuple : (nivel (n,), tendencia (n,), sazonal (n, m), m, alfa (n,),
+             beta (n,), gama (n,)) no fim da série
+    """
+    n, T = Y.shape
+    alfa, beta, gama = (np.asarray(g, dtype=float)[None, :] for g in zip(*grade))
+    G = alfa.shape[1]
+
+    if T >= 2 * m:
+        nivel = Y[:, :m].mean(axis=1)
+        tendencia = (Y[:, m:2 * m].mean(axis=1) - nivel) / m
+        sazonal = Y[:, :m] - nivel[:, None]
+    else:
+        m = 1
+        gama = np.zeros_like(gama)
+        nivel = Y[:, 0]
+        tendencia = Y[:, 1] - Y[:, 0]
+        sazonal = np.zeros((n, 1))
+
+    nivel = np.repeat(nivel[:, None], G, axis=1)
+    tendencia = np.repeat(tendencia[:, None], G, axis=1)
+    sazonal = np.repeat(sazonal[:, None, :], G, axis=1)
+    sse = np.zeros((n, G))
+
+    for t in range(T):
+        y = Y[:, t][:, None]
+        s = sazonal[:, :, t % m]
+        if t >= m:
+            sse += (y - (nivel + tendencia + s)) ** 2
+        nivel_ant = nivel
+        nivel = alfa * (y - s) + (1 - alfa) * (nivel_ant + tendencia)
+        tendencia = beta * (nivel - nivel_ant) + (1 - beta) * tendencia
+        sazonal[:, :, t % m] = gama * (y - nivel) + (1 - gama) * s
+
+    melhor = np.argmin(sse, axis=1)
+    linhas = np.arange(n)
+    return (nivel[linhas, melhor], tendencia[linhas, melhor], sazonal[linhas, melhor], m,
+            alfa[0, melhor], beta[0, melhor], gama[0, melhor])
+
+
+def prever_holt_winters(Y, h, m=12, grade=_GRADE_HW):
+    """
+    Holt-Winters aditivo para cada linha de Y (n, T), com os parâmetros de
+    suavização escolhidos na grade. Com menos de 2·m pontos o componente
+    sazonal é desligado (Holt linear).
+    """
+    T = Y.shape[1]
+    if T < 3:
+        return prever_sazonal_ingenuo(Y, h, m=1)
+
+    nivel, tendencia, sazonal, m, *_ = _ajustar_holt_winters(Y, m=m, grade=grade)
+    passos = np.arange(1, h + 1)
+    return (nivel[:, None] + passos[None, :] * tendencia[:, None]
+            + sazonal[:, (T + passos - 1) % m])
+
+
+def prever_sazonal_ingenuo(Y, h, m=12):
+    """Repete o valor de m meses atrás (ou o último valor, se T < m)."""
+    T = Y.shape[1]
+    if T == 0:
+        raise ValueError("Série sem nenhum valor para prever.")
+    if T < m:
+        m = 1
+    passos = np.arange(h)
+    return Y[:, T - m + passos % m]
+
+
+def prever_matriz(Y, h, modelo, p=2, m=12):
+    """Previsão de h passos para cada linha de Y (n, T) com um único modelo."""
+    if modelo == "ar":
+        return prever_ar(Y, h, p=p)
+    if modelo == "holt_winters":
+        return prever_holt_winters(Y, h, m=m)
+    if modelo == "sazonal_ingenuo":
+        return prever_sazonal_ingenuo(Y, h, m=m)
+    raise ValueError(f"Modelo desconhecido: {modelo!r}. Use um de {MODELOS}.")
+
+
+def pesos_psi_matriz(Y, h, modelo, p=2, m=12):
+    """
+    Pesos psi_0..psi_{h-1} (representação MA(∞), ver utils.intervalos) do
+    modelo ajustado em cada linha de Y (n, T), com os mesmos recuos para
+    séries curtas de prever_matriz:
+
+    - AR(p): psi da recursão dos coeficientes phi
+    - Holt-Winters: psi_j = alfa·(1 + j·beta) + gama·(1 - alfa)·[j múltiplo de m]
+    - Sazonal ingênuo: psi_j = 1 nos múltiplos de m (m = 1: passeio aleatório)
+
+    Retorna:
+    --------
+    np.ndarray (n, h)
+    """
+    n, T = Y.shape
+    j = np.arange(h)
+    if modelo == "ar" and T >= p + 3:
+        coef = _ajustar_ar(Y, p)
+        return np.stack([pesos_psi(phi, h=h) for phi in coef[:, 1:]])
+    if modelo == "holt_winters" and T >= 3:
+        _, _, _, m_ef, alfa, beta, gama = _ajustar_holt_winters(Y, m=m)
+        sazonal = (j % m_ef == 0)[None, :] * (gama * (1 - alfa))[:, None]
+        psi = alfa[:, None] * (1 + j[None, :] * beta[:, None]) + sazonal
+    elif modelo in MODELOS:
+        m_ef = m if modelo == "sazonal_ingenuo" and T >= m else 1
+        psi = np.repeat((j % m_ef == 0)[None, :].astype(float), n, axis=0)
+    else:
+        raise ValueError(f"Modelo desconhecido: {modelo!r}. Use um de {MODELOS}.")
+    psi[:, 0] = 1.0
+    return psi
+
+
+def pesos_psi_auto(Y, h, escolhido, modelos=MODELOS, p=2, m=12):
+    """Pesos psi (n, h) do modelo escolhido para cada série por prever_auto."""
+    todos = np.stack([pesos_psi_matriz(Y, h, mod, p=p, m=m) for mod in modelos])
+    return todos[escolhido, np.arange(Y.shape[0])]
+
+
+def erros_backtest(Y, n_testes=6, h=6, modelos=MODELOS, p=2, m=12):
+    """
+    Backtest de origem móvel: para cada uma das n_testes últimas origens,
+    ajusta cada modelo no histórico anterior e prevê até h passos.
+
+    Retorna:
+    --------
+    np.ndarray (n_modelos, n) com o MAE médio de cada modelo por série.
+    """
+    n, T = Y.shape
+    # (modelos, séries, dobras, horizonte), com NaN além do fim da série
+    reais = np.full((n, n_testes, h), np.nan)
+    previstos = np.full((len(modelos), n, n_testes, h), np.nan)
+    for d, origem in enumerate(range(T - n_testes, T)):
+        passos = min(h, T - origem)
+        reais[:, d, :passos] = Y[:, origem:origem + passos]
+        for i, modelo in enumerate(modelos):
+            previstos[i, :, d, :passos] = prever_matriz(
+                Y[:, :origem], passos, modelo, p=p, m=m)
+    return calcular_metricas(reais, previstos)['MAE']
+
+
+def prever_auto(Y, h, n_testes=6, modelos=MODELOS, p=2, m=12):
+    """
+    Escolhe, por série, o modelo de menor erro de backtest e devolve
+    (previsões (n, h), índice do modelo escolhido (n,), erros (n_modelos, n)).
+    """
+    n, T = Y.shape
+    n_testes = min(n_testes, max(0, T - (p + 3)))
+    if n_testes == 0 or len(modelos) == 1:
+        erros = np.full((len(modelos), n), np.nan)
+        escolhido = np.zeros(n, dtype=int)
+    else:
+        erros = erros_backtest(Y, n_testes=n_testes, h=h,
+                               modelos=modelos, p=p, m=m)
+        escolhido = np.argmin(np.nan_to_num(erros, nan=np.inf), axis=0)
+
+    todas = np.stack([prever_matriz(Y, h, mod, p=p, m=m) for mod in modelos])
+    return todas[escolhido, np.arange(n)], escolhido, erros
+
+
+# ======================
+# APOIO A SÉRIES PANDAS
+# ======================
+def _limpar(valores):
+    """Troca inf por NaN e interpola buracos internos ao longo do tempo."""
+    df = pd.DataFrame(np.asarray(valores, dtype=float).T)
+    df = df.replace([np.inf, -np.inf], np.nan)
+    return df.interpolate(limit_area="inside").to_numpy().T
+
+
+def _janela_valida(serie):
+    """
+    Série sem inf, recortada do primeiro ao último mês com valor e com os
+    buracos internos interpolados: a mesma janela que prever_lote usa, de
+    modo que um mês faltando não encosta os vizinhos um no outro.
+    """
+    s = serie.astype(float).replace([np.inf, -np.inf], np.nan)
+    validos = np.flatnonzero(s.notna().to_numpy())
+    if len(validos) == 0:
+        return s.iloc[:0]
+    return s.iloc[validos[0]:validos[-1] + 1].interpolate(limit_area="inside")
+
+
+def _datas_futuras(indice, h):
+    """Continua o índice mensal da série por h meses."""
+    try:
+        ultima = pd.to_datetime(pd.Index(indice)).max()
+    except (ValueError, TypeError):
+        inicio = len(indice)
+        return pd.RangeIndex(inicio, inicio + h)
+    return pd.DatetimeIndex([ultima + pd.DateOffset(months=i)
+                             for i in range(1, h + 1)])
+
+
+def _nome_modelo(modelo, p):
+    return NOMES_MODELOS[modelo].format(p=p)
+
+
+def _resolver_modelos(modelo):
+    return MODELOS if modelo == "auto" else (modelo,)
+
+
+def previsao_rapida(serie, horizon=6, modelo="auto", p=2, m=12):
+    """
+    Alternativa rápida a previsao_auto_arima.
+
+    Retorna:
+    --------
+    tuple : (pd.Series com as previsões indexadas pelos meses futuros,
+             nome do modelo escolhido)
+    """
+    s = _janela_valida(serie)
+    modelos = _resolver_modelos(modelo)
+    prev, escolhido, _ = prever_auto(s.to_numpy()[None, :], horizon,
+                                     modelos=modelos, p=p, m=m)
+    previsoes = pd.Series(prev[0], index=_datas_futuras(s.index, horizon))
+    return previsoes, _nome_modelo(modelos[escolhido[0]], p)
+
+
+def backtest_rapido(serie, n_testes=6, h=1, modelo="auto", p=2, m=12, horizonte=6):
+    """
+    Alternativa rápida a backtest_auto_arima (origem móvel). Cada valor de teste
+    é previsto h passos à frente a partir do histórico disponível até então.
+
+    Com histórico curto, n_testes é reduzido para que a primeira origem ainda
+    tenha ao menos um mês de treino. Meses faltando no meio da série são
+    interpolados, como em previsao_rapida e prever_lote.
+
+    Retorna:
+    --------
+    dict com previsoes, reais, mae, rmse, mape, smape, mase, modelos (nome do
+    modelo escolhido em cada origem) e psi (pesos psi do modelo que
+    previsao_rapida(serie, horizon=horizonte) escolhe na série inteira, para
+    os intervalos de utils.intervalos).
+
+    Levanta:
+    --------
+    ValueError
+        Se a série tem h meses ou menos (nenhuma origem com histórico).
+    """
+    y = _janela_valida(serie)
+    valores = y.to_numpy()
+    T = len(valores)
+    modelos_disp = _resolver_modelos(modelo)
+    n_testes = min(n_testes, T - h)
+    if n_testes <= 0:
+        raise ValueError(f"Histórico insuficiente para o backtest de {serie.name or 'série'}: "
+                         f"{T} mês(es) válido(s), mínimo de {h + 1}.")
+
+    previsoes, modelos = [], []
+    for i in range(n_testes):
+        alvo = T - n_testes + i
+        historico = valores[None, :alvo - h + 1]
+        prev, escolhido, _ = prever_auto(historico, h, modelos=modelos_disp,
+                                         p=p, m=m)
+        previsoes.append(prev[0, h - 1])
+        modelos.append(_nome_modelo(modelos_disp[escolhido[0]], p))
+
+    reais = y.iloc[-n_testes:]
+    previsoes = pd.Series(previsoes, index=reais.index)
+
+    metricas = calcular_metricas(reais.to_numpy(), previsoes.to_numpy(),
+                                 y_treino=valores[:T - n_testes])
+
+    _, escolhido, _ = prever_auto(valores[None, :], horizonte, modelos=modelos_disp, p=p, m=m)
+    psi = pesos_psi_auto(valores[None, :], horizonte, escolhido, modelos=modelos_disp,
+                         p=p, m=m)[0]
+
+    return {
+        'previsoes': previsoes,
+        'reais': reais,
+        'mae': metricas['MAE'],
+        'rmse': metricas['RMSE'],
+        'mape': metricas['MAPE'],
+        'smape': metricas['sMAPE'],
+        'mase': metricas['MASE'],
+        'modelos': modelos,
+        'psi': psi
+    }
+
+
+def forecast_future_periods_rapido(df, target_col, horizon=6, modelo="auto", p=2, m=12):
+    """
+    Alternativa rápida a forecast_future_periods: prevê os meses seguintes ao
+    último registro e retorna DataFrame com colunas 'ds' e 'forecast'.
+    """
+    s = df[target_col]
+    if df.index.inferred_type != "datetime64":
+        if 'ds' in df.columns:
+            s = s.set_axis(pd.to_datetime(df['ds']))
+        elif 'mes' in df.columns:
+            s = s.set_axis(pd.to_datetime(df['mes']))
+    previsoes, _ = previsao_rapida(s, horizon=horizon, modelo=modelo, p=p, m=m)
+    return pd.DataFrame({'ds': previsoes.index, 'forecast': previsoes.values})
+
+
+def prever_lote(tabelas, colunas=None, horizon=6, n_testes=6, modelo="auto", p=2, m=12):
+    """
+    Prevê de uma vez muitas séries (indicadores × empresas).
+
+    Parâmetros:
+    -----------
+    tabelas : pd.DataFrame ou dict[str, pd.DataFrame]
+        Tabela de indicadores (índice 'mes') ou dicionário empresa -> tabela.
+    colunas : list de str, opcional
+        Indicadores a prever (default: todas as colunas numéricas).
+
+    Retorna:
+    --------
+    dict :
+        {'previsoes': DataFrame (meses futuros × séries; cada série é
+                      prevista a partir do seu último mês válido, com NaN
+                      nos demais meses do índice),
+         'modelos': Series série -> modelo escolhido,
+         'erros': DataFrame série × modelo com o MAE do backtest}
+        Com dicionário de entrada, as séries são identificadas por
+        (empresa, indicador).
+    """
+    if isinstance(tabelas, pd.DataFrame):
+        matriz = tabelas if colunas is None else tabelas[colunas]
+    else:
+        matriz = pd.concat(
+            {emp: (t if colunas is None else t[colunas]) for emp, t in tabelas.items()},
+            axis=1)
+    matriz = matriz.select_dtypes("number").sort_index()
+
+    valores = _limpar(matriz.to_numpy().T)
+    modelos_disp = _resolver_modelos(modelo)
+    previsoes = np.full((valores.shape[0], horizon), np.nan)
+    escolhido = np.zeros(valores.shape[0], dtype=int)
+    erros = np.full((len(modelos_disp), valores.shape[0]), np.nan)
+    datas = [None] * valores.shape[0]
+
+    # séries que começam em meses diferentes são ajustadas em blocos
+    # homogêneos, sem preencher artificialmente o início
+    validos = ~np.isnan(valores)
+    inicio = np.where(validos.any(axis=1), validos.argmax(axis=1), -1)
+    fim = valores.shape[1] - np.where(validos.any(axis=1),
+                                      validos[:, ::-1].argmax(axis=1), 0)
+    for (ini, f) in set(zip(inicio, fim)):
+        if ini < 0:
+            continue
+        linhas = np.flatnonzero((inicio == ini) & (fim == f))
+        bloco = valores[linhas, ini:f]
+        prev, esc, err = prever_auto(bloco, horizon, n_testes=n_testes,
+                                     modelos=modelos_disp, p=p, m=m)
+        previsoes[linhas], escolhido[linhas], erros[:, linhas] = prev, esc, err
+        # cada bloco continua a partir do seu próprio último mês
+        futuras = _datas_futuras(matriz.index[:f], horizon)
+        for linha in linhas:
+            datas[linha] = futuras
+
+    series = matriz.columns
+    tabela = pd.concat({i: pd.Series(previsoes[i], index=datas[i])
+                        for i in range(len(series)) if datas[i] is not None}, axis=1)
+    tabela = tabela.reindex(columns=range(len(series))).set_axis(series, axis=1)
+    return {
+        'previsoes': tabela,
+        'modelos': pd.Series([_nome_modelo(modelos_disp[i], p) for i in escolhido],
+                             index=series),
+        'erros': pd.DataFrame(erros.T, index=series,
+                              columns=list(modelos_disp)),
+    }
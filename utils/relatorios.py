@@ -0,0 +1,415 @@
+"""
+relatorios.py
+
+Geração de relatórios PDF (FPDF) com os cards de indicadores, gráficos e
+previsões de uma ou várias empresas.
+
+Os PDFs são montados num pool de processos em segundo plano, para que gerar os
+relatórios de toda a carteira não trave o dashboard, e ficam gravados em disco
+por (empresa, versão dos dados, origem da previsão, plano de contas): um
+relatório cujos dados não mudaram nunca é renderizado de novo. O pool só é
+criado no primeiro relatório pedido.
+"""
+
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import re
+import sys
+import threading
+import types
+from concurrent.futures import Future
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+from fpdf import FPDF
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+
+# (título, coluna, formato) dos cards do relatório, na ordem do dashboard
+CARDS_INDICES = [
+    ("Endividamento Geral", "Endividamento_Geral", "{:.2f}"),
+    ("Margem Líquida de Lucro", "Margem_de_Lucro", "{:.2f}"),
+    ("ROE", "Retorno_Sobre_Patrimonio_Liquido", "{:.2f}"),
+    ("Liquidez Corrente", "Liquidez_Corrente", "{:.2f}"),
+    ("Liquidez Geral", "Liquidez_Geral", "{:.2f}"),
+    ("Liquidez Imediata", "Liquidez_Imediata", "{:.2f}"),
+]
+CARDS_VALORES = [
+    ("Faturamento", "Receita_Bruta"),
+    ("Receita Líquida", "Receita_Líquida"),
+    ("Lucro Bruto", "Lucro_Bruto"),
+    ("Lucro Líquido", "Lucro_Líquido"),
+    ("Disponibilidade de Caixa", "Disponibilidade_Caixa"),
+]
+
+
+# ======================
+# GRÁFICOS (matplotlib, sem estado global do pyplot)
+# ======================
+def _png(fig):
+    buffer = io.BytesIO()
+    FigureCanvasAgg(fig).print_png(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+def _novo_grafico(titulo):
+    fig = Figure(figsize=(8, 3), dpi=110)
+    ax = fig.add_subplot()
+    ax.set_title(titulo, fontsize=11, fontweight="bold")
+    ax.grid(axis="y", color="#E5E5E5")
+    ax.tick_params(axis="x", labelrotation=45, labelsize=7)
+    ax.tick_params(axis="y", labelsize=7)
+    for lado in ("top", "right"):
+        ax.spines[lado].set_visible(False)
+    return fig, ax
+
+
+def _grafico_receitas(tabela):
+    fig, ax = _novo_grafico("RECEITA LÍQUIDA / RECEITA BRUTA")
+    x = range(len(tabela))
+    ax.bar([i - 0.2 for i in x], tabela["Receita_Bruta"], width=0.4,
+           color="#B0B0B0", label="Receita Bruta")
+    ax.bar([i + 0.2 for i in x], tabela["Receita_Líquida"], width=0.4,
+           color="#595959", label="Receita Líquida")
+    ax.set_xticks(list(x), tabela.index.astype(str))
+    ax.legend(fontsize=7, frameon=False)
+    fig.tight_layout()
+    return _png(fig)
+
+
+def _grafico_linha(serie, titulo, percentual=False):
+    fig, ax = _novo_grafico(titulo)
+    ax.plot(serie.index.astype(str), serie.values, color="#595959",
+            linewidth=2, marker="o", markersize=3)
+    if percentual:
+        ax.yaxis.set_major_formatter(lambda v, _: f"{v:.0%}")
+    fig.tight_layout()
+    return _png(fig)
+
+
+def _grafico_previsao(previsao):
+    fig, ax = _novo_grafico("PREVISÃO FUTURA - MARGEM DE LUCRO LÍQUIDA")
+    x = pd.Index(previsao.index).astype(str)
+    for nivel, cor in ((95, "#E3E3E3"), (80, "#C8C8C8")):
+        if f"inferior_{nivel}" in previsao.columns:
+            ax.fill_between(x, previsao[f"inferior_{nivel}"], previsao[f"superior_{nivel}"],
+                            color=cor, label=f"Intervalo {nivel}%")
+    ax.plot(x, previsao["forecast"], color="#595959", linewidth=2,
+            marker="o", markersize=3, label="Previsão")
+    ax.yaxis.set_major_formatter(lambda v, _: f"{v:.0%}")
+    ax.legend(fontsize=7, frameon=False)
+    fig.tight_layout()
+    return _png(fig)
+
+
+# ======================
+# DOCUMENTO
+# ======================
+def _texto(valor):
+    # fontes nativas do FPDF são latin-1
+    return str(valor).encode("latin-1", "replace").decode("latin-1")
+
+
+def _formatar(valor, formato="{:,.2f}"):
+    if valor is None or pd.isna(valor):
+        return "-"
+    return formato.format(valor)
+
+
+def gerar_relatorio_pdf(empresa, indicadores, previsao=None, meses_graficos=12):
+    """
+    Monta o PDF de uma empresa.
+
+    Parâmetros:
+    -----------
+    empresa : str
+        Nome exibido no cabeçalho.
+    indicadores : pd.DataFrame
+        Saída de processar_indicadores_financeiros (índice 'mes').
+    previsao : pd.DataFrame, opcional
+        Previsão da Margem de Lucro com coluna 'forecast' e, se houver, os
+        limites de utils.intervalos ('inferior_80', 'superior_80', ...).
+    meses_graficos : int
+        Quantidade de meses mais recentes exibida nos gráficos.
+
+    Retorna:
+    --------
+    bytes : conteúdo do PDF
+    """
+    tabela = indicadores.sort_index()
+    foto = tabela.iloc[-1] if len(tabela) else pd.Series(dtype=float)
+    recorte = tabela.tail(meses_graficos)
+
+    pdf = FPDF(orientation="P", unit="mm", format="A4")
+    pdf.set_auto_page_break(auto=True, margin=15)
+    pdf.add_page()
+
+    pdf.set_font("Helvetica", "B", 16)
+    pdf.cell(0, 10, _texto("ConsulX - Relatório Contábil"), new_x="LMARGIN", new_y="NEXT")
+    pdf.set_font("Helvetica", "", 10)
+    pdf.cell(0, 6, _texto(f"Empresa: {empresa}"), new_x="LMARGIN", new_y="NEXT")
+    pdf.cell(0, 6, _texto(f"Mês de referência: {foto.name if len(tabela) else '-'}"),
+             new_x="LMARGIN", new_y="NEXT")
+    pdf.cell(0, 6, _texto(f"Gerado em: {datetime.now():%d/%m/%Y %H:%M}"),
+             new_x="LMARGIN", new_y="NEXT")
+    pdf.ln(4)
+
+    # Cards: valores e índices do último mês
+    pdf.set_font("Helvetica", "B", 12)
+    pdf.cell(0, 8, _texto("Indicadores do mês"), new_x="LMARGIN", new_y="NEXT")
+    largura = (pdf.w - pdf.l_margin - pdf.r_margin) / 2
+    linhas = ([(t, "R$ " + _formatar(foto.get(c))) for t, c in CARDS_VALORES] +
+              [(t, _formatar(foto.get(c), f)) for t, c, f in CARDS_INDICES])
+    pdf.set_font("Helvetica", "", 10)
+    for titulo, valor in linhas:
+        pdf.cell(largura, 7, _texto(titulo), border="B")
+        pdf.cell(largura, 7, _texto(valor), border="B", align="R",
+                 new_x="LMARGIN", new_y="NEXT")
+    pdf.ln(4)
+
+    # Gráficos
+    if len(recorte):
+        largura_img = pdf.w - pdf.l_margin - pdf.r_margin
+        pdf.image(_grafico_receitas(recorte), w=largura_img)
+        pdf.image(_grafico_linha(recorte["Disponibilidade_Caixa"],
+                                 "DISPONIBILIDADE DE CAIXA"), w=largura_img)
+        pdf.image(_grafico_linha(recorte["Margem_de_Lucro"], "MARGEM DE LUCRO (%)",
+                                 percentual=True), w=largura_img)
+
+    # Previsão
+    if previsao is not None and len(previsao):
+        pdf.add_page()
+        pdf.set_font("Helvetica", "B", 12)
+        pdf.cell(0, 8, _texto("Projeção dos próximos meses"), new_x="LMARGIN", new_y="NEXT")
+        pdf.image(_grafico_previsao(previsao), w=pdf.w - pdf.l_margin - pdf.r_margin)
+
+        colunas = [c for c in ("forecast", "inferior_80", "superior_80",
+                               "inferior_95", "superior_95") if c in previsao.columns]
+        nomes = {"forecast": "Previsão", "inferior_80": "Inf. 80%", "superior_80": "Sup. 80%",
+                 "inferior_95": "Inf. 95%", "superior_95": "Sup. 95%"}
+        larg = (pdf.w - pdf.l_margin - pdf.r_margin) / (len(colunas) + 1)
+        pdf.set_font("Helvetica", "B", 9)
+        pdf.cell(larg, 7, _texto("Mês"), border="B")
+        for c in colunas:
+            pdf.cell(larg, 7, _texto(nomes[c]), border="B", align="R")
+        pdf.ln()
+        pdf.set_font("Helvetica", "", 9)
+        for mes, linha in previsao.iterrows():
+            rotulo = mes.strftime("%Y-%m") if hasattr(mes, "strftime") else mes
+            pdf.cell(larg, 6, _texto(rotulo), border="B")
+            for c in colunas:
+                pdf.cell(larg, 6, _formatar(linha[c], "{:.2%}"), border="B", align="R")
+            pdf.ln()
+
+    return bytes(pdf.output())
+
+
+# ======================
+# EXECUÇÃO EM SEGUNDO PLANO
+# ======================
+def _previsao_padrao(indicadores):
+    # Previsão rápida (utils.previsao_rapida) para relatórios gerados sem a do dashboard
+    from utils.intervalos import intervalos_backtest
+    from utils.previsao_rapida import backtest_rapido, previsao_rapida
+
+    serie = indicadores["Margem_de_Lucro"]
+    previsoes, _ = previsao_rapida(serie)
+    return intervalos_backtest(previsoes, backtest_rapido(serie, n_testes=6))
+
+
+def _carregar_indicadores(db_name, coll_name, plano=None):
+    from utils.db import load_all_rows_from_mongo
+    from utils.plano_contas import processar_indicadores_por_plano
+
+    rows = load_all_rows_from_mongo(db_name=db_name, coll_name=coll_name)
+    return processar_indicadores_por_plano(pd.DataFrame(rows), plano=plano)
+
+
+def _gerar_e_gravar(caminho, empresa, indicadores, previsao, fonte, plano):
+    """Executado no processo trabalhador: carrega (se preciso), gera e grava."""
+    if indicadores is None:
+        indicadores = _carregar_indicadores(*fonte, plano=plano)
+    if previsao is None:
+        previsao = _previsao_padrao(indicadores)
+
+    conteudo = gerar_relatorio_pdf(empresa, indicadores, previsao)
+    caminho = Path(caminho)
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    temporario = caminho.with_suffix(f".{os.getpid()}.tmp")
+    temporario.write_bytes(conteudo)
+    os.replace(temporario, caminho)
+    return str(caminho)
+
+
+@contextmanager
+def _sem_main_do_app():
+    """
+    O Streamlit registra o script (app.py) como sys.modules['__main__'] e o
+    "spawn" reexecuta o __main__ em cada processo novo, o que rodaria o
+    dashboard inteiro no trabalhador. Enquanto os processos são criados, o
+    __main__ é trocado por um módulo vazio. A troca vale para o processo
+    todo, por isso só acontece uma vez, quando GeradorRelatorios.iniciar
+    cria o pool.
+    """
+    original = sys.modules.get("__main__")
+    sys.modules["__main__"] = types.ModuleType("__main__")
+    try:
+        yield
+    finally:
+        sys.modules["__main__"] = original
+
+
+def _nome_arquivo(texto):
+    return re.sub(r"[^0-9A-Za-z_.-]+", "_", texto).strip("_") or "empresa"
+
+
+def _assinatura_plano(plano):
+    """'padrao' para o plano padrão (ou nenhum); senão um hash curto do plano."""
+    from utils.plano_contas import PLANO_PADRAO
+
+    if plano is None or plano == PLANO_PADRAO:
+        return "padrao"
+    texto = json.dumps(plano, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha1(texto.encode()).hexdigest()[:10]
+
+
+# Origem das previsões feitas pelo próprio trabalhador (_previsao_padrao), para
+# não dividirem o arquivo com as previsões "rapido" enviadas pelo dashboard
+ORIGEM_PADRAO = "relatorio"
+
+
+class GeradorRelatorios:
+    """
+    Fila de geração de PDFs num pool de processos, com cache em disco por
+    (empresa, versão dos dados, origem da previsão, plano de contas).
+
+    Parâmetros:
+    -----------
+    diretorio : str | Path
+        Pasta onde os PDFs são gravados
+        ({diretorio}/{empresa}/{versao}-{origem da previsão}-{plano}.pdf).
+    max_workers : int
+        Tamanho do pool (default: 2; os relatórios disputam CPU com o dashboard).
+    """
+
+    def __init__(self, diretorio="relatorios", max_workers=2):
+        self.diretorio = Path(diretorio)
+        self.max_workers = max_workers
+        self._pool = None
+        self._em_andamento = {}
+        self._lock = threading.Lock()
+
+    def caminho(self, empresa, versao, origem_previsao=ORIGEM_PADRAO, plano=None):
+        arquivo = _nome_arquivo(f"{versao}-{origem_previsao}-{_assinatura_plano(plano)}")
+        return self.diretorio / _nome_arquivo(empresa) / f"{arquivo}.pdf"
+
+    def iniciar(self):
+        """
+        Cria o pool e todos os seus processos de uma vez (idempotente);
+        submeter chama no primeiro relatório. A troca do __main__ acontece só
+        nessa criação: os trabalhadores não são reciclados, então nenhum
+        processo novo é criado depois disso.
+        """
+        with self._lock:
+            if self._pool is None:
+                # "spawn": o trabalhador não herda threads/estado do servidor Streamlit
+                with _sem_main_do_app():
+                    self._pool = multiprocessing.get_context("spawn").Pool(
+                        processes=self.max_workers)
+            return self
+
+    def submeter(self, empresa, versao, indicadores=None, previsao=None, fonte=None,
+                 origem_previsao=None, plano=None):
+        """
+        Agenda o relatório de uma empresa e retorna um Future com o caminho do
+        PDF. Se o PDF daquela versão já existe, o Future já vem concluído; se
+        já está sendo gerado, o mesmo Future é devolvido.
+
+        Informe `indicadores` (tabela já calculada) ou `fonte` = (db_name,
+        coll_name) para que o próprio trabalhador carregue os dados. Sem
+        `previsao`, o trabalhador usa o backend rápido com intervalos. Com
+        `previsao`, informe em `origem_previsao` o backend que a gerou
+        (ex: "arima"): PDFs com previsões de origens diferentes não se misturam
+        no cache. `plano` é o plano de contas da empresa (utils.plano_contas):
+        com `fonte` o trabalhador calcula os indicadores com ele, e PDFs de
+        planos diferentes também ficam em arquivos separados.
+        """
+        if indicadores is None and fonte is None:
+            raise ValueError("Informe 'indicadores' ou 'fonte' para gerar o relatório.")
+        if previsao is not None and origem_previsao is None:
+            raise ValueError("Informe 'origem_previsao' junto com 'previsao'.")
+        origem_previsao = origem_previsao or ORIGEM_PADRAO
+
+        self.iniciar()
+        caminho = self.caminho(empresa, versao, origem_previsao, plano)
+        chave = (empresa, str(versao), origem_previsao, _assinatura_plano(plano))
+        with self._lock:
+            if caminho.exists():
+                pronto = Future()
+                pronto.set_result(str(caminho))
+                return pronto
+            if chave in self._em_andamento:
+                return self._em_andamento[chave]
+
+            futuro = Future()
+            futuro.set_running_or_notify_cancel()
+            self._pool.apply_async(_gerar_e_gravar,
+                                   (str(caminho), empresa, indicadores, previsao, fonte, plano),
+                                   callback=futuro.set_result,
+                                   error_callback=futuro.set_exception)
+            self._em_andamento[chave] = futuro
+
+        def _liberar(_):
+            with self._lock:
+                self._em_andamento.pop(chave, None)
+        futuro.add_done_callback(_liberar)
+        return futuro
+
+    def submeter_lote(self, trabalhos):
+        """
+        Agenda vários relatórios. `trabalhos` é um iterável de dicionários com
+        os argumentos de submeter (empresa, versao, indicadores/fonte,
+        previsao/origem_previsao, plano).
+
+        Retorna:
+        --------
+        dict empresa -> Future
+        """
+        return {t["empresa"]: self.submeter(**t) for t in trabalhos}
+
+    def encerrar(self, esperar=True):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.close()
+            if esperar:
+                pool.join()
+            else:
+                pool.terminate()
+
+
+_gerador_processo = None
+_gerador_lock = threading.Lock()
+
+
+def obter_gerador():
+    """
+    Gerador único do processo (compartilhado pelas sessões do Streamlit).
+    Pasta e tamanho do pool vêm de CONSULX_RELATORIOS_DIR e
+    CONSULX_RELATORIOS_WORKERS.
+    """
+    global _gerador_processo
+    with _gerador_lock:
+        if _gerador_processo is None:
+            workers = os.environ.get("CONSULX_RELATORIOS_WORKERS")
+            _gerador_processo = GeradorRelatorios(
+                diretorio=os.environ.get("CONSULX_RELATORIOS_DIR", "relatorios"),
+                max_workers=int(workers) if workers else 2)
+        return _gerador_processo
@@ -0,0 +1,163 @@
+"""
+simulacao.py
+
+Risco de liquidez por simulação de Monte Carlo. As séries que compõem o caixa
+e os índices de liquidez (SERIES_LIQUIDEZ) são previstas juntas pelo backend
+rápido (utils.previsao_rapida) e os erros de um passo de cada série são
+medidos nas mesmas origens de um backtest móvel. Cada caminho futuro sorteia
+um mês do backtest e aplica os erros de todas as séries naquele mês (bootstrap
+conjunto), preservando a correlação entre receita, custo, caixa e passivo. Os
+erros são centralizados por série e se acumulam ao longo do horizonte pelos
+pesos psi do modelo escolhido para cada série, como em utils.intervalos.
+
+Com os caminhos (série × caminho × mês) calculam-se Liquidez_Imediata e
+Liquidez_Corrente e a probabilidade de ficarem abaixo de 1, mês a mês e em
+algum momento do horizonte. Tudo é vetorizado em NumPy: milhares de caminhos
+custam poucos milissegundos, então a simulação pode rodar no carregamento da
+página de cada empresa.
+"""
+
+import numpy as np
+import pandas as pd
+
+from utils.previsao_rapida import MODELOS, pesos_psi_auto, prever_auto, prever_matriz
+
+
+SERIES_LIQUIDEZ = ["Disponibilidade_Caixa", "Receita_Líquida", "Custo_Total",
+                   "Ativo_Circulante", "Passivo_Circulante"]
+
+
+def residuos_conjuntos(Y, escolhido, n_origens=12, modelos=MODELOS, p=2, m=12):
+    """
+    Erros de um passo (real - previsto) de cada série de Y (n, T), com o
+    modelo escolhido para ela, nas n_origens últimas origens (as mesmas para
+    todas as séries).
+
+    Retorna:
+    --------
+    np.ndarray (n, n_origens)
+    """
+    n, T = Y.shape
+    n_origens = min(n_origens, max(1, T - (p + 3)))
+    residuos = np.empty((n, n_origens))
+    for d, origem in enumerate(range(T - n_origens, T)):
+        for i in np.unique(escolhido):
+            linhas = np.flatnonzero(escolhido == i)
+            previsto = prever_matriz(Y[linhas, :origem], 1, modelos[i], p=p, m=m)[:, 0]
+            residuos[linhas, d] = Y[linhas, origem] - previsto
+    return residuos
+
+
+def simular_conjunto(previsao, residuos, psi=None, n_caminhos=5000, centralizar=True,
+                     semente=None):
+    """
+    Caminhos futuros com bootstrap conjunto: o mesmo mês do backtest é
+    sorteado para todas as séries em cada passo.
+
+    Parâmetros:
+    -----------
+    previsao : array (n, h)
+    residuos : array (n, r), sem NaN
+    psi : array (h,) ou (n, h), opcional (default: passeio aleatório, psi = 1)
+    centralizar : bool
+        Se True (default), remove a média dos resíduos de cada série: o viés
+        do backtest não desloca os caminhos para longe da previsão.
+
+    Retorna:
+    --------
+    np.ndarray (n, n_caminhos, h)
+    """
+    previsao = np.asarray(previsao, dtype=float)
+    residuos = np.asarray(residuos, dtype=float)
+    n, h = previsao.shape
+    psi = np.broadcast_to(np.ones(h) if psi is None else np.asarray(psi, dtype=float), (n, h))
+    if centralizar:
+        residuos = residuos - residuos.mean(axis=1, keepdims=True)
+
+    rng = np.random.default_rng(semente)
+    sorteio = rng.integers(0, residuos.shape[1], size=(n_caminhos, h))
+    choques = residuos[:, sorteio]                      # (n, caminhos, h)
+
+    k, i = np.indices((h, h))
+    L = np.where(k >= i, psi[:, np.clip(k - i, 0, h - 1)], 0.0)
+    return previsao[:, None, :] + np.einsum("nck,nhk->nch", choques, L)
+
+
+def _razao(numerador, denominador):
+    # passivo circulante nulo ou negativo não representa risco de liquidez
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(denominador > 0, numerador / denominador, np.inf)
+
+
+def simular_liquidez(indicadores, horizon=6, n_caminhos=5000, n_origens=12,
+                     modelo="auto", limite=1.0, semente=0):
+    """
+    Probabilidade de Liquidez_Imediata e Liquidez_Corrente ficarem abaixo de
+    `limite` nos próximos meses.
+
+    Parâmetros:
+    -----------
+    indicadores : pd.DataFrame
+        Tabela de processar_indicadores_financeiros (índice 'mes').
+    horizon : int
+        Meses simulados.
+    n_caminhos : int
+        Caminhos de Monte Carlo.
+    n_origens : int
+        Meses do backtest usados como reservatório de erros.
+    modelo : str
+        "auto" ou um dos MODELOS de utils.previsao_rapida.
+
+    Retorna:
+    --------
+    dict com:
+        - probabilidades: pd.DataFrame (meses futuros × 'Liquidez_Imediata',
+          'Liquidez_Corrente', 'Caixa_Negativo', 'Prejuizo')
+        - no_horizonte: pd.Series com a probabilidade de cada evento em algum
+          mês do horizonte
+        - faixas: pd.DataFrame com os quantis 5/50/95% dos dois índices
+        - caminhos: dict série/índice -> np.ndarray (caminhos × meses)
+        - modelos: pd.Series série -> modelo escolhido
+    """
+    tabela = (indicadores[SERIES_LIQUIDEZ].astype(float)
+              .replace([np.inf, -np.inf], np.nan).dropna().sort_index())
+    if len(tabela) < 8:
+        raise ValueError("Histórico insuficiente para simular a liquidez (mínimo de 8 meses).")
+
+    modelos = MODELOS if modelo == "auto" else (modelo,)
+    Y = tabela.to_numpy().T
+    previsao, escolhido, _ = prever_auto(Y, horizon, modelos=modelos)
+    residuos = residuos_conjuntos(Y, escolhido, n_origens=n_origens, modelos=modelos)
+    psi = pesos_psi_auto(Y, horizon, escolhido, modelos=modelos)
+    caminhos = simular_conjunto(previsao, residuos, psi=psi, n_caminhos=n_caminhos,
+                                semente=semente)
+
+    series = dict(zip(SERIES_LIQUIDEZ, caminhos))
+    passivo = series["Passivo_Circulante"]
+    series["Liquidez_Imediata"] = _razao(series["Disponibilidade_Caixa"], passivo)
+    series["Liquidez_Corrente"] = _razao(series["Ativo_Circulante"], passivo)
+
+    eventos = {
+        "Liquidez_Imediata": series["Liquidez_Imediata"] < limite,
+        "Liquidez_Corrente": series["Liquidez_Corrente"] < limite,
+        "Caixa_Negativo": series["Disponibilidade_Caixa"] < 0,
+        "Prejuizo": series["Receita_Líquida"] < series["Custo_Total"],
+    }
+    ultimo = pd.Period(str(tabela.index.max())[:7], freq="M")
+    meses = pd.period_range(ultimo + 1, periods=horizon, freq="M").strftime("%Y-%m")
+    probabilidades = pd.DataFrame({nome: e.mean(axis=0) for nome, e in eventos.items()},
+                                  index=pd.Index(meses, name="mes"))
+    no_horizonte = pd.Series({nome: e.any(axis=1).mean() for nome, e in eventos.items()})
+
+    faixas = {}
+    for nome in ("Liquidez_Imediata", "Liquidez_Corrente"):
+        for q in (5, 50, 95):
+            faixas[f"{nome}_p{q}"] = np.quantile(series[nome], q / 100, axis=0)
+
+    return {
+        "probabilidades": probabilidades,
+        "no_horizonte": no_horizonte,
+        "faixas": pd.DataFrame(faixas, index=probabilidades.index),
+        "caminhos": series,
+        "modelos": pd.Series([modelos[i] for i in escolhido], index=SERIES_LIQUIDEZ),
+    }
@@ -0,0 +1,210 @@
+"""
+snapshots.py
+
+Histórico versionado das tabelas de indicadores. Cada tabela calculada
+(saída de processar_indicadores_financeiros) é gravada como um snapshot
+imutável por empresa:
+
+    {raiz}/{empresa}/v000001/valores.npy     matriz mês × indicador (float64,
+                                             ordem de colunas: cada indicador
+                                             contíguo no arquivo)
+    {raiz}/{empresa}/v000001/manifesto.json  meses, colunas, hash, data, descrição
+
+Um balancete retificado gera uma nova versão em vez de sobrescrever o
+histórico; tabelas idênticas à última versão não geram versão nova. As
+versões são abertas com np.load(mmap_mode="r"): o DataFrame aponta direto
+para as páginas do arquivo (sem cópia nem parse), de modo que painéis e jobs
+em lote podem ler versões antigas sem custo de carga, e diferencas() mostra
+quais meses e indicadores mudaram entre duas versões.
+"""
+
+import hashlib
+import json
+import os
+import stat
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+_ARQUIVO_VALORES = "valores.npy"
+_ARQUIVO_MANIFESTO = "manifesto.json"
+_SOMENTE_LEITURA = stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH
+
+
+def _nome_versao(versao):
+    return f"v{versao:06d}"
+
+
+class RepositorioSnapshots:
+    """
+    Snapshots versionados das tabelas de indicadores, um diretório por empresa.
+
+    Exemplo:
+    --------
+    >>> repo = RepositorioSnapshots("snapshots")
+    >>> repo.gravar("industrial_nordeste", indicadores, descricao="fechamento 2024-12")
+    2
+    >>> repo.versoes("industrial_nordeste")
+    >>> antiga = repo.abrir("industrial_nordeste", versao=1)
+    >>> repo.diferencas("industrial_nordeste", 1, 2)
+    """
+
+    def __init__(self, raiz="snapshots"):
+        self.raiz = Path(raiz)
+
+    def _diretorio(self, empresa, versao=None):
+        diretorio = self.raiz / empresa
+        return diretorio if versao is None else diretorio / _nome_versao(versao)
+
+    def _numeros(self, empresa):
+        diretorio = self._diretorio(empresa)
+        if not diretorio.is_dir():
+            return []
+        return sorted(int(d.name[1:]) for d in diretorio.iterdir()
+                      if d.is_dir() and d.name.startswith("v") and d.name[1:].isdigit())
+
+    def ultima_versao(self, empresa):
+        numeros = self._numeros(empresa)
+        return numeros[-1] if numeros else None
+
+    def manifesto(self, empresa, versao=None):
+        versao = versao or self.ultima_versao(empresa)
+        if versao is None:
+            raise KeyError(f"Nenhum snapshot de {empresa}.")
+        caminho = self._diretorio(empresa, versao) / _ARQUIVO_MANIFESTO
+        return json.loads(caminho.read_text(encoding="utf-8"))
+
+    def gravar(self, empresa, indicadores, descricao=None):
+        """
+        Grava a tabela como nova versão (se diferente da última).
+
+        Retorna:
+        --------
+        int : número da versão (a última existente quando nada mudou)
+        """
+        tabela = indicadores.select_dtypes("number").astype(float).sort_index()
+        valores = np.asfortranarray(tabela.to_numpy())
+        meses = [str(m) for m in tabela.index]
+        colunas = [str(c) for c in tabela.columns]
+        resumo = hashlib.sha256()
+        resumo.update(json.dumps([meses, colunas]).encode())
+        resumo.update(valores.tobytes(order="F"))
+        hash_tabela = resumo.hexdigest()
+
+        ultima = self.ultima_versao(empresa)
+        if ultima is not None and self.manifesto(empresa, ultima)["hash"] == hash_tabela:
+            return ultima
+
+        self._diretorio(empresa).mkdir(parents=True, exist_ok=True)
+        temporario = Path(tempfile.mkdtemp(prefix=".gravando-", dir=self._diretorio(empresa)))
+        np.save(temporario / _ARQUIVO_VALORES, valores)
+        manifesto = {"meses": meses, "colunas": colunas, "hash": hash_tabela,
+                     "indice": tabela.index.name, "criado_em": time.time(),
+                     "descricao": descricao, "anterior": ultima}
+        (temporario / _ARQUIVO_MANIFESTO).write_text(
+            json.dumps(manifesto, ensure_ascii=False, indent=2), encoding="utf-8")
+        for arquivo in temporario.iterdir():
+            os.chmod(arquivo, _SOMENTE_LEITURA)
+
+        # rename atômico; se outro processo gravou a mesma versão, tenta a seguinte
+        versao = (ultima or 0) + 1
+        while True:
+            try:
+                os.rename(temporario, self._diretorio(empresa, versao))
+                return versao
+            except OSError:
+                if not self._diretorio(empresa, versao).exists():
+                    raise
+                versao += 1
+
+    def versoes(self, empresa):
+        """pd.DataFrame com versão, data, número de meses, último mês e descrição."""
+        linhas = []
+        for versao in self._numeros(empresa):
+            manifesto = self.manifesto(empresa, versao)
+            linhas.append({"versao": versao,
+                           "criado_em": pd.Timestamp(manifesto["criado_em"], unit="s"),
+                           "meses": len(manifesto["meses"]),
+                           "ultimo_mes": manifesto["meses"][-1] if manifesto["meses"] else None,
+                           "descricao": manifesto["descricao"]})
+        return pd.DataFrame(linhas, columns=["versao", "criado_em", "meses", "ultimo_mes",
+                                             "descricao"])
+
+    def abrir(self, empresa, versao=None):
+        """
+        Tabela de indicadores de uma versão (default: a última), sem cópia:
+        os valores são um memmap somente leitura do arquivo da versão.
+        """
+        versao = versao or self.ultima_versao(empresa)
+        manifesto = self.manifesto(empresa, versao)
+        valores = np.load(self._diretorio(empresa, versao) / _ARQUIVO_VALORES, mmap_mode="r")
+        return pd.DataFrame(valores, index=pd.Index(manifesto["meses"], name=manifesto["indice"]),
+                            columns=manifesto["colunas"], copy=False)
+
+    def diferencas(self, empresa, de=None, para=None, tolerancia=1e-9):
+        """
+        Células que mudaram entre duas versões (default: penúltima -> última).
+
+        Retorna:
+        --------
+        dict com:
+            - alteracoes: pd.DataFrame (mes, indicador, antes, depois, diferenca)
+            - meses_alterados: lista dos meses com alguma alteração
+            - indicadores_alterados: lista dos indicadores com alguma alteração
+            - meses_novos / meses_removidos
+            - colunas_novas / colunas_removidas
+        """
+        numeros = self._numeros(empresa)
+        if not numeros:
+            raise KeyError(f"Nenhum snapshot de {empresa}.")
+        para = para or numeros[-1]
+        de = de or max([v for v in numeros if v < para], default=para)
+        antes, depois = self.abrir(empresa, de), self.abrir(empresa, para)
+
+        meses = antes.index.intersection(depois.index, sort=False)
+        colunas = antes.columns.intersection(depois.columns, sort=False)
+        a = antes.loc[meses, colunas].to_numpy()
+        b = depois.loc[meses, colunas].to_numpy()
+        mudou = ~np.isclose(a, b, rtol=0.0, atol=tolerancia, equal_nan=True)
+        linhas, cols = np.nonzero(mudou)
+        alteracoes = pd.DataFrame({
+            "mes": meses[linhas], "indicador": colunas[cols],
+            "antes": a[linhas, cols], "depois": b[linhas, cols],
+        })
+        alteracoes["diferenca"] = alteracoes["depois"] - alteracoes["antes"]
+
+        return {
+            "alteracoes": alteracoes,
+            "meses_alterados": list(meses[mudou.any(axis=1)]),
+            "indicadores_alterados": list(colunas[mudou.any(axis=0)]),
+            "meses_novos": list(depois.index.difference(antes.index)),
+            "meses_removidos": list(antes.index.difference(depois.index)),
+            "colunas_novas": list(depois.columns.difference(antes.columns)),
+            "colunas_removidas": list(antes.columns.difference(depois.columns)),
+        }
+
+
+def registrar_snapshot(raiz, empresa, indicadores, descricao=None):
+    """
+    Grava a tabela em {raiz} e resume o que mudou em relação à versão
+    anterior (para os relatórios da CLI e do agendador).
+
+    Retorna:
+    --------
+    dict : {'versao', 'nova' (False se igual à última), 'meses_alterados',
+            'meses_novos'}
+    """
+    repositorio = RepositorioSnapshots(raiz)
+    ultima = repositorio.ultima_versao(empresa)
+    versao = repositorio.gravar(empresa, indicadores, descricao=descricao)
+    if ultima is None or versao == ultima:
+        return {"versao": versao, "nova": versao != ultima, "meses_alterados": [],
+                "meses_novos": []}
+    diferencas = repositorio.diferencas(empresa, ultima, versao)
+    return {"versao": versao, "nova": True,
+            "meses_alterados": [str(m) for m in diferencas["meses_alterados"]],
+            "meses_novos": [str(m) for m in diferencas["meses_novos"]]}
@@ -0,0 +1,166 @@
+"""
+validacao.py
+
+Verificações de integridade dos balancetes sobre o DataFrame de contas
+analíticas (load_all_rows_from_* / coleção de folhas), todas vetorizadas sobre
+todos os meses e empresas de uma vez:
+
+- movimento: saldo_atual = saldo_anterior ± (debito - credito), com o sinal
+  pela natureza do grupo (devedora: ATIVO, CUSTOS E DESPESAS; credora:
+  PASSIVO, RECEITAS)
+- equilibrio: ATIVO = PASSIVO (+ PL) + resultado do período (RECEITAS -
+  CUSTOS E DESPESAS), já que o resultado mensal ainda não foi encerrado no PL
+- duplicada: mesmo código de conta mais de uma vez no mesmo mês
+- mes_invalido / mes_faltante: documentos sem período reconhecível e lacunas
+  na sequência de meses de cada empresa
+
+Dados inconsistentes corrompem silenciosamente Liquidez_* e Endividamento;
+validar_balancetes devolve um relatório compacto para rodar a cada ingestão.
+"""
+
+import numpy as np
+import pandas as pd
+
+
+# +1: natureza devedora, -1: credora (por nivel_1)
+NATUREZA_CONTAS = {
+    "ATIVO": 1,
+    "CUSTOS E DESPESAS": 1,
+    "PASSIVO": -1,
+    "RECEITAS": -1,
+}
+
+def _ocorrencias(base, verificacao, conta=None, esperado=np.nan, encontrado=np.nan):
+    tabela = pd.DataFrame({
+        "empresa": base["empresa"].to_numpy(),
+        "mes": base["mes"].to_numpy(),
+        "verificacao": verificacao,
+        "conta": conta if conta is not None else None,
+        "esperado": esperado,
+        "encontrado": encontrado,
+    })
+    tabela["diferenca"] = tabela["encontrado"] - tabela["esperado"]
+    return tabela
+
+
+def _vazia():
+    return _ocorrencias(pd.DataFrame({"empresa": [], "mes": []}), None)
+
+
+def _juntar(tabelas):
+    tabelas = [t for t in tabelas if not t.empty]
+    if not tabelas:
+        return _vazia()
+    return pd.concat(tabelas, ignore_index=True)
+
+
+def verificar_movimento(df, tolerancia=0.02, naturezas=NATUREZA_CONTAS):
+    """Contas cujo saldo_atual não fecha com saldo_anterior, débitos e créditos."""
+    if not {"saldo_anterior", "debito", "credito"} <= set(df.columns):
+        return _vazia()
+
+    sinal = df["nivel_1"].map(naturezas).to_numpy(dtype=float)
+    anterior = df["saldo_anterior"].to_numpy(dtype=float)
+    movimento = df["debito"].to_numpy(dtype=float) - df["credito"].to_numpy(dtype=float)
+    atual = df["saldo_atual"].to_numpy(dtype=float)
+
+    esperado = anterior + sinal * movimento
+    # natureza desconhecida (sinal NaN) não é avaliada
+    falhas = np.abs(esperado - atual) > tolerancia
+    linhas = df.loc[falhas]
+    return _ocorrencias(linhas, "movimento", linhas["conta"].to_numpy(),
+                        esperado[falhas], atual[falhas])
+
+
+def verificar_equilibrio(df, tolerancia=0.02, incluir_resultado=True):
+    """Meses em que ATIVO difere de PASSIVO (+ resultado do período)."""
+    totais = (df.groupby(["empresa", "mes", "nivel_1"])["saldo_atual"].sum()
+                .unstack("nivel_1")
+                .reindex(columns=list(NATUREZA_CONTAS), fill_value=0.0)
+                .fillna(0.0))
+    esperado = totais["PASSIVO"].to_numpy()
+    if incluir_resultado:
+        esperado = esperado + totais["RECEITAS"].to_numpy() - totais["CUSTOS E DESPESAS"].to_numpy()
+    ativo = totais["ATIVO"].to_numpy()
+
+    falhas = np.abs(ativo - esperado) > tolerancia
+    base = totais.index.to_frame(index=False).loc[falhas]
+    return _ocorrencias(base, "equilibrio", None, esperado[falhas], ativo[falhas])
+
+
+def verificar_duplicadas(df):
+    """Códigos de conta repetidos no mesmo mês (encontrado = quantidade)."""
+    contagem = df.groupby(["empresa", "mes", "conta"]).size()
+    repetidas = contagem[contagem > 1]
+    base = repetidas.index.to_frame(index=False)
+    return _ocorrencias(base, "duplicada", base["conta"].to_numpy(),
+                        1.0, repetidas.to_numpy(dtype=float))
+
+
+def verificar_meses(df):
+    """Linhas sem mês reconhecível e meses faltantes entre o primeiro e o último de cada empresa."""
+    invalidas = df.loc[df["mes"].isna()].groupby("empresa", dropna=False).size()
+    base_invalidas = pd.DataFrame({"empresa": invalidas.index, "mes": None})
+    tabelas = [_ocorrencias(base_invalidas, "mes_invalido", None, 0.0,
+                            invalidas.to_numpy(dtype=float))]
+
+    meses = df.loc[df["mes"].notna(), ["empresa", "mes"]].drop_duplicates()
+    periodos = pd.PeriodIndex(meses["mes"], freq="M").asi8
+    meses = meses.assign(ordinal=periodos)
+    faixa = meses.groupby("empresa")["ordinal"].agg(["min", "max", "nunique"])
+    com_lacuna = faixa[faixa["max"] - faixa["min"] + 1 > faixa["nunique"]]
+
+    faltantes = []
+    for empresa, linha in com_lacuna.iterrows():
+        presentes = meses.loc[meses["empresa"] == empresa, "ordinal"].to_numpy()
+        todos = np.arange(linha["min"], linha["max"] + 1)
+        for ordinal in np.setdiff1d(todos, presentes):
+            faltantes.append((empresa, str(pd.Period(ordinal=int(ordinal), freq="M"))))
+    base_faltantes = pd.DataFrame(faltantes, columns=["empresa", "mes"])
+    tabelas.append(_ocorrencias(base_faltantes, "mes_faltante"))
+    return _juntar(tabelas)
+
+
+def validar_balancetes(df, tolerancia=0.02, incluir_resultado=True):
+    """
+    Executa todas as verificações.
+
+    Parâmetros:
+    -----------
+    df : pd.DataFrame
+        Contas analíticas (nivel_1..n, conta, saldo_atual, mes e, se houver,
+        saldo_anterior/debito/credito e 'empresa'). Sem 'empresa', tudo é
+        tratado como uma única empresa.
+    tolerancia : float
+        Diferença máxima aceita (arredondamento de centavos).
+    incluir_resultado : bool
+        Considera o resultado do período no equilíbrio patrimonial.
+
+    Retorna:
+    --------
+    dict com:
+        - ok: bool
+        - resumo: pd.DataFrame por verificação (ocorrencias, meses, maior_diferenca)
+        - ocorrencias: pd.DataFrame com uma linha por problema encontrado
+    """
+    if "empresa" not in df.columns:
+        df = df.assign(empresa="")
+    if df.empty:
+        ocorrencias = _vazia()
+    else:
+        ocorrencias = _juntar([
+            verificar_movimento(df, tolerancia),
+            verificar_equilibrio(df, tolerancia, incluir_resultado),
+            verificar_duplicadas(df),
+            verificar_meses(df),
+        ])
+
+    resumo = (ocorrencias.assign(abs_diferenca=ocorrencias["diferenca"].abs())
+              .groupby("verificacao")
+              .agg(ocorrencias=("verificacao", "size"),
+                   meses=("mes", "nunique"),
+                   maior_diferenca=("abs_diferenca", "max"))
+              .reindex(["movimento", "equilibrio", "duplicada", "mes_invalido", "mes_faltante"],
+                       fill_value=0))
+    resumo["maior_diferenca"] = resumo["maior_diferenca"].astype(float).fillna(0.0)
+    return {"ok": ocorrencias.empty, "resumo": resumo, "ocorrencias": ocorrencias}